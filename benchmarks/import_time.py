@@ -0,0 +1,134 @@
+"""
+Cold-start check of a web worker: imports server.app under `python -X importtime` in a fresh interpreter,
+creates the app, serves a few JSON requests, and reports the import time, the peak RSS and the slowest imports.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --max-ms 500 --max-rss-mb 150 --out import_time.json
+
+Exits 1 if one of LAZY_MODULES got loaded on the way (they belong to the rendering, scraping and Parquet paths
+and have to stay imported on first use), or if the median import time or the RSS exceeds its budget.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+LAZY_MODULES = ("cartopy", "matplotlib", "pandas", "pyarrow", "scipy", "bs4", "lxml", "shapely")
+JSON_REQUESTS = ("/health/", "/metrics/", "/iceberg_api/snapshot?time=2020-01-01T00:00:00")
+
+CHILD = """
+import sys, json, time, resource
+start = time.perf_counter()
+from server.app import create_app
+from server.models import db
+imported = time.perf_counter() - start
+app = create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1], "PUBLISHED_DATABASE": None, "TRACK_STORE": sys.argv[2]})
+with app.app_context():
+    db.create_all(bind_key=None)
+created = time.perf_counter() - start
+client = app.test_client()
+statuses = {url: client.get(url).status_code for url in sys.argv[3:]}
+print(json.dumps({
+    "import_ms": imported * 1000,
+    "create_app_ms": created * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "statuses": statuses,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def run_once(work_dir):
+    env = dict(os.environ, ICEBERG_RUN_SCHEDULER="0", PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            CHILD,
+            f"sqlite:///{os.path.join(work_dir, 'startup.sqlite')}",
+            os.path.join(work_dir, "tracks.bin"),
+            *JSON_REQUESTS,
+        ],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode:
+        sys.exit(proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def parse_importtime(stderr):
+    """(cumulative µs, module) of every import in the `-X importtime` report, nested modules are indented"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        imports.append((int(cumulative), name.rstrip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="budget for the median import time of server.app")
+    parser.add_argument("--max-rss-mb", type=float, help="budget for the peak RSS after serving the JSON requests")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="iceberg_startup_") as work_dir:
+        runs = [run_once(work_dir) for _ in range(args.repeat)]
+
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    create_app_ms = statistics.median(run["create_app_ms"] for run in runs)
+    rss_mb = max(run["rss_mb"] for run in runs)
+    last = runs[-1]
+    loaded = sorted({m.split(".")[0] for m in last["modules"]} & set(LAZY_MODULES))
+
+    print(f"import server.app  {import_ms:8.1f} ms (median of {args.repeat})")
+    print(f"create_app         {create_app_ms:8.1f} ms")
+    print(f"peak RSS           {rss_mb:8.1f} MB after {', '.join(f'{u} {s}' for u, s in last['statuses'].items())}")
+    print("\nslowest imports, cumulative:")
+    for cumulative, name in sorted(last["imports"], reverse=True)[: args.top]:
+        print(f"{cumulative / 1000:10.1f} ms  {name}")
+
+    failures = []
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+    if args.max_ms and import_ms > args.max_ms:
+        failures.append(f"import time {import_ms:.1f} ms above {args.max_ms} ms")
+    if args.max_rss_mb and rss_mb > args.max_rss_mb:
+        failures.append(f"RSS {rss_mb:.1f} MB above {args.max_rss_mb} MB")
+
+    if args.out:
+        with open(args.out, "w") as fp:
+            json.dump(
+                {
+                    "import_ms": import_ms,
+                    "create_app_ms": create_app_ms,
+                    "rss_mb": rss_mb,
+                    "lazy_modules_loaded": loaded,
+                    "imports": last["imports"],
+                },
+                fp,
+                indent=2,
+            )
+    if failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
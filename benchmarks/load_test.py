@@ -0,0 +1,189 @@
+"""
+Load test comparing the development server with the production WSGI setup on the same database.
+Each configuration is started as a subprocess and hammered by client threads with a mix of read endpoints,
+optionally while a writer thread keeps committing ingest-sized transactions (`--writer`).
+
+    python benchmarks/load_test.py --db server/instance/db.sqlite --duration 20 --concurrency 32 --writer --out load.json
+
+Configurations: "dev" (app.run, threaded, rollback journal), "wsgi" (gunicorn server.wsgi:app, WAL pragmas).
+Use --configs to run only some of them.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(config, db_path, port, workers, threads):
+    env = dict(
+        os.environ,
+        ICEBERG_DATABASE_URI=f"sqlite:///{os.path.abspath(db_path)}",
+        ICEBERG_RUN_SCHEDULER="0",
+        ICEBERG_SQLITE_WAL="1" if config == "wsgi" else "0",
+        PYTHONPATH=ROOT,
+    )
+    if config == "dev":
+        code = f"from server.app import create_app; create_app().run(port={port}, threaded=True)"
+        cmd = [sys.executable, "-c", code]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "server.wsgi:app", "--bind", f"127.0.0.1:{port}"]
+        cmd += ["--workers", str(workers), "--threads", str(threads), "--log-level", "warning"]
+    if config == "dev":
+        # the dev configuration runs on the default rollback journal, switch a WAL database back
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+    process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health/", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{config} server did not come up")
+
+
+def sample_paths(db_path):
+    with sqlite3.connect(db_path) as conn:
+        iceberg_ids = [row[0] for row in conn.execute("SELECT id FROM iceberg ORDER BY id LIMIT 50")]
+    paths = []
+    for iceberg_id in iceberg_ids:
+        paths += [
+            f"/iceberg_api/iceberg/{iceberg_id}",
+            f"/iceberg_info/basic/{iceberg_id}",
+            f"/iceberg_comments/{iceberg_id}",
+            f"/events/{iceberg_id}",
+        ]
+    paths += ["/events/?start=2010-01-01&end=2012-01-01", "/health/"]
+    return paths
+
+
+def writer(db_path, stop, stats, rows=2000, pause=0.2):
+    """Ingest-like write transactions, insert a batch of observations and remove it again"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    iceberg_id = conn.execute("SELECT id FROM iceberg LIMIT 1").fetchone()[0]
+    now = datetime(2100, 1, 1).isoformat(sep=" ")
+    batch = [(iceberg_id, -60.0, -50.0, now, 0)] * rows
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.executemany(
+            "INSERT INTO iceberg_info (iceberg_id, longitude, latitude, record_time, is_prediction) VALUES (?, ?, ?, ?, ?)",
+            batch,
+        )
+        conn.execute("DELETE FROM iceberg_info WHERE record_time = ?", (now,))
+        conn.commit()
+        stats.append(time.perf_counter() - start)
+        stop.wait(pause)
+    conn.close()
+
+
+def run_load(base_url, paths, concurrency, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        local, failed, i = [], 0, offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                ok = session.get(base_url + path, timeout=30).status_code < 500
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - start)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    lat = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2) if len(lat) else None,
+        "p95_ms": round(float(np.percentile(lat, 95)), 2) if len(lat) else None,
+        "p99_ms": round(float(np.percentile(lat, 99)), 2) if len(lat) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="initialized SQLite database, a copy is used per configuration")
+    parser.add_argument("--configs", default="dev,wsgi")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--writer", action="store_true", help="commit ingest-sized transactions during the test")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    results = {}
+    for config in args.configs.split(","):
+        db_path = f"{args.db}.{config}.loadtest"
+        with sqlite3.connect(args.db) as src, sqlite3.connect(db_path) as dst:
+            src.backup(dst)
+        port = free_port()
+        process = start_server(config, db_path, port, args.workers, args.threads)
+        stop, write_times = threading.Event(), []
+        writer_thread = threading.Thread(target=writer, args=(db_path, stop, write_times)) if args.writer else None
+        try:
+            paths = sample_paths(db_path)
+            run_load(f"http://127.0.0.1:{port}", paths, args.concurrency, min(3.0, args.duration))  # warm up
+            if writer_thread:
+                writer_thread.start()
+            result = run_load(f"http://127.0.0.1:{port}", paths, args.concurrency, args.duration)
+        finally:
+            stop.set()
+            if writer_thread and writer_thread.is_alive():
+                writer_thread.join()
+            process.terminate()
+            process.wait(timeout=30)
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+        if write_times:
+            result["write_transactions"] = len(write_times)
+            result["write_p50_ms"] = round(float(np.median(write_times)) * 1000, 2)
+        results[config] = result
+        print(config, json.dumps(result), flush=True)
+
+    if "dev" in results and "wsgi" in results and results["dev"]["requests_per_second"]:
+        results["speedup"] = round(results["wsgi"]["requests_per_second"] / results["dev"]["requests_per_second"], 2)
+        print("speedup", results["speedup"])
+    if args.out:
+        with open(args.out, "w") as fp:
+            json.dump({"args": vars(args), "results": results}, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
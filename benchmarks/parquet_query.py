@@ -0,0 +1,147 @@
+"""
+Compares the /stats endpoints answered through SQLAlchemy with the same endpoints answered from the
+Parquet export (`?engine=parquet`), and times the export itself from the database and from the CSV archive.
+
+    python benchmarks/parquet_query.py --db server/instance/db.sqlite --out parquet.json
+
+Needs pyarrow. The database is only read, the Parquet datasets are written to a temporary directory.
+"""
+import os
+import sys
+import csv
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+WORK_DIR = tempfile.mkdtemp(prefix="iceberg_parquet_")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from server.app import create_app  # noqa: E402
+from server.config import DATA_DIR  # noqa: E402
+from server.models import db  # noqa: E402
+from server.utils.columnar import export_database, convert_csv_archive  # noqa: E402
+
+ENDPOINTS = [
+    "/stats/active_count_over_time",
+    "/stats/size_distribution_over_time",
+    "/stats/birth_death_locations",
+    "/stats/birth_death_location_trends",
+]
+
+
+# relative difference accepted between floats of both engines, their sums run in a different order
+FLOAT_TOLERANCE = 1e-9
+
+
+def rounded(value):
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {k: rounded(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [rounded(v) for v in value]
+    return value
+
+
+def sort_key(value):
+    """Key ordering list items the same way on both engines despite float noise"""
+    return json.dumps(rounded(value), sort_keys=True)
+
+
+def matches(a, b):
+    """Equal JSON up to FLOAT_TOLERANCE, lists compared in sorted order since row order may differ"""
+    if isinstance(a, float) or isinstance(b, float):
+        return (
+            isinstance(a, (int, float))
+            and isinstance(b, (int, float))
+            and math.isclose(a, b, rel_tol=FLOAT_TOLERANCE, abs_tol=FLOAT_TOLERANCE)
+        )
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(matches(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(
+            matches(x, y) for x, y in zip(sorted(a, key=sort_key), sorted(b, key=sort_key))
+        )
+    return a == b
+
+
+def timed(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times) * 1000
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def parse_csv_rows(data_dir):
+    """The row by row parsing `initialize_db` does, without the database inserts"""
+    rows = 0
+    for csv_file in (f for f in os.listdir(data_dir) if f.endswith(".csv")):
+        with open(os.path.join(data_dir, csv_file)) as fp:
+            for row in csv.DictReader(fp):
+                float(row["lat"]), float(row["lon"]), float(row["size"])
+                rows += 1
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="initialized SQLite database")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="CSV archive to convert")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    parquet_dir = os.path.join(WORK_DIR, "from_db")
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.abspath(args.db)}",
+            "PUBLISHED_DATABASE": None,
+            "PARQUET_DIR": parquet_dir,
+        }
+    )
+    report = {"export": {}, "endpoints": []}
+    with app.app_context():
+        rows, ms = timed(lambda: export_database(db, parquet_dir), 1)
+    report["export"]["database"] = {"rows": rows, "ms": round(ms, 1), "bytes": directory_size(parquet_dir)}
+    csv_dir = os.path.join(WORK_DIR, "from_csv")
+    rows, ms = timed(lambda: convert_csv_archive(args.data_dir, csv_dir), 1)
+    report["export"]["csv_archive"] = {"rows": rows, "ms": round(ms, 1), "bytes": directory_size(csv_dir)}
+    rows, ms = timed(lambda: parse_csv_rows(args.data_dir), 1)
+    report["export"]["csv_row_by_row_parse"] = {"rows": rows, "ms": round(ms, 1)}
+    report["export"]["sqlite_bytes"] = os.path.getsize(args.db)
+    print(json.dumps(report["export"]), flush=True)
+
+    client = app.test_client()
+    for path in ENDPOINTS:
+        sql, sql_ms = timed(lambda: client.get(path), args.repeat)
+        parquet, parquet_ms = timed(lambda: client.get(f"{path}?engine=parquet"), args.repeat)
+        row = {
+            "path": path,
+            "status": {"sql": sql.status_code, "parquet": parquet.status_code},
+            "equal": matches(sql.get_json(), parquet.get_json()),
+            "sql_ms": round(sql_ms, 2),
+            "parquet_ms": round(parquet_ms, 2),
+            "speedup": round(sql_ms / parquet_ms, 2) if parquet_ms else None,
+        }
+        report["endpoints"].append(row)
+        print(json.dumps(row), flush=True)
+
+    if args.out:
+        with open(args.out, "w") as fp:
+            json.dump(report, fp, indent=2)
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+    sys.exit(0 if all(row["equal"] for row in report["endpoints"]) else 1)
+
+
+if __name__ == "__main__":
+    main()
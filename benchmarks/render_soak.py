@@ -0,0 +1,130 @@
+"""
+Soak benchmark for the render pool: submits thousands of trajectory renders from several threads
+and samples the resident memory of the server process and of every render worker.
+Memory should stay flat, workers are recycled after RENDER_TASKS_PER_CHILD renders.
+
+    python benchmarks/render_soak.py --renders 5000 --threads 4 --out soak.json
+
+A fresh worker grows while matplotlib and cartopy load fonts, caches and projections during its first renders,
+so memory is compared per worker lifetime: the RSS once warm (after WARMUP_SHARE of its samples) against the RSS
+at the end of its life, and the warm RSS of the first against the last worker generation. A leak shows as growth
+within lifetimes or from one generation to the next, warm-up as a plateau.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from server.utils import rendering  # noqa: E402
+from server.utils.rendering import render, render_trajectory_png, RenderQueueFull  # noqa: E402
+
+# share of a worker's samples taken as its warm-up
+WARMUP_SHARE = 0.25
+
+
+def rss_mb(pid):
+    """Resident set size of a process in MiB (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as fp:
+            for line in fp:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return 0.0
+
+
+def sample(done, samples, interval):
+    start = time.perf_counter()
+    while not done.wait(interval):
+        workers = {pid: round(rss_mb(pid), 1) for pid in list(getattr(rendering.get_pool(), "_processes", {}) or {})}
+        samples.append(
+            {
+                "t": round(time.perf_counter() - start, 2),
+                "parent_rss_mb": round(rss_mb(os.getpid()), 1),
+                "worker_rss_mb": round(sum(workers.values()), 1),
+                "workers": len(workers),
+                "per_worker_rss_mb": {str(pid): rss for pid, rss in workers.items() if rss},
+            }
+        )
+
+
+def worker_lifetimes(samples):
+    """(warm RSS, end of life RSS) of every worker seen in at least 4 samples, in order of appearance"""
+    series = {}
+    for s in samples:
+        for pid, rss in s["per_worker_rss_mb"].items():
+            series.setdefault(pid, []).append(rss)
+    lifetimes = []
+    for rss in series.values():
+        if len(rss) >= 4:
+            warm = rss[int(len(rss) * WARMUP_SHARE) :]
+            lifetimes.append((min(warm), rss[-1]))
+    return lifetimes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--points", type=int, default=500, help="points per trajectory")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between memory samples")
+    parser.add_argument("--out", default=None, help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lons = (rng.normal(0, 1, args.points).cumsum() - 40).tolist()
+    lats = (rng.normal(0, 0.3, args.points).cumsum() - 65).tolist()
+    rejected = [0]
+
+    def one(_):
+        while True:
+            try:
+                return len(render(render_trajectory_png, "soak", lons, lats, "2000-01-01", "2001-01-01"))
+            except RenderQueueFull:
+                rejected[0] += 1
+                time.sleep(0.01)
+
+    samples, done = [], threading.Event()
+    sampler = threading.Thread(target=sample, args=(done, samples, args.interval), daemon=True)
+    start = time.perf_counter()
+    sampler.start()
+    with ThreadPoolExecutor(args.threads) as executor:
+        sizes = list(executor.map(one, range(args.renders)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    lifetimes = worker_lifetimes(samples)
+    # the last workers are cut off by the end of the run, their lifetime is incomplete
+    complete = lifetimes[: -rendering.RENDER_WORKERS] or lifetimes
+    first, last = complete[: rendering.RENDER_WORKERS], complete[-rendering.RENDER_WORKERS :]
+    result = {
+        "renders": args.renders,
+        "elapsed_s": round(elapsed, 2),
+        "renders_per_s": round(args.renders / elapsed, 2),
+        "rejected_submissions": rejected[0],
+        "png_bytes": sizes[-1] if sizes else 0,
+        "worker_lifetimes": len(lifetimes),
+        "first_generation_warm_rss_mb": round(float(np.mean([w for w, _ in first])), 1) if complete else None,
+        "last_generation_warm_rss_mb": round(float(np.mean([w for w, _ in last])), 1) if complete else None,
+        "max_growth_within_lifetime_mb": round(max(end - warm for warm, end in complete), 1) if complete else None,
+        "peak_parent_rss_mb": max((s["parent_rss_mb"] for s in samples), default=None),
+        "samples": samples,
+    }
+    summary = {k: v for k, v in result.items() if k != "samples"}
+    print(json.dumps(summary, indent=2))
+    if args.out:
+        with open(args.out, "w") as fp:
+            json.dump(result, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
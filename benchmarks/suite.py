@@ -0,0 +1,265 @@
+"""
+Benchmark suite over the bundled dataset. Bootstraps a fresh SQLite database from the CSV archive,
+times ingestion, the scraper parsing of the saved SCP page and every route of the iceberg_api,
+iceberg_info and stats blueprints through the Flask test client, and writes the results as JSON.
+
+    python benchmarks/suite.py --out results.json
+    python benchmarks/suite.py --scale 10 --out results_x10.json        # 10x synthetic dataset
+    python benchmarks/suite.py --rows 5000000 --out results_5m.json     # simulated families instead of the archive
+    python benchmarks/suite.py --baseline results.json --out new.json   # compare, exits 1 on regressions
+
+Cases are named "<group>.<name>", `--filter` runs the cases containing a substring (ingestion always runs).
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import timedelta
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import func  # noqa: E402
+
+from server.app import create_app  # noqa: E402
+from server.config import DATA_DIR  # noqa: E402
+from server.models import db, IcebergInfo  # noqa: E402
+from server.models.routing import primary_reads  # noqa: E402
+from server.repository import get_repository  # noqa: E402
+from server.utils.load_data import initialize_db  # noqa: E402
+from server.utils.hooks import parse_current_iceberg_location, get_iceberg_details  # noqa: E402
+from server.utils.track_store import build_track_store  # noqa: E402
+from synthetic import scale_dataset, generate_dataset  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FIXTURE = os.path.join(ROOT, "data", "fixtures", "current_icebergs.html")
+BLUEPRINTS = ("iceberg_api", "iceberg_info", "vis_api")
+
+
+def timed(fn, repeat, warmup=1):
+    """Run `fn` warmup + repeat times, returns (last result, per-run seconds of the timed runs)"""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+def summarize(times, **extra):
+    ms = sorted(t * 1000 for t in times)
+    return {
+        "runs": len(ms),
+        "min_ms": round(ms[0], 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(0.95 * len(ms)))], 3),
+        **extra,
+    }
+
+
+def sample_parameters(app):
+    """Ids and dates the route cases are built from, taken from the loaded data"""
+    with app.app_context():
+        busiest = (
+            db.session.query(IcebergInfo.iceberg_id)
+            .group_by(IcebergInfo.iceberg_id)
+            .order_by(func.count().desc(), IcebergInfo.iceberg_id)
+            .first()[0]
+        )
+        latest = db.session.query(func.max(IcebergInfo.record_time)).scalar()
+        track = get_repository().track(busiest)
+    start = latest - timedelta(days=60)
+    waypoints = [
+        {"latitude": p.latitude, "longitude": p.longitude, "time": p.record_time.isoformat()} for p in track[-30::10]
+    ]
+    return {
+        "iceberg_id": busiest,
+        "params": {
+            "iceberg_api.get_iceberg_locations_in_bounds": {"minLat": -80, "maxLat": -50, "minLon": -70, "maxLon": 20},
+            "iceberg_api.get_nearest_icebergs": {"lat": -65, "lon": -50, "k": 10, "date": latest.strftime("%Y-%m-%d")},
+            "iceberg_api.get_snapshot_at_time": {"time": latest.isoformat()},
+            "iceberg_api.get_snapshot_frames": {"start": start.isoformat(), "end": latest.isoformat(), "step_hours": 24},
+            "iceberg_info.iceberg_trajectories": {"ids": f"{busiest},a6*", "format": "json"},
+        },
+        "bodies": {
+            "iceberg_api.get_route_encounters": {"route": waypoints, "radius_km": 100},
+        },
+    }
+
+
+def route_cases(app, sample):
+    """One request per route of the benchmarked blueprints, (name, method, url, json body)"""
+    cases = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if rule.endpoint.split(".")[0] not in BLUEPRINTS:
+            continue
+        method = "POST" if "POST" in rule.methods else "GET"
+        values = {name: sample["iceberg_id"] for name in rule.arguments}
+        with app.test_request_context():
+            url = app.url_for(rule.endpoint, **values, **sample["params"].get(rule.endpoint, {}))
+        cases.append((f"route.{rule.endpoint}", method, url, sample["bodies"].get(rule.endpoint)))
+    return cases
+
+
+def sql_queries(response):
+    """Statement count from the Server-Timing header"""
+    timing = response.headers.get("Server-Timing", "")
+    for part in timing.split(","):
+        if part.strip().startswith("sql;") and 'desc="' in part:
+            return int(part.split('desc="')[1].split()[0])
+    return None
+
+
+def bootstrap(app, data_dir, results):
+    with app.app_context(), primary_reads():
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        get_repository().prepare()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):  # initialize_db reports every file
+            initialize_db(data_dir=data_dir, db=db)
+        results["ingest.initialize_db"] = summarize([time.perf_counter() - start])
+        get_repository().analyze()
+        rows, times = timed(lambda: build_track_store(db, app.config["TRACK_STORE"]), 1, warmup=0)
+        results["ingest.track_store"] = summarize(times, rows=rows)
+    return rows
+
+
+def run_suite(args, work_dir):
+    data_dir = args.data_dir
+    if args.rows:
+        data_dir = os.path.join(work_dir, "data")
+        generate_dataset(data_dir, args.rows, seed=args.seed)
+    elif args.scale > 1:
+        data_dir = os.path.join(work_dir, "data")
+        scale_dataset(args.data_dir, data_dir, args.scale, seed=args.seed)
+
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(work_dir, 'bench.sqlite')}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": os.path.join(work_dir, "tracks.bin"),
+            "SNAPSHOT_DIR": os.path.join(work_dir, "snapshots"),
+        }
+    )
+    results = {}
+    rows = bootstrap(app, data_dir, results)
+
+    def selected(name):
+        return not args.filter or args.filter in name
+
+    with open(FIXTURE, "r") as fp:
+        html = fp.read()
+    (location_data, revised_date), times = timed(lambda: parse_current_iceberg_location(html), args.repeat)
+    if selected("scraper.parse_current_iceberg_location"):
+        results["scraper.parse_current_iceberg_location"] = summarize(times, rows=len(location_data))
+    if selected("scraper.get_iceberg_details"):
+        details, times = timed(lambda: get_iceberg_details(location_data, revised_date), args.repeat)
+        results["scraper.get_iceberg_details"] = summarize(times, rows=len(details))
+
+    client = app.test_client()
+    for name, method, url, body in route_cases(app, sample_parameters(app)):
+        if not selected(name):
+            continue
+        send = (lambda: client.post(url, json=body)) if method == "POST" else (lambda: client.get(url))
+        response, times = timed(send, args.repeat)
+        results[name] = summarize(
+            times,
+            method=method,
+            url=url,
+            status=response.status_code,
+            bytes=len(response.data),
+            sql_queries=sql_queries(response),
+        )
+        print(f"{name:<60} {results[name]['median_ms']:>10.2f} ms  {response.status_code}", flush=True)
+    return rows, results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Median ratios against a baseline, returns the names of cases slower than `threshold` times"""
+    regressions = []
+    print(f"\n{'case':<60} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name in sorted(set(results) | set(baseline)):
+        if name not in results or name not in baseline:
+            print(f"{name:<60} {'only in ' + ('baseline' if name in baseline else 'current'):>29}")
+            continue
+        old, new = baseline[name]["median_ms"], results[name]["median_ms"]
+        ratio = new / old if old else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"{name:<60} {old:>10.2f} {new:>10.2f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--scale", type=int, default=1, help="synthetic dataset size, e.g. 10 or 100 times the archive")
+    parser.add_argument("--rows", type=int, help="run on a simulated dataset of this many rows, see synthetic.py")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter")
+    parser.add_argument("--out")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="median ratio reported as a regression")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="iceberg_bench_")
+    try:
+        rows, results = run_suite(args, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scale": args.scale,
+            "synthetic_rows": args.rows,
+            "observations": rows,
+            "repeat": args.repeat,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+        if baseline["meta"]["scale"] != args.scale:
+            print(f"baseline was run at scale {baseline['meta']['scale']}, this run at scale {args.scale}")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold}x")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Synthetic datasets in the CSV schema of the archive (`date,date_gap,disp,flags,lat,lon,mask,size,vel_angle`),
+for load and scaling benchmarks. Two modes:
+
+    python benchmarks/synthetic.py scale --factor 10 --out /tmp/icebergs_x10
+    python benchmarks/synthetic.py generate --rows 20000000 --out /tmp/icebergs_20m
+
+`scale` copies every iceberg file `factor - 1` times under new ids, with the track shifted by a random offset
+and the areas scaled. Copy k of iceberg "a23a" is named "s{k}a23a", the copies of one family form a family of
+their own.
+
+`generate` simulates new iceberg families from scratch: a root iceberg drifts with one of the DRIFT_MODELS,
+loses area every day and calves children that start where the parent was and continue with their own drift,
+until they are too small to track or the time range ends. Families are numbered from FIRST_FAMILY so their ids
+never collide with real designations and still follow the naming the lineage is derived from ("a1000",
+"a1000b", "a1000b2"). Rows are written one at a time, memory does not grow with the size of the dataset.
+"""
+import os
+import sys
+import csv
+import math
+import random
+import time
+import shutil
+import argparse
+from datetime import date, timedelta
+from typing import NamedTuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from server.config import DATA_DIR  # noqa: E402
+
+# largest random shift of a copied track, in degrees
+MAX_LAT_SHIFT = 2.0
+MAX_LON_SHIFT = 20.0
+
+
+def synthetic_id(iceberg_id, copy):
+    return f"s{copy}{iceberg_id}"
+
+
+def scale_dataset(source_dir, target_dir, factor, seed=0):
+    """Write the original files and their copies to `target_dir`, returns the number of rows written"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(target_dir, exist_ok=True)
+    rows = 0
+    for csv_file in sorted(f for f in os.listdir(source_dir) if f.endswith(".csv")):
+        source = os.path.join(source_dir, csv_file)
+        shutil.copy(source, target_dir)
+        iceberg_id = os.path.splitext(csv_file)[0]
+        for copy in range(1, factor):
+            lat_shift = rng.uniform(-MAX_LAT_SHIFT, MAX_LAT_SHIFT)
+            lon_shift = rng.uniform(-MAX_LON_SHIFT, MAX_LON_SHIFT)
+            area_scale = rng.uniform(0.5, 1.5)
+            target = os.path.join(target_dir, f"{synthetic_id(iceberg_id, copy)}.csv")
+            with open(source, "r", newline="") as src, open(target, "w", newline="") as dst:
+                reader = csv.DictReader(src)
+                writer = csv.DictWriter(dst, fieldnames=reader.fieldnames)
+                writer.writeheader()
+                for row in reader:
+                    row["lat"] = f"{min(-40.0, max(-90.0, float(row['lat']) + lat_shift)):.2f}"
+                    row["lon"] = f"{(float(row['lon']) + lon_shift + 180) % 360 - 180:.2f}"
+                    row["size"] = f"{float(row['size']) * area_scale:.1f}"
+                    writer.writerow(row)
+                    rows += 1
+        with open(source, "r") as src:
+            rows += sum(1 for _ in src) - 1
+    return rows
+
+
+class DriftModel(NamedTuple):
+    """Daily drift in km: a westward coastal current south of `front_lat`, an eastward circumpolar current north of it"""
+
+    coastal_speed: float  # km/day, westward
+    circumpolar_speed: float  # km/day, eastward
+    northward_speed: float  # km/day
+    front_lat: float
+    persistence: float  # AR(1) coefficient of the turbulent part
+    noise: float  # km/day, standard deviation of the turbulent part
+    grounding: float  # daily chance of running aground south of the front
+    decay: float  # daily relative area loss south of the front, grows linearly northward
+
+
+DRIFT_MODELS = {
+    "coastal": DriftModel(8.0, 6.0, 0.5, -63.0, 0.9, 3.0, 0.004, 0.0004),
+    "gyre": DriftModel(5.0, 4.0, 1.5, -66.0, 0.8, 4.0, 0.001, 0.0006),
+    "circumpolar": DriftModel(4.0, 12.0, 2.0, -68.0, 0.7, 6.0, 0.0005, 0.0010),
+}
+
+KM_PER_DEGREE = 111.2
+FIRST_FAMILY = 1000
+SECTORS = "abcd"  # designation letter of a family, from its longitude
+MIN_AREA = 20.0  # km², smaller icebergs are no longer tracked
+MAX_GENERATION = 3
+CALVING_RATE = 0.002  # daily chance of calving for an iceberg of 1000 km², grows with the square root of the area
+GAP_PROBABILITY = 0.01  # daily chance of a missed observation run, 2 to 14 days
+SIZE_MISSING = 0.4  # share of rows without an area measurement
+# most frequent flag values of the archive and their counts
+FLAGS = ((7, 80090), (3, 47441), (5, 44571), (17, 33412), (19, 18447), (15, 15913), (13, 12391), (4, 12285), (6, 11950))
+
+
+class Calving(NamedTuple):
+    day: date
+    lat: float
+    lon: float
+    area: float
+
+
+def _sector(lon):
+    # the National Ice Center letters: A 0-90W, B 90W-180, C 90E-180, D 0-90E
+    if lon < -90:
+        return "b"
+    if lon < 0:
+        return "a"
+    return "d" if lon < 90 else "c"
+
+
+def _child_id(parent_id, index, generation):
+    # letters and digits alternate from one generation to the next, so lineage_path can split them
+    return parent_id + (chr(ord("a") + index) if generation % 2 else str(index + 1))
+
+
+def simulate_track(writer, rng, model, start, end, lat, lon, area, generation):
+    """
+    Write the daily observations of one iceberg from `start` until it melts below MIN_AREA or `end`,
+    returns (rows written, calvings). Only the calvings are kept in memory, never the track.
+    """
+    flag_values, flag_weights = zip(*FLAGS)
+    calvings = []
+    rows, day, gap = 0, start, 0
+    prev_lat, prev_lon = lat, lon
+    turb_u = turb_v = 0.0
+    grounded = 0
+    while day <= end and area >= MIN_AREA:
+        if grounded:
+            grounded -= 1
+        elif lat < model.front_lat and rng.random() < model.grounding:
+            grounded = rng.randint(10, 200)
+        else:
+            turb_u = model.persistence * turb_u + rng.gauss(0.0, model.noise)
+            turb_v = model.persistence * turb_v + rng.gauss(0.0, model.noise)
+            u = (-model.coastal_speed if lat < model.front_lat else model.circumpolar_speed) + turb_u
+            v = model.northward_speed + turb_v
+            lat += v / KM_PER_DEGREE
+            lon += u / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.1))
+            if lat < -78.0:  # the ice shelf fronts
+                lat = -156.0 - lat
+            lon = (lon + 180.0) % 360.0 - 180.0
+
+        area *= 1.0 - model.decay * (1.0 + max(0.0, lat - model.front_lat) * 0.5)
+        if generation < MAX_GENERATION and rng.random() < CALVING_RATE * math.sqrt(area / 1000.0):
+            piece = area * rng.uniform(0.05, 0.3)
+            if piece >= MIN_AREA:
+                area -= piece
+                calvings.append(Calving(day, lat, lon, piece))
+
+        if gap:
+            gap -= 1
+        else:
+            disp = KM_PER_DEGREE * math.hypot(lat - prev_lat, (lon - prev_lon) * math.cos(math.radians(lat)))
+            if lat < -67.5:
+                mask = 0
+            elif 5 <= day.month <= 10 or lat < -63.0:
+                mask = 1
+            else:
+                mask = 2
+            size = 0.0 if rng.random() < SIZE_MISSING else area * rng.uniform(0.95, 1.05)
+            vel_angle = 0.0 if rng.random() < 0.6 else rng.gauss(0.0, 0.03)
+            writer.writerow(
+                (
+                    f"{day.year}{day.timetuple().tm_yday:03d}",
+                    0 if rows == 0 else (day - prev_day).days,
+                    f"{disp:.3f}",
+                    rng.choices(flag_values, flag_weights)[0],
+                    f"{lat:.3f}",
+                    f"{lon:.3f}",
+                    mask,
+                    f"{size:.2f}" if size else 0,
+                    f"{vel_angle:.4f}" if vel_angle else 0,
+                )
+            )
+            rows += 1
+            prev_lat, prev_lon, prev_day = lat, lon, day
+            if rng.random() < GAP_PROBABILITY:
+                gap = rng.randint(1, 13)
+        day += timedelta(days=1)
+    return rows, calvings
+
+
+def generate_dataset(target_dir, rows, start_year=1992, end_year=2025, drift=None, seed=0):
+    """
+    Simulate families until at least `rows` rows are written to `target_dir`, returns (rows, icebergs).
+    Family k is simulated from its own seed, so a larger `rows` extends a smaller dataset of the same seed.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    first, last = date(start_year, 1, 1), date(end_year, 12, 31)
+    written = icebergs = 0
+    family = FIRST_FAMILY
+    while written < rows:
+        rng = random.Random(seed * 1_000_003 + family)
+        model = DRIFT_MODELS[drift or rng.choice(sorted(DRIFT_MODELS))]
+        lon = rng.uniform(-180.0, 180.0)
+        start = first + timedelta(days=rng.randrange((last - first).days))
+        # (id, generation, start, lat, lon, area), children are simulated after their parent is written
+        pending = [(f"{_sector(lon)}{family}", 0, start, rng.uniform(-77.0, -68.0), lon, rng.lognormvariate(6.5, 0.8))]
+        while pending:
+            iceberg_id, generation, start, lat, lon, area = pending.pop()
+            with open(os.path.join(target_dir, f"{iceberg_id}.csv"), "w", newline="") as fp:
+                writer = csv.writer(fp)
+                writer.writerow(("date", "date_gap", "disp", "flags", "lat", "lon", "mask", "size", "vel_angle"))
+                count, calvings = simulate_track(writer, rng, model, start, last, lat, lon, area, generation)
+            written += count
+            icebergs += 1
+            # beyond 26 children the letters run out, the remaining pieces are too small to be named anyway
+            for index, calving in enumerate(calvings[:26]):
+                child = _child_id(iceberg_id, index, generation + 1)
+                pending.append((child, generation + 1, calving.day + timedelta(days=1), *calving[1:]))
+        family += 1
+    return written, icebergs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    scale = commands.add_parser("scale", help="copies of the archive under new ids")
+    scale.add_argument("--source", default=DATA_DIR)
+    scale.add_argument("--factor", type=int, default=10)
+    generate = commands.add_parser("generate", help="simulated iceberg families")
+    generate.add_argument("--rows", type=int, required=True)
+    generate.add_argument("--start-year", type=int, default=1992)
+    generate.add_argument("--end-year", type=int, default=2025)
+    generate.add_argument("--drift", choices=sorted(DRIFT_MODELS), help="one drift model for every family")
+    for command in (scale, generate):
+        command.add_argument("--seed", type=int, default=0)
+        command.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    if args.command == "scale":
+        rows = scale_dataset(args.source, args.out, args.factor, seed=args.seed)
+        print(f"wrote {rows} rows to {args.out}")
+    else:
+        start = time.perf_counter()
+        rows, icebergs = generate_dataset(
+            args.out, args.rows, start_year=args.start_year, end_year=args.end_year, drift=args.drift, seed=args.seed
+        )
+        print(f"wrote {rows} rows of {icebergs} icebergs to {args.out} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,270 @@
 import os
-import matplotlib
+import click
+from functools import partial
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
 from flask import Flask
 
-from server.routes.auth import auth_bp
 from server.utils.load_data import initialize_db, get_new_data
-from server.config import JWT_SECRET_KEY, SQLALCHEMY_DATABASE_URI
-from server.models import db
-from server.routes import auth_bp, comment_bp, iceberg_info_bp, iceberg_api_bp, vis_api_bp
+from server.config import (
+    SECRET_KEY,
+    JWT_SECRET_KEY,
+    BCRYPT_LOG_ROUNDS,
+    SQLALCHEMY_DATABASE_URI,
+    CORS_ORIGINS,
+    DATA_DIR,
+    SNAPSHOT_DIR,
+    LEGACY_SNAPSHOT_JSON,
+    SCRAPE_INTERVAL,
+    ROLLUP_REFRESH_INTERVAL,
+    PREWARM_INTERVAL,
+    PREWARM_MAX_ZOOM,
+    RUN_SCHEDULER,
+    SCHEDULER_LOCK,
+    EXPORT_DIR,
+    PUBLISHED_DATABASE,
+    PUBLISH_INTERVAL,
+    PARQUET_DIR,
+    TRACK_STORE,
+)
+from server.models import db, bcrypt
+from server.models.routing import PUBLISHED_BIND, primary_reads
+from server.repository import get_repository
+from server.utils.identity import jwt
+from server.utils import observations
+from server.utils.columnar import export_database, convert_csv_archive
+from server.utils.metrics import init_metrics
+from server.utils.database import engine_options, enable_sqlite_pragmas, upgrade_schema
+from server.utils.publish import (
+    published_uri,
+    publish_database,
+    primary_changed_since_publish,
+    refresh_published_engine,
+)
+from server.utils.scheduler import Scheduler, acquire_process_lock
+from server.utils.snapshot_store import get_snapshot_store
+from server.utils.track_store import build_track_store
+from server.utils.tiles import PROJECTIONS, build_position_tile, render_density_tile
+from server.routes import (
+    auth_bp,
+    comment_bp,
+    iceberg_info_bp,
+    iceberg_api_bp,
+    vis_api_bp,
+    tiles_bp,
+    health_bp,
+    exports_bp,
+    events_bp,
+    metrics_bp,
+)
 
-matplotlib.use("Agg")
 
-app = Flask(__name__)
-cors = CORS(app, origins="http://localhost:5173")  # only allow front end queries
-app.config["SQLALCHEMY_DATABASE_URI"] = SQLALCHEMY_DATABASE_URI
-app.config["JWT_SECRET_KEY"] = JWT_SECRET_KEY
-db.init_app(app)
-JWTManager(app)
+def create_app(config=None):
+    """
+    Application factory, used by the development server below and by WSGI servers through `server.wsgi`.
+    `config` overrides settings from `server.config`, e.g. another SQLALCHEMY_DATABASE_URI.
+    """
+    app = Flask(__name__)
+    CORS(app, origins=CORS_ORIGINS)  # only allow front end queries
+    app.config["SECRET_KEY"] = SECRET_KEY
+    app.config["SQLALCHEMY_DATABASE_URI"] = SQLALCHEMY_DATABASE_URI
+    app.config["JWT_SECRET_KEY"] = JWT_SECRET_KEY
+    app.config["BCRYPT_LOG_ROUNDS"] = BCRYPT_LOG_ROUNDS
+    app.config["PUBLISHED_DATABASE"] = PUBLISHED_DATABASE
+    app.config["TRACK_STORE"] = TRACK_STORE
+    app.config["SNAPSHOT_DIR"] = SNAPSHOT_DIR
+    app.config["PARQUET_DIR"] = PARQUET_DIR
+    app.config["SCHEDULER_LOCK"] = SCHEDULER_LOCK
+    app.config["EXPORT_DIR"] = EXPORT_DIR
+    app.config.update(config or {})
+    # runtime state lives in the instance folder, absolute paths are kept as they are
+    for key in ("TRACK_STORE", "SNAPSHOT_DIR", "PARQUET_DIR", "SCHEDULER_LOCK", "EXPORT_DIR"):
+        if app.config[key]:
+            app.config[key] = os.path.join(app.instance_path, app.config[key])
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+    if app.config["PUBLISHED_DATABASE"]:
+        # API reads go to the published snapshot, see RoutingSession
+        published = os.path.join(app.instance_path, app.config["PUBLISHED_DATABASE"])
+        app.config["PUBLISHED_DATABASE"] = published
+        app.config.setdefault("SQLALCHEMY_BINDS", {})[PUBLISHED_BIND] = {"url": published_uri(published)}
 
-app.register_blueprint(auth_bp, url_prefix="/auth")
-app.register_blueprint(iceberg_info_bp, url_prefix="/iceberg_info")
-app.register_blueprint(iceberg_api_bp, url_prefix="/iceberg_api")
-app.register_blueprint(comment_bp, url_prefix="/iceberg_comments")
-app.register_blueprint(vis_api_bp, url_prefix="/stats")
+        @app.before_request
+        def _pick_up_published_database():
+            refresh_published_engine(published, on_change=observations.invalidate)
 
+    db.init_app(app)
+    bcrypt.init_app(app)
+    jwt.init_app(app)
+    init_metrics(app)
+    with app.app_context():
+        enable_sqlite_pragmas(db.engine)
+
+    app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(iceberg_info_bp, url_prefix="/iceberg_info")
+    app.register_blueprint(iceberg_api_bp, url_prefix="/iceberg_api")
+    app.register_blueprint(comment_bp, url_prefix="/iceberg_comments")
+    app.register_blueprint(vis_api_bp, url_prefix="/stats")
+    app.register_blueprint(tiles_bp, url_prefix="/tiles")
+    app.register_blueprint(health_bp, url_prefix="/health")
+    app.register_blueprint(exports_bp, url_prefix="/exports")
+    app.register_blueprint(events_bp, url_prefix="/events")
+    app.register_blueprint(metrics_bp, url_prefix="/metrics")
+
+    @app.cli.command("init-db")
+    @click.option("--data-dir", default=DATA_DIR, show_default=True)
+    def init_db_command(data_dir):
+        """Drop all tables and load the static iceberg data again"""
+        _initialize_database(app, data_dir)
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db_command():
+        """Add the tables, columns and indexes a database created by an earlier version lacks, keeps all data"""
+        statements = _upgrade_database(app)
+        for statement in statements:
+            click.echo(statement)
+        click.echo(f"{len(statements)} schema changes")
+
+    @app.cli.command("publish-db")
+    def publish_db_command():
+        """Publish the read-only snapshot of the primary database"""
+        click.echo(f"published in {_publish(app):.1f}s")
+
+    @app.cli.command("export-parquet")
+    @click.option("--from-csv", "data_dir", default=None, help="convert this CSV archive instead of the database")
+    def export_parquet_command(data_dir):
+        """Write all observations to the year partitioned Parquet dataset at PARQUET_DIR"""
+        if data_dir:
+            rows = convert_csv_archive(data_dir, app.config["PARQUET_DIR"])
+        else:
+            rows = _export_parquet(app)
+        click.echo(f"exported {rows} observations to {app.config['PARQUET_DIR']}")
+
+    return app
 
-def _initialize_database(data_dir):
+
+def _publish(app, only_if_changed=False):
+    """Publish the primary database when a published snapshot is configured, returns the seconds taken or None"""
+    target = app.config["PUBLISHED_DATABASE"]
+    if not target:
+        return None
     with app.app_context():
-        db.drop_all()  # ! for debugging mode only
-        db.create_all()
+        if db.engine.dialect.name != "sqlite":
+            raise RuntimeError("Publishing a read-only snapshot requires a SQLite primary database")
+        source = db.engine.url.database
+    if only_if_changed and not primary_changed_since_publish(source, target):
+        return None
+    return publish_database(source, target)
+
+
+def _export_parquet(app):
+    with app.app_context(), primary_reads():
+        return export_database(db, app.config["PARQUET_DIR"])
+
+
+def _upgrade_database(app):
+    with app.app_context(), primary_reads():
+        db.create_all(bind_key=None)  # the published snapshot is read-only and may not exist yet
+        statements = upgrade_schema(db.engine, db.metadata)
+        get_repository().prepare()
+    if statements:
+        _publish(app)
+    return statements
+
+
+def _build_track_store(app):
+    if app.config["TRACK_STORE"]:
+        with app.app_context(), primary_reads():
+            build_track_store(db, app.config["TRACK_STORE"])
+
+
+def _initialize_database(app, data_dir):
+    with app.app_context(), primary_reads():
+        db.drop_all(bind_key=None)  # ! for debugging mode only
+        db.create_all(bind_key=None)
+        get_repository().prepare()
         initialize_db(data_dir=data_dir, db=db)
+        get_repository().analyze()
+    _publish(app)
+    _build_track_store(app)
+
+
+def _get_new_data(app):
+    store = get_snapshot_store(app.config["SNAPSHOT_DIR"], legacy_json_path=LEGACY_SNAPSHOT_JSON)
+    with app.app_context(), primary_reads():
+        inserted = get_new_data(snapshot_store=store, db=db)
+    if inserted:
+        _publish(app)
+        observations.invalidate()
+        _build_track_store(app)
+        if os.path.isdir(app.config["PARQUET_DIR"]):
+            _export_parquet(app)
+    return inserted
+
+
+def _refresh_rollups(app):
+    """Reload the in-memory observation arrays behind tiles and aggregates if the dataset changed"""
+    with app.app_context():
+        version = observations.dataset_version(force=True)
+        observations.get_observations()
+    return version
 
 
-def _get_new_data(data_dir):
-    json_path = os.path.join(data_dir, "icebergs.json")
+def _prewarm_caches(app):
+    """Build low zoom tiles and load the newest snapshot so first requests hit warm caches"""
+    warmed = 0
     with app.app_context():
-        get_new_data(scraped_json_path=json_path, db=db)
+        obs = observations.get_observations()
+        for projection in PROJECTIONS:
+            for z in range(PREWARM_MAX_ZOOM + 1):
+                for x in range(2**z):
+                    for y in range(2**z):
+                        build_position_tile(obs, projection, z, x, y)
+                        render_density_tile(obs, projection, z, x, y)
+                        warmed += 1
+    get_snapshot_store(app.config["SNAPSHOT_DIR"], legacy_json_path=LEGACY_SNAPSHOT_JSON).latest()
+    return warmed
+
+
+def create_scheduler(app, **kwargs):
+    """Background jobs for scraping, ingestion and cache refresh, request threads never run them"""
+    scheduler = Scheduler(**kwargs)
+    scheduler.add_job("scrape", partial(_get_new_data, app), SCRAPE_INTERVAL)
+    scheduler.add_job("refresh_rollups", partial(_refresh_rollups, app), ROLLUP_REFRESH_INTERVAL)
+    scheduler.add_job("prewarm", partial(_prewarm_caches, app), PREWARM_INTERVAL)
+    if app.config["PUBLISHED_DATABASE"]:
+        # picks up writes made by users, ingestion publishes right away
+        scheduler.add_job("publish", partial(_publish, app, only_if_changed=True), PUBLISH_INTERVAL)
+    app.extensions["scheduler"] = scheduler
+    return scheduler
+
+
+def start_background_jobs(app):
+    """
+    Start the scheduler in this process unless RUN_SCHEDULER is off or another worker process already runs it.
+    Returns the started scheduler or None.
+    """
+    if not RUN_SCHEDULER:
+        return None
+    lock = acquire_process_lock(app.config["SCHEDULER_LOCK"])
+    if lock is None:
+        return None
+    app.extensions["scheduler_lock"] = lock
+    # ingest writes the columns added since the database was created, see `flask upgrade-db`
+    _upgrade_database(app)
+    if app.config["PUBLISHED_DATABASE"] and not os.path.exists(app.config["PUBLISHED_DATABASE"]):
+        _publish(app)
+    if app.config["TRACK_STORE"] and not os.path.exists(app.config["TRACK_STORE"]):
+        _build_track_store(app)
+    scheduler = create_scheduler(app)
+    scheduler.start()
+    return scheduler
 
 
 if __name__ == "__main__":
+    app = create_app()
     # ! do not reload the database after initialization
-    _initialize_database(data_dir="../data/data")
-    # optionally scrape new data from web page
-    _get_new_data(data_dir="../data/data")
+    _initialize_database(app, data_dir="../data/data")
+    # scraping runs in the background so the server comes up even if the remote site is slow,
+    # with the reloader this script runs twice and only the serving child process starts the jobs
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_jobs(app)
     app.run(debug=True, port=8080)
@@ -1,5 +1,72 @@
-SECRET_KEY = "iceberg_database_design"
-JWT_SECRET_KEY = "iceberg_database_design_jwt"
-SQLALCHEMY_DATABASE_URI = "sqlite:///db.sqlite"
+import os
+
+# every setting below reading os.environ can be overridden with an ICEBERG_* environment variable in production
+SECRET_KEY = os.environ.get("ICEBERG_SECRET_KEY", "iceberg_database_design")
+JWT_SECRET_KEY = os.environ.get("ICEBERG_JWT_SECRET_KEY", "iceberg_database_design_jwt")
+SQLALCHEMY_DATABASE_URI = os.environ.get("ICEBERG_DATABASE_URI", "sqlite:///db.sqlite")
 # ROOT_PWD = "tongji_iceberg_database"
-ROOT_PWD = "111"
\ No newline at end of file
+ROOT_PWD = os.environ.get("ICEBERG_ROOT_PWD", "111")
+CORS_ORIGINS = os.environ.get("ICEBERG_CORS_ORIGINS", "http://localhost:5173").split(",")
+# SQLAlchemy connection pool, per worker process
+DB_POOL_SIZE = int(os.environ.get("ICEBERG_DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("ICEBERG_DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.environ.get("ICEBERG_DB_POOL_TIMEOUT", 30))  # seconds
+DB_POOL_RECYCLE = int(os.environ.get("ICEBERG_DB_POOL_RECYCLE", 1800))  # seconds
+# SQLite runs in WAL mode so readers are not blocked by ingestion writes
+SQLITE_WAL = os.environ.get("ICEBERG_SQLITE_WAL", "1") == "1"
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("ICEBERG_SQLITE_BUSY_TIMEOUT", 5000))  # milliseconds
+# when set, ingestion writes to SQLALCHEMY_DATABASE_URI and publishes a read-only copy to this file for API reads,
+# relative paths are resolved against the Flask instance folder
+PUBLISHED_DATABASE = os.environ.get("ICEBERG_PUBLISHED_DATABASE")
+PUBLISH_INTERVAL = int(os.environ.get("ICEBERG_PUBLISH_INTERVAL", 60))  # seconds, publishes only if the primary changed
+# background jobs run in one process only, the one holding SCHEDULER_LOCK
+RUN_SCHEDULER = os.environ.get("ICEBERG_RUN_SCHEDULER", "1") == "1"
+# relative paths of this and the other runtime files below are resolved against the Flask instance folder
+SCHEDULER_LOCK = os.environ.get("ICEBERG_SCHEDULER_LOCK", "scheduler.lock")
+# scraping of the SCP BYU current iceberg page
+SCP_BYU_URL = "https://www.scp.byu.edu/current_icebergs.html"
+SCRAPE_TIMEOUT = 15  # seconds, per attempt
+SCRAPE_RETRIES = 3
+SCRAPE_VERIFY_SSL = False
+
+# scraped snapshots are stored append-only under SNAPSHOT_DIR, relative paths are resolved against the Flask instance
+# folder, icebergs.json is the legacy single-file store the snapshot store is seeded from
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/data"))
+SNAPSHOT_DIR = os.environ.get("ICEBERG_SNAPSHOT_DIR", "snapshots")
+LEGACY_SNAPSHOT_JSON = os.path.join(DATA_DIR, "icebergs.json")
+# memory mapped copy of every iceberg track serving trajectory and timeseries lookups, rebuilt at ingest,
+# relative paths are resolved against the Flask instance folder
+TRACK_STORE = os.environ.get("ICEBERG_TRACK_STORE", "tracks.bin")
+# columnar copy of all observations for `engine=parquet` statistics (needs pyarrow), written by `flask export-parquet`
+# and refreshed after every ingest once it exists, relative paths are resolved against the Flask instance folder
+PARQUET_DIR = os.environ.get("ICEBERG_PARQUET_DIR", "parquet")
+# background jobs, intervals in seconds
+SCRAPE_INTERVAL = 6 * 3600
+ROLLUP_REFRESH_INTERVAL = 10 * 60
+PREWARM_INTERVAL = 3600
+PREWARM_MAX_ZOOM = 2
+# matplotlib/cartopy rendering pool
+RENDER_WORKERS = 2
+RENDER_QUEUE_DEPTH = 8  # renders allowed to wait for a worker
+RENDER_TIMEOUT = 60  # seconds
+RENDER_TASKS_PER_CHILD = 200  # worker processes are replaced after this many renders
+# animated drift exports are written here and removed a day after they finished
+EXPORT_DIR = os.environ.get("ICEBERG_EXPORT_DIR", "exports")
+# events detected at ingest are attributed to this user
+EVENT_DETECTOR_USER = "root"
+GROUNDING_MAX_SPEED = 1.0  # km/day
+GROUNDING_MIN_DAYS = 30
+AREA_LOSS_FRACTION = 0.25  # of the previously observed area
+AREA_LOSS_MIN_AREA = 100.0  # km^2, smaller icebergs are too noisy to report
+# password hashing runs on a bounded thread pool (bcrypt releases the GIL), BCRYPT_LOG_ROUNDS is the cost factor
+BCRYPT_LOG_ROUNDS = int(os.environ.get("ICEBERG_BCRYPT_LOG_ROUNDS", 12))
+PASSWORD_WORKERS = min(4, os.cpu_count() or 1)
+PASSWORD_QUEUE_DEPTH = 32  # hashes allowed to wait for a worker
+PASSWORD_TIMEOUT = 10  # seconds
+# users resolved from JWT identities are cached for this many seconds
+IDENTITY_CACHE_TTL = 60
+IDENTITY_CACHE_SIZE = 1024
+# request metrics are served at /metrics, PROFILING lets clients sample single requests with the `X-Profile: 1` header
+PROFILING = os.environ.get("ICEBERG_PROFILING", "0") == "1"
+PROFILE_INTERVAL = 0.005  # seconds between two stack samples
+PROFILES_KEPT = 20  # most recent profiles kept for /metrics/profiles/<id>
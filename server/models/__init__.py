@@ -1,3 +1,3 @@
-from .iceberg_model import db, User, Iceberg, IcebergInfo, VesselSuggestion
+from .iceberg_model import db, bcrypt, User, Iceberg, IcebergInfo, IcebergLineage, IcebergEvent, VesselSuggestion
 
-__all__ = ["db", "User", "Iceberg", "IcebergInfo", "VesselSuggestion"]
+__all__ = ["db", "bcrypt", "User", "Iceberg", "IcebergInfo", "IcebergLineage", "IcebergEvent", "VesselSuggestion"]
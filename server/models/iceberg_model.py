@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from ..utils.types import UserType, MaskType
+from ..utils.passwords import run_hashing
+from .routing import RoutingSession
 from sqlalchemy import (
     Column,
     String,
@@ -11,10 +13,11 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     Text,
+    Index,
 )
 
 bcrypt = Bcrypt()
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 class User(db.Model):
@@ -23,18 +26,19 @@ class User(db.Model):
     username = Column(String(30), unique=True, nullable=False)
     email = Column(String(25), unique=True, nullable=False)
     role = Column(Enum(UserType), default=UserType.COMMON_USER)
-    pwd_hash = Column(String(20), nullable=False)
+    pwd_hash = Column(String(60), nullable=False)  # bcrypt hashes are 60 characters
 
     @property
     def password():
         raise ValueError("password cannot be directly accessed")
 
+    # hashing runs on the bounded bcrypt pool, may raise PasswordQueueFull or PasswordTimeout under a login burst
     @password.setter
     def password(self, pwd):
-        self.pwd_hash = bcrypt.generate_password_hash(pwd).decode("utf-8")
+        self.pwd_hash = run_hashing(bcrypt.generate_password_hash, pwd).decode("utf-8")
 
     def check_pwd(self, pwd):
-        return bcrypt.check_password_hash(self.pwd_hash, pwd)
+        return run_hashing(bcrypt.check_password_hash, self.pwd_hash, pwd)
 
 
 class Iceberg(db.Model):
@@ -46,6 +50,8 @@ class Iceberg(db.Model):
 
 class IcebergInfo(db.Model):
     __tablename__ = "iceberg_info"
+    # per-iceberg track lookups and de-duplication of scraped observations
+    __table_args__ = (Index("ix_iceberg_info_iceberg_time", "iceberg_id", "record_time"),)
     record_id = Column(Integer, primary_key=True, autoincrement=True)
     iceberg_id = Column(String(10), ForeignKey("iceberg.id"), nullable=False)
     longitude = Column(Float, nullable=False)
@@ -58,7 +64,26 @@ class IcebergInfo(db.Model):
     is_prediction = Column(Boolean, nullable=False)
 
 
+class IcebergLineage(db.Model):
+    """
+    Closure table of the calving lineage encoded in iceberg ids (`b15` -> `b15a` -> `b15aa`),
+    one row per (ancestor, descendant) pair including depth 0 self rows.
+    Ancestors are not required to be catalogued, e.g. `b15` is the root of `b15aa` even if it was never tracked.
+    """
+
+    __tablename__ = "iceberg_lineage"
+    ancestor_id = Column(String(10), primary_key=True)
+    descendant_id = Column(String(10), ForeignKey("iceberg.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+    __table_args__ = (Index("ix_iceberg_lineage_descendant", "descendant_id"),)
+
+
 class IcebergEvent(db.Model):
+    """
+    Calving, grounding and area loss events, either detected at ingest (`detected`, attributed to the
+    EVENT_DETECTOR_USER) or reported by users. The position is stored so events can be overlaid without observations.
+    """
+
     __tablename__ = "iceberg_event"
     event_id = Column(Integer, primary_key=True, autoincrement=True)
     iceberg_id = Column(String(10), ForeignKey("iceberg.id"), nullable=False)
@@ -66,10 +91,20 @@ class IcebergEvent(db.Model):
     description = Column(Text, nullable=False)
     user_name = Column(String(20), ForeignKey("user.username"), nullable=False)
     record_time = Column(DateTime, nullable=False)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    detected = Column(Boolean, nullable=False, default=False)
+    __table_args__ = (
+        Index("ix_iceberg_event_time", "record_time"),
+        Index("ix_iceberg_event_iceberg_time", "iceberg_id", "record_time"),
+        Index("ix_iceberg_event_type_time", "event_type", "record_time"),
+    )
 
 
 class VesselSuggestion(db.Model):
     __tablename__ = "vessel_suggestion"
+    # keyset pagination of comments per iceberg
+    __table_args__ = (Index("ix_vessel_suggestion_iceberg_time", "iceberg_id", "suggestion_time", "suggestion_id"),)
     suggestion_id = Column(Integer, primary_key=True, autoincrement=True)
     iceberg_id = Column(String(10), ForeignKey("iceberg.id"), nullable=False)
     suggestion = Column(Text, nullable=False)
@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import sqlalchemy as sa
+from sqlalchemy.sql.util import find_tables
+from flask_sqlalchemy.session import Session
+
+# bind key of the read-only published database, configured through SQLALCHEMY_BINDS
+PUBLISHED_BIND = "published"
+# tables written by users are always read from the primary database, so a signup can log in right away
+# and a reported event can be read back (or deleted) before the next publish
+PRIMARY_TABLES = {"user", "vessel_suggestion", "iceberg_event"}
+
+_primary_reads = ContextVar("primary_reads", default=False)
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary database within this block, e.g. during ingestion which must see its own writes"""
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+class RoutingSession(Session):
+    """
+    Sends reads to the published snapshot when one is configured and everything else to the primary database.
+    Once a session has written, it keeps reading from the primary until it is removed at the end of the request.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_published(mapper, clause):
+            return self._db.engines[PUBLISHED_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_published(self, mapper, clause):
+        if self._flushing or (clause is not None and not isinstance(clause, sa.Select)):
+            self.info["wrote"] = True
+            return False
+        if self.info.get("wrote") or _primary_reads.get() or PUBLISHED_BIND not in self._db.engines:
+            return False
+        if mapper is None and clause is None:
+            return False
+        tables = [sa.inspect(mapper).local_table] if mapper is not None else []
+        if clause is not None:
+            # the mapper is only the first entity, joins may reach primary tables
+            tables += find_tables(clause, include_aliases=True, include_joins=True, include_selects=True)
+        return not any(getattr(table, "name", None) in PRIMARY_TABLES for table in tables)
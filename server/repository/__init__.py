@@ -0,0 +1,18 @@
+from ..models import db
+from .base import IcebergRepository
+from .sqlite import SQLiteRepository
+from .postgres import PostgresRepository
+
+_BACKENDS = {backend.dialect: backend for backend in (SQLiteRepository, PostgresRepository)}
+_repositories = {}
+
+
+def get_repository() -> IcebergRepository:
+    """Repository for the database of the current app, chosen by its SQLAlchemy dialect (portable SQL otherwise)"""
+    engine = db.engine
+    if engine not in _repositories:
+        _repositories[engine] = _BACKENDS.get(engine.dialect.name, IcebergRepository)(engine)
+    return _repositories[engine]
+
+
+__all__ = ["get_repository", "IcebergRepository", "SQLiteRepository", "PostgresRepository"]
@@ -0,0 +1,107 @@
+from sqlalchemy import select, func, extract, and_, case, literal_column
+
+from ..models import db, Iceberg, IcebergInfo
+
+
+class IcebergRepository:
+    """
+    Queries behind the iceberg and statistics blueprints, written in portable SQL.
+    Backends override the hot queries with versions tuned to their engine, see `get_repository`.
+    """
+
+    dialect = None
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def prepare(self):
+        """Create backend specific columns and indexes, called after `create_all`"""
+
+    def analyze(self):
+        """Refresh planner statistics after a bulk load"""
+
+    def locations_in_bounds(self, min_lat, max_lat, min_lon, max_lon, since):
+        """(latitude, longitude) of observations inside the box recorded at or after `since`"""
+        query = select(IcebergInfo.latitude, IcebergInfo.longitude).where(
+            IcebergInfo.latitude.between(min_lat, max_lat),
+            IcebergInfo.longitude.between(min_lon, max_lon),
+            IcebergInfo.record_time >= since,
+        )
+        return db.session.execute(query).all()
+
+    def track(self, iceberg_id):
+        """Observations of one iceberg, oldest first"""
+        query = (
+            select(
+                IcebergInfo.record_time,
+                IcebergInfo.latitude,
+                IcebergInfo.longitude,
+                IcebergInfo.is_prediction,
+                IcebergInfo.rotational_velocity,
+                IcebergInfo.area_at_record_time,
+            )
+            .where(IcebergInfo.iceberg_id == iceberg_id)
+            .order_by(IcebergInfo.record_time.asc())
+        )
+        return db.session.execute(query).all()
+
+    def _edge_select(self, last):
+        """First (or last) observation of every iceberg, via a join on the per-iceberg min/max time"""
+        edge_time = (func.max if last else func.min)(IcebergInfo.record_time)
+        edges = select(IcebergInfo.iceberg_id, edge_time.label("edge_time")).group_by(IcebergInfo.iceberg_id).subquery()
+        return select(
+            IcebergInfo.iceberg_id,
+            IcebergInfo.latitude,
+            IcebergInfo.longitude,
+            IcebergInfo.record_time,
+            IcebergInfo.rotational_velocity,
+        ).join(
+            edges,
+            and_(IcebergInfo.iceberg_id == edges.c.iceberg_id, IcebergInfo.record_time == edges.c.edge_time),
+        )
+
+    def edge_records(self, last=False):
+        """First (birth) or last (last seen) observation of every iceberg, in iceberg_id order"""
+        return db.session.execute(self._edge_select(last).order_by(IcebergInfo.iceberg_id)).all()
+
+    def area_vs_latest_rotation(self):
+        """(id, area, rotational_velocity) of every iceberg, the velocity being the one of its latest observation"""
+        latest = self._edge_select(last=True).subquery()
+        query = select(Iceberg.id, Iceberg.area, latest.c.rotational_velocity).join(latest, Iceberg.id == latest.c.iceberg_id)
+        return db.session.execute(query).all()
+
+    def active_count_by_month(self):
+        """(year, month, distinct icebergs observed) per month, in time order"""
+        year = extract("year", IcebergInfo.record_time).label("year")
+        month = extract("month", IcebergInfo.record_time).label("month")
+        query = (
+            select(year, month, func.count(func.distinct(IcebergInfo.iceberg_id)).label("iceberg_count"))
+            .group_by(year, month)
+            .order_by(year, month)
+        )
+        return [(int(r.year), int(r.month), r.iceberg_count) for r in db.session.execute(query)]
+
+    def area_bins_by_year(self, bins, labels, start_year, end_year):
+        """(year, label, distinct icebergs) of observations with an area inside bins[i] <= area < bins[i + 1]"""
+        conditions = []
+        for lower, upper, label in zip(bins, bins[1:], labels):
+            if upper == float("inf"):
+                conditions.append((IcebergInfo.area_at_record_time >= lower, label))
+            else:
+                conditions.append(
+                    (and_(IcebergInfo.area_at_record_time >= lower, IcebergInfo.area_at_record_time < upper), label)
+                )
+        area_bin = case(*conditions, else_=literal_column("'Other'")).label("area_bin")
+        record_year = extract("year", IcebergInfo.record_time).label("record_year")
+        distinct_records = (
+            select(record_year, area_bin, IcebergInfo.iceberg_id)
+            .where(IcebergInfo.area_at_record_time.isnot(None), record_year.between(start_year, end_year))
+            .distinct()
+            .subquery("distinct_records")
+        )
+        query = (
+            select(distinct_records.c.record_year, distinct_records.c.area_bin, func.count().label("iceberg_count"))
+            .group_by(distinct_records.c.record_year, distinct_records.c.area_bin)
+            .order_by(distinct_records.c.record_year, distinct_records.c.area_bin)
+        )
+        return [(int(r.record_year), r.area_bin, r.iceberg_count) for r in db.session.execute(query)]
@@ -0,0 +1,109 @@
+from sqlalchemy import select, func, text, literal_column
+
+from ..models import db, IcebergInfo
+from .base import IcebergRepository
+
+# margin (degrees) added around a bounding box before the geodesic index lookup, rows are rechecked exactly
+BOUNDS_MARGIN = 0.5
+
+
+class PostgresRepository(IcebergRepository):
+    """
+    PostgreSQL backend. With PostGIS, observations get a generated geography column with a GiST index,
+    without it a GiST expression index on the built-in point type serves the bounding box queries.
+    """
+
+    dialect = "postgresql"
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        self._postgis = None
+
+    @property
+    def postgis(self):
+        """True when iceberg_info carries the generated geography column"""
+        if self._postgis is None:
+            with self.engine.connect() as connection:
+                self._postgis = bool(
+                    connection.execute(
+                        text(
+                            "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+                            "WHERE table_name = 'iceberg_info' AND column_name = 'geog')"
+                        )
+                    ).scalar()
+                )
+        return self._postgis
+
+    def prepare(self):
+        with self.engine.begin() as connection:
+            try:
+                with connection.begin_nested():
+                    connection.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
+                postgis = True
+            except Exception:
+                postgis = False
+            if postgis:
+                connection.execute(
+                    text(
+                        "ALTER TABLE iceberg_info ADD COLUMN IF NOT EXISTS geog geography(Point, 4326) "
+                        "GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED"
+                    )
+                )
+                connection.execute(text("CREATE INDEX IF NOT EXISTS ix_iceberg_info_geog ON iceberg_info USING GIST (geog)"))
+            else:
+                connection.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS ix_iceberg_info_point ON iceberg_info "
+                        "USING GIST (point(longitude, latitude))"
+                    )
+                )
+        self._postgis = postgis
+
+    def analyze(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+
+    def locations_in_bounds(self, min_lat, max_lat, min_lon, max_lon, since):
+        exact = (
+            IcebergInfo.latitude.between(min_lat, max_lat),
+            IcebergInfo.longitude.between(min_lon, max_lon),
+            IcebergInfo.record_time >= since,
+        )
+        if self.postgis:
+            # geodesic box edges are not parallels, densify and widen the envelope so the index lookup is a superset
+            envelope = func.ST_Segmentize(
+                func.ST_MakeEnvelope(
+                    min_lon, max(min_lat - BOUNDS_MARGIN, -90), max_lon, min(max_lat + BOUNDS_MARGIN, 90), 4326
+                ),
+                1.0,
+            )
+            candidate = literal_column("geog").op("&&")(func.geography(envelope))
+        else:
+            box = func.box(func.point(min_lon, min_lat), func.point(max_lon, max_lat))
+            candidate = func.point(IcebergInfo.longitude, IcebergInfo.latitude).op("<@")(box)
+        query = select(IcebergInfo.latitude, IcebergInfo.longitude).where(candidate, *exact)
+        return db.session.execute(query).all()
+
+    def _edge_select(self, last):
+        # DISTINCT ON keeps the first row per iceberg in (iceberg_id, record_time) index order
+        order = IcebergInfo.record_time.desc() if last else IcebergInfo.record_time.asc()
+        return (
+            select(
+                IcebergInfo.iceberg_id,
+                IcebergInfo.latitude,
+                IcebergInfo.longitude,
+                IcebergInfo.record_time,
+                IcebergInfo.rotational_velocity,
+            )
+            .distinct(IcebergInfo.iceberg_id)
+            .order_by(IcebergInfo.iceberg_id, order)
+        )
+
+    def active_count_by_month(self):
+        month = func.date_trunc("month", IcebergInfo.record_time).label("month")
+        query = (
+            select(month, func.count(func.distinct(IcebergInfo.iceberg_id)).label("iceberg_count"))
+            .group_by(month)
+            .order_by(month)
+        )
+        return [(r.month.year, r.month.month, r.iceberg_count) for r in db.session.execute(query)]
@@ -0,0 +1,32 @@
+from sqlalchemy import select, func, text
+
+from ..models import db, IcebergInfo
+from .base import IcebergRepository
+
+
+class SQLiteRepository(IcebergRepository):
+    dialect = "sqlite"
+
+    def analyze(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+
+    def _edge_select(self, last):
+        # SQLite takes bare columns from the row holding the min/max, one pass over (iceberg_id, record_time)
+        edge_time = (func.max if last else func.min)(IcebergInfo.record_time).label("record_time")
+        return select(
+            IcebergInfo.iceberg_id,
+            IcebergInfo.latitude,
+            IcebergInfo.longitude,
+            edge_time,
+            IcebergInfo.rotational_velocity,
+        ).group_by(IcebergInfo.iceberg_id)
+
+    def active_count_by_month(self):
+        month = func.strftime("%Y-%m", IcebergInfo.record_time).label("month")
+        query = (
+            select(month, func.count(func.distinct(IcebergInfo.iceberg_id)).label("iceberg_count"))
+            .group_by(month)
+            .order_by(month)
+        )
+        return [(int(r.month[:4]), int(r.month[5:]), r.iceberg_count) for r in db.session.execute(query)]
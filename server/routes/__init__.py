@@ -3,5 +3,21 @@ from .comments import comment_bp
 from .iceberg_info import iceberg_info_bp
 from .iceberg_api import iceberg_api_bp
 from .visualization_api import vis_api_bp
+from .tiles import tiles_bp
+from .health import health_bp
+from .exports import exports_bp
+from .events import events_bp
+from .metrics import metrics_bp
 
-__all__ = ["auth_bp", "iceberg_info_bp", "comment_bp", "iceberg_api_bp", "vis_api_bp"]
+__all__ = [
+    "auth_bp",
+    "iceberg_info_bp",
+    "comment_bp",
+    "iceberg_api_bp",
+    "vis_api_bp",
+    "tiles_bp",
+    "health_bp",
+    "exports_bp",
+    "events_bp",
+    "metrics_bp",
+]
@@ -1,30 +1,49 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import create_access_token, jwt_required, current_user
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 
 from ..models import User, db
 from ..utils.types import UserType
+from ..utils.passwords import PasswordQueueFull, PasswordTimeout
 
 auth_bp = Blueprint("auth", __name__)
 
 
+def _busy():
+    return jsonify({"msg": "Too many logins in progress, try again later"}), 503, {"Retry-After": "1"}
+
+
 @auth_bp.route("/signup", methods=["POST"])
 def signup():
     data = request.json
     username = data.get("username")
     pwd = data.get("password")
     email = data.get("email")
-    if User.query.filter_by(username=username).first():
+    if not username or not pwd or not email:
+        return jsonify({"msg": "username, password and email are required"}), 400
+    # one lookup for both unique columns, the constraints still catch concurrent signups below
+    taken = User.query.with_entities(User.username, User.email).filter(
+        or_(User.username == username, User.email == email)
+    ).all()
+    if any(row.username == username for row in taken):
         return jsonify({"msg": "User already exists"}), 409
-    if User.query.filter_by(email=email).first():
+    if taken:
         return jsonify({"msg": "User with same email already exists"}), 409
     user = User(username=username, email=email)
-    user.password = pwd
+    try:
+        user.password = pwd
+    except (PasswordQueueFull, PasswordTimeout):
+        return _busy()
     try:
         db.session.add(user)
         db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"msg": "User or email already exists"}), 409
     except Exception as e:
         db.session.rollback()
-        return jsonify({"msg": e}), 500
+        return jsonify({"msg": str(e)}), 500
     return jsonify({"msg": "User created successfully"}), 201
 
 
@@ -34,7 +53,11 @@ def login():
     username = data.get("username")
     pwd = data.get("password")
     user: User = User.query.filter_by(username=username).first()
-    if user and user.check_pwd(pwd):
+    try:
+        valid = bool(user and user.check_pwd(pwd))
+    except (PasswordQueueFull, PasswordTimeout):
+        return _busy()
+    if valid:
         is_superuser = True if UserType.MANAGER == user.role else False
         access_token = create_access_token(identity=user.username)
         return (
@@ -42,3 +65,17 @@ def login():
             200,
         )
     return jsonify({"msg": "Bad Credentials"}), 401
+
+
+@auth_bp.route("/me", methods=["GET"])
+@jwt_required()
+def me():
+    """User of the access token, resolved through the identity cache"""
+    return jsonify(
+        {
+            "username": current_user.username,
+            "email": current_user.email,
+            "role": current_user.role.value,
+            "is_superuser": current_user.is_superuser,
+        }
+    )
@@ -1,10 +1,41 @@
+import json
+import base64
 from datetime import datetime
-from flask import jsonify, request, Blueprint
+from flask import jsonify, request, Blueprint, Response, stream_with_context
+from sqlalchemy import func, select, insert, and_, or_
 
-from ..models import db, VesselSuggestion
+from ..models import db, Iceberg, User, VesselSuggestion
 
 comment_bp = Blueprint("comments", __name__)
 
+DEFAULT_PAGE_SIZE = 5
+MAX_PAGE_SIZE = 100
+# icebergs and comments per iceberg accepted by one summary request
+MAX_SUMMARY_ICEBERGS = 500
+MAX_SUMMARY_TOP = 20
+MAX_BULK_ROWS = 50000
+MAX_BULK_ERRORS = 100
+EXPORT_BATCH_SIZE = 1000
+
+
+def _serialize(comment):
+    return {
+        "comment_id": comment.suggestion_id,
+        "user_name": comment.user_name,
+        "suggestion": comment.suggestion,
+        "suggestion_time": comment.suggestion_time.strftime("%Y-%m-%d"),
+    }
+
+
+def _encode_cursor(comment):
+    raw = f"{comment.suggestion_time.isoformat()}|{comment.suggestion_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    suggestion_time, suggestion_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(suggestion_time), int(suggestion_id)
+
 
 @comment_bp.route("/", methods=["POST"])
 def add_comment():
@@ -35,20 +66,218 @@ def add_comment():
     )
 
 
+def _read_bulk_rows():
+    """Rows of a bulk upload, sent as a JSON array or as NDJSON (request body or `file` form field)"""
+    upload = request.files.get("file")
+    body = upload.read() if upload else request.get_data()
+    text = body.decode("utf-8").strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _validate_bulk_rows(rows):
+    """Returns (insert parameters, errors), referenced icebergs and users are checked with one query each"""
+    params = []
+    errors = []
+    for index, row in enumerate(rows):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("row must be an object")
+            missing = [key for key in ("iceberg_id", "suggestion", "user_name", "suggestion_time") if not row.get(key)]
+            if missing:
+                raise ValueError(f"missing {', '.join(missing)}")
+            params.append(
+                {
+                    "iceberg_id": str(row["iceberg_id"]),
+                    "suggestion": str(row["suggestion"]),
+                    "user_name": str(row["user_name"]),
+                    "suggestion_time": datetime.fromisoformat(row["suggestion_time"]),
+                    "_row": index,
+                }
+            )
+        except (ValueError, TypeError) as e:
+            errors.append({"row": index, "error": str(e)})
+
+    iceberg_ids = {p["iceberg_id"] for p in params}
+    user_names = {p["user_name"] for p in params}
+    known_icebergs = set(db.session.scalars(select(Iceberg.id).where(Iceberg.id.in_(iceberg_ids)))) if iceberg_ids else set()
+    known_users = set(db.session.scalars(select(User.username).where(User.username.in_(user_names)))) if user_names else set()
+    for p in params:
+        if p["iceberg_id"] not in known_icebergs:
+            errors.append({"row": p["_row"], "error": f"unknown iceberg_id {p['iceberg_id']}"})
+        elif p["user_name"] not in known_users:
+            errors.append({"row": p["_row"], "error": f"unknown user_name {p['user_name']}"})
+        del p["_row"]
+    errors.sort(key=lambda e: e["row"])
+    return params, errors
+
+
+@comment_bp.route("/bulk", methods=["POST"])
+def bulk_add_comments():
+    """
+    Import many suggestions at once, e.g. from ship reports.
+    The body (or an uploaded `file`) is a JSON array or NDJSON of objects shaped like `add_comment` input.
+    All rows are validated first and inserted in a single transaction, nothing is inserted if any row is invalid.
+    """
+    try:
+        rows = _read_bulk_rows()
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": "Body must be a JSON array or NDJSON", "details": str(e)}), 400
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"error": "No rows to import"}), 400
+    if len(rows) > MAX_BULK_ROWS:
+        return jsonify({"error": f"At most {MAX_BULK_ROWS} rows per import"}), 400
+
+    params, errors = _validate_bulk_rows(rows)
+    if errors:
+        return jsonify({"error": "Invalid rows, nothing was imported", "rows": errors[:MAX_BULK_ERRORS], "invalid": len(errors)}), 400
+
+    try:
+        db.session.execute(insert(VesselSuggestion), params)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to import comments", "details": str(e)}), 500
+    return jsonify({"message": "Comments imported successfully", "inserted": len(params)}), 201
+
+
+@comment_bp.route("/export", methods=["GET"])
+def export_comments():
+    """
+    Stream all suggestions as NDJSON (one object per line, in import format plus comment_id),
+    optionally only those of one `iceberg_id`. Rows are fetched in batches, the export is never held in memory.
+    """
+    query = select(
+        VesselSuggestion.suggestion_id,
+        VesselSuggestion.iceberg_id,
+        VesselSuggestion.suggestion,
+        VesselSuggestion.user_name,
+        VesselSuggestion.suggestion_time,
+    ).order_by(VesselSuggestion.suggestion_id)
+    iceberg_id = request.args.get("iceberg_id")
+    if iceberg_id:
+        query = query.where(VesselSuggestion.iceberg_id == iceberg_id)
+
+    def generate():
+        result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield "".join(
+                json.dumps(
+                    {
+                        "comment_id": row.suggestion_id,
+                        "iceberg_id": row.iceberg_id,
+                        "suggestion": row.suggestion,
+                        "user_name": row.user_name,
+                        "suggestion_time": row.suggestion_time.isoformat(),
+                    }
+                )
+                + "\n"
+                for row in partition
+            )
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=vessel_suggestions.ndjson"},
+    )
+
+
 @comment_bp.route("/<string:iceberg_id>", methods=["GET"])
 def get_comments(iceberg_id):
-    """Get comments posted by user"""
-    comments = VesselSuggestion.query.filter_by(iceberg_id=iceberg_id).limit(5).all()
-    comments_data = [
-        {
-            "comment_id": comment.suggestion_id,
-            "user_name": comment.user_name,
-            "suggestion": comment.suggestion,
-            "suggestion_time": comment.suggestion_time.strftime("%Y-%m-%d"),
-        }
-        for comment in comments
-    ]
-    return jsonify(comments_data)
+    """
+    Get comments posted by user, keyset-paginated by (suggestion_time, suggestion_id).
+    Query parameters: limit (default 5), order (asc/desc, default desc: newest first), cursor (from the
+    `X-Next-Cursor` header of the previous page). The header is absent on the last page.
+    """
+    try:
+        limit = min(max(int(request.args.get("limit", DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        descending = request.args.get("order", "desc") == "desc"
+        cursor = request.args.get("cursor")
+        after = _decode_cursor(cursor) if cursor else None
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    query = VesselSuggestion.query.filter(VesselSuggestion.iceberg_id == iceberg_id)
+    if after:
+        after_time, after_id = after
+        if descending:
+            query = query.filter(
+                or_(
+                    VesselSuggestion.suggestion_time < after_time,
+                    and_(VesselSuggestion.suggestion_time == after_time, VesselSuggestion.suggestion_id < after_id),
+                )
+            )
+        else:
+            query = query.filter(
+                or_(
+                    VesselSuggestion.suggestion_time > after_time,
+                    and_(VesselSuggestion.suggestion_time == after_time, VesselSuggestion.suggestion_id > after_id),
+                )
+            )
+    if descending:
+        query = query.order_by(VesselSuggestion.suggestion_time.desc(), VesselSuggestion.suggestion_id.desc())
+    else:
+        query = query.order_by(VesselSuggestion.suggestion_time.asc(), VesselSuggestion.suggestion_id.asc())
+    # one extra row tells whether another page exists
+    comments = query.limit(limit + 1).all()
+
+    response = jsonify([_serialize(comment) for comment in comments[:limit]])
+    if len(comments) > limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(comments[limit - 1])
+    return response
+
+
+@comment_bp.route("/summary", methods=["GET", "POST"])
+def get_comment_summary():
+    """
+    Comment counts and the latest `top` comments for many icebergs in one query, used for map badges.
+    Icebergs are given as `ids` (comma separated query parameter, or a JSON list in a POST body).
+    Icebergs without comments are reported with count 0.
+    """
+    data = request.get_json(silent=True) or {}
+    if request.method == "POST":
+        if not isinstance(data, dict):
+            return jsonify({"error": "Body must be a JSON object"}), 400
+        iceberg_ids = data.get("ids") or []
+        top = data.get("top", 3)
+        if not isinstance(iceberg_ids, list) or not all(isinstance(i, str) for i in iceberg_ids):
+            return jsonify({"error": "ids must be a list of iceberg ids"}), 400
+    else:
+        iceberg_ids = [i for i in request.args.get("ids", "").split(",") if i]
+        top = request.args.get("top", 3)
+    try:
+        top = min(max(int(top), 0), MAX_SUMMARY_TOP)
+    except (TypeError, ValueError):
+        return jsonify({"error": "top must be a number"}), 400
+    if not iceberg_ids:
+        return jsonify({"error": "Missing ids"}), 400
+    if len(iceberg_ids) > MAX_SUMMARY_ICEBERGS:
+        return jsonify({"error": f"At most {MAX_SUMMARY_ICEBERGS} icebergs per request"}), 400
+
+    ranked = (
+        select(
+            VesselSuggestion,
+            func.row_number()
+            .over(
+                partition_by=VesselSuggestion.iceberg_id,
+                order_by=(VesselSuggestion.suggestion_time.desc(), VesselSuggestion.suggestion_id.desc()),
+            )
+            .label("rank"),
+            func.count().over(partition_by=VesselSuggestion.iceberg_id).label("comment_count"),
+        )
+        .where(VesselSuggestion.iceberg_id.in_(iceberg_ids))
+        .subquery()
+    )
+    rows = db.session.query(ranked).filter(ranked.c.rank <= max(top, 1)).order_by(ranked.c.iceberg_id, ranked.c.rank)
+
+    summary = {iceberg_id: {"count": 0, "latest": []} for iceberg_id in iceberg_ids}
+    for row in rows:
+        entry = summary[row.iceberg_id]
+        entry["count"] = row.comment_count
+        if row.rank <= top:
+            entry["latest"].append(_serialize(row))
+    return jsonify(summary)
 
 
 @comment_bp.route("/<int:comment_id>", methods=["DELETE"])
@@ -0,0 +1,114 @@
+from flask import Blueprint, request, jsonify
+
+from ..models import db, Iceberg, IcebergEvent, User
+from ..utils.observations import parse_utc
+
+events_bp = Blueprint("events", __name__)
+
+DEFAULT_EVENT_LIMIT = 1000
+MAX_EVENT_LIMIT = 10000
+
+
+def _serialize(event):
+    return {
+        "event_id": event.event_id,
+        "iceberg_id": event.iceberg_id,
+        "event_type": event.event_type,
+        "description": event.description,
+        "user_name": event.user_name,
+        "record_time": event.record_time.isoformat(),
+        "latitude": event.latitude,
+        "longitude": event.longitude,
+        "detected": event.detected,
+    }
+
+
+@events_bp.route("/", methods=["GET"])
+def get_events():
+    """
+    Events within a time range, for overlays on the dashboard map and timeline.
+    Query parameters: start, end (ISO-8601, both optional), types (comma separated), iceberg_id, limit.
+    Ordered by time, served from the (record_time) and (event_type, record_time) indexes.
+    """
+    try:
+        start = parse_utc(request.args["start"]) if request.args.get("start") else None
+        end = parse_utc(request.args["end"]) if request.args.get("end") else None
+        limit = min(max(int(request.args.get("limit", DEFAULT_EVENT_LIMIT)), 1), MAX_EVENT_LIMIT)
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO-8601 times, limit a number"}), 400
+    if start and end and end < start:
+        return jsonify({"error": "end must not be before start"}), 400
+
+    query = IcebergEvent.query
+    if start:
+        query = query.filter(IcebergEvent.record_time >= start)
+    if end:
+        query = query.filter(IcebergEvent.record_time <= end)
+    types = [t for t in request.args.get("types", "").split(",") if t]
+    if types:
+        query = query.filter(IcebergEvent.event_type.in_(types))
+    if request.args.get("iceberg_id"):
+        query = query.filter(IcebergEvent.iceberg_id == request.args["iceberg_id"])
+    events = query.order_by(IcebergEvent.record_time, IcebergEvent.event_id).limit(limit + 1).all()
+
+    return jsonify(
+        {
+            "events": [_serialize(event) for event in events[:limit]],
+            "truncated": len(events) > limit,
+        }
+    )
+
+
+@events_bp.route("/<string:iceberg_id>", methods=["GET"])
+def get_iceberg_events(iceberg_id):
+    """Event timeline of one iceberg, oldest first"""
+    events = (
+        IcebergEvent.query.filter(IcebergEvent.iceberg_id == iceberg_id)
+        .order_by(IcebergEvent.record_time, IcebergEvent.event_id)
+        .all()
+    )
+    return jsonify([_serialize(event) for event in events])
+
+
+@events_bp.route("/", methods=["POST"])
+def add_event():
+    """
+    Report an event observed by a user.
+    Expected JSON body: {"iceberg_id", "event_type", "description", "user_name", "record_time": iso-8601,
+    "latitude", "longitude"}, the position being optional.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        event = IcebergEvent(
+            iceberg_id=data["iceberg_id"],
+            event_type=data["event_type"],
+            description=data["description"],
+            user_name=data["user_name"],
+            record_time=parse_utc(data["record_time"]),
+            latitude=float(data["latitude"]) if data.get("latitude") is not None else None,
+            longitude=float(data["longitude"]) if data.get("longitude") is not None else None,
+            detected=False,
+        )
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Missing or invalid event fields"}), 400
+    if not db.session.get(Iceberg, event.iceberg_id):
+        return jsonify({"error": "Iceberg not found"}), 404
+    if not User.query.filter_by(username=event.user_name).first():
+        return jsonify({"error": "User not found"}), 404
+
+    db.session.add(event)
+    db.session.commit()
+    return jsonify({"message": "Event added successfully", "event_id": event.event_id}), 201
+
+
+@events_bp.route("/<int:event_id>", methods=["DELETE"])
+def delete_event(event_id):
+    """Delete a reported event, detected events are owned by the ingest"""
+    event = db.session.get(IcebergEvent, event_id)
+    if not event:
+        return jsonify({"error": "Event not found"}), 404
+    if event.detected:
+        return jsonify({"error": "Detected events are replaced at ingest and cannot be deleted"}), 409
+    db.session.delete(event)
+    db.session.commit()
+    return jsonify({"message": "Event deleted successfully"}), 200
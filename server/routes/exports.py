@@ -0,0 +1,78 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify, send_file, current_app
+
+from ..utils.observations import get_observations, to_timestamp
+from ..utils.timeline import frame_times, DEFAULT_MAX_GAP_DAYS
+from ..utils.exports import submit_animation_export, get_job
+
+exports_bp = Blueprint("exports", __name__)
+
+MAX_EXPORT_FRAMES = 2000
+
+
+@exports_bp.route("/animation", methods=["POST"])
+def create_animation_export():
+    """
+    Start an animated drift export of all iceberg positions over a date range.
+    Expected JSON body: {"start": "yyyy-mm-dd", "end": "yyyy-mm-dd", "step_hours": 24,
+    "format": "gif" | "png" (zip of PNG frames), "fps": 8, "max_gap_days": 30}
+    """
+    data = request.json or {}
+    try:
+        start = to_timestamp(datetime.fromisoformat(data["start"]))
+        end = to_timestamp(datetime.fromisoformat(data["end"]))
+        step = int(float(data.get("step_hours", 24)) * 3600)
+        fps = float(data.get("fps", 8))
+        max_gap_days = float(data.get("max_gap_days", DEFAULT_MAX_GAP_DAYS))
+    except KeyError:
+        return jsonify({"error": "Missing start or end"}), 400
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid parameters, start/end must be ISO dates, step_hours/fps numbers"}), 400
+    output_format = data.get("format", "gif")
+    if output_format not in ("gif", "png"):
+        return jsonify({"error": "format must be gif or png"}), 400
+    if step <= 0 or end < start or fps <= 0:
+        return jsonify({"error": "step_hours and fps must be positive and end not before start"}), 400
+    times = frame_times(start, end, step)
+    if len(times) > MAX_EXPORT_FRAMES:
+        return jsonify({"error": f"At most {MAX_EXPORT_FRAMES} frames per export"}), 400
+
+    job_id = submit_animation_export(
+        current_app.config["EXPORT_DIR"],
+        get_observations(),
+        times,
+        output_format=output_format,
+        fps=fps,
+        max_gap_days=max_gap_days,
+    )
+    return jsonify({"job_id": job_id, "status_url": f"/exports/{job_id}", "frames": len(times)}), 202
+
+
+@exports_bp.route("/<string:job_id>", methods=["GET"])
+def get_export_status(job_id):
+    """Progress of an export, `download_url` is set once it is done"""
+    job = get_job(current_app.config["EXPORT_DIR"], job_id)
+    if not job:
+        return jsonify({"error": "Export not found"}), 404
+    return jsonify(
+        {
+            "job_id": job_id,
+            "status": job["status"],
+            "progress": round(job["progress"], 3),
+            "frames": job["frames"],
+            "format": job["format"],
+            "error": job["error"],
+            "download_url": f"/exports/{job_id}/download" if job["status"] == "done" else None,
+        }
+    )
+
+
+@exports_bp.route("/<string:job_id>/download", methods=["GET"])
+def download_export(job_id):
+    job = get_job(current_app.config["EXPORT_DIR"], job_id)
+    if not job:
+        return jsonify({"error": "Export not found"}), 404
+    if job["status"] != "done":
+        return jsonify({"error": f"Export is {job['status']}"}), 409
+    mimetype = "image/gif" if job["format"] == "gif" else "application/zip"
+    return send_file(job["result_path"], mimetype=mimetype, as_attachment=True)
@@ -0,0 +1,37 @@
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import text
+
+from ..models import db
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.route("/", methods=["GET"])
+def health():
+    """
+    Liveness of the database and status of the background jobs.
+    503 when the database is unreachable, "degraded" when the last run of some job failed.
+    """
+    try:
+        db.session.execute(text("SELECT 1"))
+        database_ok = True
+    except Exception:
+        database_ok = False
+
+    scheduler = current_app.extensions.get("scheduler")
+    jobs = scheduler.status() if scheduler else {}
+    failing = [name for name, job in jobs.items() if job["last_error"]]
+
+    status = "ok"
+    if not database_ok:
+        status = "down"
+    elif failing:
+        status = "degraded"
+    body = {
+        "status": status,
+        "database": database_ok,
+        "scheduler": bool(scheduler and scheduler.running),
+        "failing_jobs": failing,
+        "jobs": jobs,
+    }
+    return jsonify(body), 200 if database_ok else 503
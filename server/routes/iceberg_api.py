@@ -1,13 +1,25 @@
-from flask import Blueprint, request, jsonify
-from sqlalchemy import and_
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import func
 import datetime
 from datetime import timezone, timedelta
 from dateutil.relativedelta import relativedelta
 import numpy as np
-from scipy.interpolate import interp1d
 
-from ..models import db, Iceberg, IcebergInfo
+from ..models import db, Iceberg, IcebergInfo, IcebergLineage
+from ..repository import get_repository
 from ..utils.utils import extrapolate_trajectory_polynomial
+from ..utils.lineage import normalize_id, family_root, build_family_tree
+from ..utils.observations import to_timestamp, parse_utc, get_observations
+from ..utils.encounters import find_encounters
+from ..utils.nearest import k_nearest
+from ..utils.timeline import interpolate_positions, frame_times, DEFAULT_MAX_GAP_DAYS
+from ..utils.track_store import load_track
+from ..utils.metrics import phase
+
+# upper bound of frames returned by one /snapshot/range request
+MAX_SNAPSHOT_FRAMES = 500
+# upper bound of waypoints of one /route/encounters request
+MAX_ROUTE_WAYPOINTS = 1000
 
 iceberg_api_bp = Blueprint("iceberg_api", __name__)
 
@@ -37,15 +49,8 @@ def get_iceberg_locations_in_bounds():
         one_year_range = current_date - relativedelta(months=120)
         filter_date_start = datetime.datetime.combine(one_year_range, datetime.time.min)
 
-        # query icebergInfo with position ranges and date range
-        query = db.session.query(IcebergInfo.latitude, IcebergInfo.longitude).filter(
-            and_(
-                IcebergInfo.latitude.between(min_lat, max_lat),
-                IcebergInfo.longitude.between(min_lon, max_lon),
-                IcebergInfo.record_time >= filter_date_start,
-            )
-        )
-        results = query.all()
+        # observations with position ranges and date range, indexed differently per database backend
+        results = get_repository().locations_in_bounds(min_lat, max_lat, min_lon, max_lon, filter_date_start)
 
         locations = []
         for lat, lon in results:
@@ -60,6 +65,40 @@ def get_iceberg_locations_in_bounds():
         return jsonify({"error": f"An exception occurred when fetching heatmap data. Details: {str(e)}"}), 500
 
 
+@iceberg_api_bp.route("/iceberg/nearest", methods=["GET"])
+def get_nearest_icebergs():
+    """
+    The k icebergs nearest to a location as of a date, by great circle distance.
+    Expected query parameters: lat, lon in decimal, optional k (default 5), date (yyyy-mm-dd, default today)
+    and max_age_days (default 90, icebergs not observed within that many days before `date` are ignored)
+    """
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        k = int(request.args.get("k", 5))
+        max_age_days = int(request.args.get("max_age_days", 90))
+        date_str = request.args.get("date")
+        if date_str:
+            date = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+        else:
+            date = datetime.datetime.now(timezone.utc).replace(tzinfo=None)
+    except KeyError:
+        return jsonify({"error": "Missing lat or lon parameter"}), 400
+    except ValueError:
+        return jsonify({"error": "Invalid parameter format, lat/lon/k/max_age_days must be numbers and date yyyy-mm-dd"}), 400
+    if not (-90 <= lat <= 90) or not 1 <= k <= 1000 or max_age_days < 0:
+        return jsonify({"error": "lat must be in [-90, 90], k in [1, 1000] and max_age_days non-negative"}), 400
+
+    try:
+        nearest = k_nearest(lat, lon, to_timestamp(date), k, max_age_days)
+        for iceberg in nearest:
+            iceberg["record_time"] = datetime.datetime.fromtimestamp(iceberg["record_time"], tz=timezone.utc).isoformat()
+        return jsonify({"date": date.strftime("%Y-%m-%d"), "icebergs": nearest})
+
+    except Exception as e:
+        return jsonify({"error": "An error occurred fetching nearest icebergs", "details": str(e)}), 500
+
+
 @iceberg_api_bp.route("/iceberg/<string:iceberg_id>", methods=["GET"])
 def get_iceberg_by_id(iceberg_id: str):
     """Query Iceberg Table with the input id, and return trajectory-related information,
@@ -68,13 +107,13 @@ def get_iceberg_by_id(iceberg_id: str):
     2. constant velocity
     3. enough data points
     """
-    iceberg_obj = db.session.get(Iceberg, iceberg_id)
-    if not iceberg_obj:
-        return jsonify({"error": "Iceberg not found"}), 404
+    with phase("query"):
+        iceberg_obj = db.session.get(Iceberg, iceberg_id)
+        if not iceberg_obj:
+            return jsonify({"error": "Iceberg not found"}), 404
+        historical_info = load_track(iceberg_id, current_app.config["TRACK_STORE"])
 
     trajectory_points = []
-    iceberg_info = IcebergInfo.query.filter_by(iceberg_id=iceberg_id).order_by(IcebergInfo.record_time.asc())
-    historical_info = iceberg_info.all()
 
     for info in historical_info:
         lat_decimal = info.latitude
@@ -165,55 +204,162 @@ def get_iceberg_by_id(iceberg_id: str):
         except Exception as e:
             return jsonify({"error": f"Interpolation failed for {iceberg_id}"}), 500
 
-    # # --- Extrapolation Logic 2: interpolation, and linear extrapolation --
-    # predicted_trajectory_points = []
-    # if len(trajectory_points) >= 2: # Need at least 2 points for interpolation
-    #     # Prepare data for interpolation
-    #     times = np.array([(datetime.datetime.datetime.fromisoformat(p["record_time"].replace('Z', '+00:00')) - datetime.datetime.datetime.fromisoformat(trajectory_points[0]["record_time"].replace('Z', '+00:00'))).total_seconds() for p in trajectory_points])
-    #     lats = np.array([p["latitude"] for p in trajectory_points])
-    #     lons = np.array([p["longitude"] for p in trajectory_points])
+    result = {
+        "id": iceberg_obj.id,
+        "area": iceberg_obj.area,
+        "mask": iceberg_obj.mask.value if iceberg_obj.mask else None,
+        "trajectory": trajectory_points,
+        "predicted_trajectory": predicted_trajectory_points,
+    }
+
+    # consider adding predictions to IcebergInfo, but this will make the table too large
 
-    #     # For extrapolation, 'linear' is often safer given the iceberg path is twisted
-    #     interpolation_kind = 'linear'
+    with phase("serialize"):
+        return jsonify(result)
 
-    #     try:
-    #         interp_lat = interp1d(times, lats, kind=interpolation_kind, fill_value="extrapolate", bounds_error=False)
-    #         interp_lon = interp1d(times, lons, kind=interpolation_kind, fill_value="extrapolate", bounds_error=False)
-    #         latest_record_time_dt = datetime.datetime.datetime.fromisoformat(trajectory_points[-1]["record_time"].replace('Z', '+00:00'))
 
-    #         # Generate future timestamps (10 points, 10 days interval, for 100 days)
-    #         prediction_interval_days = 10
-    #         num_predictions = 10
+@iceberg_api_bp.route("/iceberg/<string:iceberg_id>/family", methods=["GET"])
+def get_iceberg_family(iceberg_id: str):
+    """
+    Calving family of an iceberg (all descendants of its family root) as a tree,
+    with per-member summary statistics gathered in a single grouped query.
+    """
+    try:
+        iceberg_id = normalize_id(iceberg_id)
+        root = family_root(iceberg_id)
+        results = (
+            db.session.query(
+                IcebergLineage.descendant_id,
+                IcebergLineage.depth,
+                Iceberg.area,
+                Iceberg.mask,
+                func.count(IcebergInfo.record_id).label("observations"),
+                func.min(IcebergInfo.record_time).label("first_seen"),
+                func.max(IcebergInfo.record_time).label("last_seen"),
+                func.max(IcebergInfo.area_at_record_time).label("max_area"),
+            )
+            .join(Iceberg, Iceberg.id == IcebergLineage.descendant_id)
+            .outerjoin(IcebergInfo, IcebergInfo.iceberg_id == IcebergLineage.descendant_id)
+            .filter(IcebergLineage.ancestor_id == root)
+            .group_by(IcebergLineage.descendant_id, IcebergLineage.depth, Iceberg.area, Iceberg.mask)
+            .all()
+        )
+        if not any(normalize_id(r.descendant_id) == iceberg_id for r in results):
+            return jsonify({"error": "Iceberg not found"}), 404
+
+        members = {
+            normalize_id(r.descendant_id): {
+                "generation": r.depth,
+                "area": r.area,
+                "mask": r.mask.name if r.mask else None,
+                "observations": r.observations,
+                "first_seen": r.first_seen.isoformat() if r.first_seen else None,
+                "last_seen": r.last_seen.isoformat() if r.last_seen else None,
+                "max_area": r.max_area,
+            }
+            for r in results
+        }
+        return jsonify(
+            {"root": root, "requested": iceberg_id, "members": len(members), "tree": build_family_tree(root, members)}
+        )
+
+    except Exception as e:
+        return jsonify({"error": "An error occurred fetching iceberg family", "details": str(e)}), 500
 
-    #         for i in range(1, num_predictions + 1):
-    #             future_delta_days = i * prediction_interval_days
-    #             future_time_dt = latest_record_time_dt + timedelta(days=future_delta_days)
-    #             future_time_seconds_since_start = (future_time_dt - datetime.datetime.datetime.fromisoformat(trajectory_points[0]["record_time"].replace('Z', '+00:00'))).total_seconds()
 
-    #             pred_lat = float(interp_lat(future_time_seconds_since_start))
-    #             pred_lon = float(interp_lon(future_time_seconds_since_start))
+@iceberg_api_bp.route("/route/encounters", methods=["POST"])
+def get_route_encounters():
+    """
+    Icebergs, observed or predicted, that come within a distance of a timed vessel route.
+    Expected JSON body:
+    {"route": [{"latitude", "longitude", "time": iso-8601}, ...], "radius_km": 50,
+     "time_tolerance_hours": 72, "include_predictions": true}
+    """
+    data = request.json or {}
+    try:
+        waypoints = data.get("route") or []
+        if not waypoints:
+            return jsonify({"error": "Route needs at least one waypoint"}), 400
+        if len(waypoints) > MAX_ROUTE_WAYPOINTS:
+            return jsonify({"error": f"Route has more than {MAX_ROUTE_WAYPOINTS} waypoints"}), 400
+        lats = [float(p["latitude"]) for p in waypoints]
+        lons = [float(p["longitude"]) for p in waypoints]
+        times = [to_timestamp(parse_utc(p["time"])) for p in waypoints]
+        radius_km = float(data.get("radius_km", 50))
+        tolerance = float(data.get("time_tolerance_hours", 72)) * 3600
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Invalid route, waypoints need latitude, longitude and an ISO-8601 time"}), 400
+    if any(b < a for a, b in zip(times, times[1:])):
+        return jsonify({"error": "Route waypoints must be in chronological order"}), 400
+    if radius_km <= 0 or tolerance < 0:
+        return jsonify({"error": "radius_km must be positive and time_tolerance_hours non-negative"}), 400
 
-    #             pred_lat = max(-90.0, min(90.0, pred_lat))
-    #             pred_lon = ((pred_lon + 180) % 360) - 180 # Normalize longitude to [-180, 180]
+    try:
+        encounters = find_encounters(
+            lats, lons, times, radius_km, tolerance, include_predictions=bool(data.get("include_predictions", True))
+        )
+        for encounter in encounters:
+            encounter["record_time"] = (
+                datetime.datetime.fromtimestamp(encounter["record_time"], tz=timezone.utc).isoformat()
+            )
+        return jsonify({"radius_km": radius_km, "encounters": encounters})
 
-    #             predicted_trajectory_points.append({
-    #                 "latitude": pred_lat,
-    #                 "longitude": pred_lon,
-    #                 "record_time": future_time_dt.replace(tzinfo=timezone.utc).isoformat(),
-    #                 "is_prediction": True,
-    #             })
+    except Exception as e:
+        return jsonify({"error": "An error occurred computing route encounters", "details": str(e)}), 500
 
-    #     except Exception as e:
-    #         return jsonify({"error": f"Interpolation failed for {iceberg_id}"}), 500
 
-    result = {
-        "id": iceberg_obj.id,
-        "area": iceberg_obj.area,
-        "mask": iceberg_obj.mask.value if iceberg_obj.mask else None,
-        "trajectory": trajectory_points,
-        "predicted_trajectory": predicted_trajectory_points,
+def _snapshot_frame(obs, t, max_gap_days):
+    icebergs, lats, lons = interpolate_positions(obs, t, max_gap_days)
+    return {
+        "time": datetime.datetime.fromtimestamp(int(t), tz=timezone.utc).isoformat(),
+        "icebergs": obs.iceberg_ids[icebergs].tolist(),
+        "latitude": np.round(lats, 5).tolist(),
+        "longitude": np.round(lons, 5).tolist(),
     }
 
-    # consider adding predictions to IcebergInfo, but this will make the table too large
 
-    return jsonify(result)
+@iceberg_api_bp.route("/snapshot", methods=["GET"])
+def get_snapshot_at_time():
+    """
+    Every iceberg's position at an arbitrary time, interpolated between its bracketing observations.
+    Expected query parameters: time (ISO-8601), optional max_gap_days (default 30)
+    """
+    try:
+        t = to_timestamp(parse_utc(request.args["time"]))
+        max_gap_days = float(request.args.get("max_gap_days", DEFAULT_MAX_GAP_DAYS))
+    except KeyError:
+        return jsonify({"error": "Missing time parameter"}), 400
+    except ValueError:
+        return jsonify({"error": "Invalid parameter format, time must be ISO-8601 and max_gap_days a number"}), 400
+
+    try:
+        return jsonify(_snapshot_frame(get_observations(), t, max_gap_days))
+    except Exception as e:
+        return jsonify({"error": "An error occurred computing the snapshot", "details": str(e)}), 500
+
+
+@iceberg_api_bp.route("/snapshot/range", methods=["GET"])
+def get_snapshot_frames():
+    """
+    Consecutive snapshots for animations, computed from in-memory arrays without querying the database per frame.
+    Expected query parameters: start, end (ISO-8601), step_hours (default 24), optional max_gap_days
+    """
+    try:
+        start = to_timestamp(parse_utc(request.args["start"]))
+        end = to_timestamp(parse_utc(request.args["end"]))
+        step = int(float(request.args.get("step_hours", 24)) * 3600)
+        max_gap_days = float(request.args.get("max_gap_days", DEFAULT_MAX_GAP_DAYS))
+    except KeyError:
+        return jsonify({"error": "Missing start or end parameter"}), 400
+    except ValueError:
+        return jsonify({"error": "Invalid parameter format, start/end must be ISO-8601 and step_hours a number"}), 400
+    if step <= 0 or end < start:
+        return jsonify({"error": "step_hours must be positive and end not before start"}), 400
+    if (end - start) // step + 1 > MAX_SNAPSHOT_FRAMES:
+        return jsonify({"error": f"At most {MAX_SNAPSHOT_FRAMES} frames per request"}), 400
+
+    try:
+        obs = get_observations()
+        return jsonify({"frames": [_snapshot_frame(obs, t, max_gap_days) for t in frame_times(start, end, step)]})
+    except Exception as e:
+        return jsonify({"error": "An error occurred computing the snapshots", "details": str(e)}), 500
@@ -1,27 +1,35 @@
-import io
-import os
-import json
-import pandas as pd
-from flask import jsonify, send_file, Blueprint
-import matplotlib.pyplot as plt
+from itertools import groupby
+from flask import jsonify, request, Blueprint, Response, current_app
+from sqlalchemy import or_
 
-from ..models import IcebergInfo, Iceberg
+from ..config import LEGACY_SNAPSHOT_JSON
+from ..models import db, IcebergInfo, Iceberg
+from ..utils.snapshot_store import get_snapshot_store
+from ..utils.rendering import (
+    render,
+    render_trajectory_png,
+    render_trajectories_png,
+    RenderQueueFull,
+    RenderTimeout,
+)
+
+# upper bound of ids/prefixes accepted by one comparison request
+MAX_COMPARED_TERMS = 50
+# upper bound of icebergs the ids and prefixes of one comparison may match, and the shortest prefix accepted
+MAX_COMPARED_ICEBERGS = 50
+MIN_PREFIX_LENGTH = 2
 
 iceberg_info_bp = Blueprint("iceberg_info", __name__)
 
 
 @iceberg_info_bp.route("/new_data", methods=["GET"])
 def get_iceberg_data():
-    """Sending newest data to frontend"""
-    data_path = os.path.abspath(os.path.join(__file__, "../../../data/data/icebergs.json"))
-    with open(data_path, "r", encoding="utf-8") as fp:
-        iceberg_locations = json.load(fp)
-    cleaned_data = []
-    for icebergs in iceberg_locations.values():
-        for each in icebergs:
-            cleaned_data.append(each)
-    df = pd.DataFrame(cleaned_data).drop(columns=["latitude", "longitude"])
-    return jsonify(df.to_dict(orient="records"))
+    """Sending newest scraped snapshot to frontend"""
+    store = get_snapshot_store(current_app.config["SNAPSHOT_DIR"], legacy_json_path=LEGACY_SNAPSHOT_JSON)
+    _, entries = store.latest()
+    # decimal coordinates of old snapshots were parsed incorrectly, the front end uses the dms strings
+    cleaned_data = [{k: v for k, v in each.items() if k not in ("latitude", "longitude")} for each in entries]
+    return jsonify(cleaned_data)
 
 
 @iceberg_info_bp.route("/trajectory/<string:iceberg_id>", methods=["GET"])
@@ -33,31 +41,86 @@ def iceberg_trajectory(iceberg_id):
     dates = [info.record_time for info in iceberg_info]
     longitudes = [info.longitude for info in iceberg_info]
     latitudes = [info.latitude for info in iceberg_info]
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.scatter(longitudes, latitudes, marker="*", color="b", label="Locations", s=30)
-    ax.set_title(f"Iceberg Trajectory-{iceberg_id}")
-    ax.set_xlabel("Longitude", fontsize=12)
-    ax.set_ylabel("Latitude", fontsize=12)
-    ax.grid(True)
-    ax.legend()
-    plt.text(
-        longitudes[-1],
-        latitudes[-1],
-        dates[-1].strftime("%Y-%m-%d"),
-        fontsize=8,
-        color="black",
-    )
-    plt.text(
-        longitudes[0],
-        latitudes[0],
-        dates[0].strftime("%Y-%m-%d"),
-        fontsize=8,
-        color="black",
+    try:
+        png = render(
+            render_trajectory_png,
+            iceberg_id,
+            longitudes,
+            latitudes,
+            dates[0].strftime("%Y-%m-%d"),
+            dates[-1].strftime("%Y-%m-%d"),
+        )
+    except RenderQueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except RenderTimeout as e:
+        return jsonify({"error": str(e)}), 504
+    return Response(png, mimetype="image/png")
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@iceberg_info_bp.route("/trajectories", methods=["GET"])
+def iceberg_trajectories():
+    """
+    Compare several trajectories in one request.
+    Query parameters: `ids`, comma separated ids or prefixes ending with `*` (e.g. `a23a,a57*`),
+    `format`, `png` (default, one combined plot) or `json` (columnar tracks).
+    """
+    terms = [t.strip() for t in request.args.get("ids", "").split(",") if t.strip()]
+    output_format = request.args.get("format", "png")
+    if not terms:
+        return jsonify({"error": "Missing ids parameter"}), 400
+    if len(terms) > MAX_COMPARED_TERMS:
+        return jsonify({"error": f"At most {MAX_COMPARED_TERMS} ids or prefixes per request"}), 400
+    if output_format not in ("png", "json"):
+        return jsonify({"error": "format must be png or json"}), 400
+
+    exact_ids = [t for t in terms if not t.endswith("*")]
+    prefixes = [t[:-1] for t in terms if t.endswith("*")]
+    if any(len(p) < MIN_PREFIX_LENGTH for p in prefixes):
+        return jsonify({"error": f"Prefixes need at least {MIN_PREFIX_LENGTH} characters before the *"}), 400
+    conditions = [Iceberg.id.in_(exact_ids)] if exact_ids else []
+    conditions += [Iceberg.id.like(f"{_escape_like(p)}%", escape="\\") for p in prefixes]
+    # resolve the matched ids first so a broad prefix is rejected before any track is loaded
+    iceberg_ids = [
+        iceberg_id
+        for (iceberg_id,) in db.session.query(Iceberg.id).filter(or_(*conditions)).limit(MAX_COMPARED_ICEBERGS + 1)
+    ]
+    if len(iceberg_ids) > MAX_COMPARED_ICEBERGS:
+        return jsonify({"error": f"The ids and prefixes match more than {MAX_COMPARED_ICEBERGS} icebergs"}), 400
+    # every track in one round trip, ordered so rows of one iceberg are contiguous
+    rows = (
+        db.session.query(IcebergInfo.iceberg_id, IcebergInfo.record_time, IcebergInfo.latitude, IcebergInfo.longitude)
+        .filter(IcebergInfo.iceberg_id.in_(iceberg_ids))
+        .order_by(IcebergInfo.iceberg_id, IcebergInfo.record_time)
+        .all()
     )
-    img = io.BytesIO()
-    fig.savefig(img, format="png")
-    img.seek(0)
-    return send_file(img, mimetype="image/png", as_attachment=False)
+    if not rows:
+        return jsonify({"error": "Iceberg not found"}), 404
+
+    tracks = {}
+    for iceberg_id, group in groupby(rows, key=lambda r: r.iceberg_id):
+        group = list(group)
+        tracks[iceberg_id] = {
+            "record_time": [r.record_time.isoformat() for r in group],
+            "latitude": [r.latitude for r in group],
+            "longitude": [r.longitude for r in group],
+        }
+
+    if output_format == "json":
+        return jsonify({"icebergs": list(tracks), "tracks": tracks})
+    try:
+        png = render(
+            render_trajectories_png,
+            [(iceberg_id, t["longitude"], t["latitude"]) for iceberg_id, t in tracks.items()],
+        )
+    except RenderQueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except RenderTimeout as e:
+        return jsonify({"error": str(e)}), 504
+    return Response(png, mimetype="image/png")
 
 
 @iceberg_info_bp.route("/basic/<string:iceberg_id>", methods=["GET"])
@@ -0,0 +1,23 @@
+from flask import Blueprint, jsonify, Response
+
+from ..utils.metrics import render_prometheus, get_profile
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/", methods=["GET"])
+def get_metrics():
+    """Request latency histograms, SQL and phase timings per route, in Prometheus text format"""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@metrics_bp.route("/profiles/<string:profile_id>", methods=["GET"])
+def get_request_profile(profile_id):
+    """
+    Stack samples of a request sent with `X-Profile: 1`, the id is returned in its X-Profile-Id header.
+    Collapsed stack format, one "outer;...;inner count" line per stack, ready for flamegraph tools.
+    """
+    profile = get_profile(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return Response(profile, mimetype="text/plain")
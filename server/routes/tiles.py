@@ -0,0 +1,90 @@
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify
+
+from ..utils.observations import dataset_version, get_observations, to_timestamp
+from ..utils.metrics import phase
+from ..utils.tiles import (
+    PROJECTIONS,
+    MAX_ZOOM,
+    TILE_EXTENT,
+    RASTER_TILE_SIZE,
+    valid_tile,
+    build_position_tile,
+    render_density_tile,
+)
+
+tiles_bp = Blueprint("tiles", __name__)
+
+# tiles requested without the `v` query parameter may change with the next ingestion
+TILE_MAX_AGE = 3600
+# tiles addressed with the current dataset version never change
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def cacheable(response, version, etag):
+    """Attach ETag/Cache-Control and answer conditional requests with 304"""
+    response.set_etag(etag)
+    if request.args.get("v") == version:
+        response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response.headers["Cache-Control"] = f"public, max-age={TILE_MAX_AGE}"
+    return response.make_conditional(request)
+
+
+@tiles_bp.route("/meta", methods=["GET"])
+def get_tile_meta():
+    """Current dataset version and tile url templates, the front end keys its tile cache on `version`"""
+    version = dataset_version()
+    return jsonify(
+        {
+            "version": version,
+            "projections": list(PROJECTIONS),
+            "max_zoom": MAX_ZOOM,
+            "extent": TILE_EXTENT,
+            "tile_size": RASTER_TILE_SIZE,
+            "positions_url": f"/tiles/positions/{{projection}}/{{z}}/{{x}}/{{y}}.json?v={version}",
+            "density_url": f"/tiles/density/{{projection}}/{{z}}/{{x}}/{{y}}.png?v={version}",
+        }
+    )
+
+
+@tiles_bp.route("/positions/<string:projection>/<int:z>/<int:x>/<int:y>.json", methods=["GET"])
+def get_position_tile(projection, z, x, y):
+    """
+    Iceberg positions and passage density inside one tile.
+    Optional query parameter `since` (yyyy-mm-dd) drops observations recorded before that date.
+    """
+    if projection not in PROJECTIONS:
+        return jsonify({"error": f"Unknown projection, expected one of {list(PROJECTIONS)}"}), 404
+    if not valid_tile(z, x, y):
+        return jsonify({"error": "Tile coordinates out of range"}), 404
+    try:
+        since_str = request.args.get("since")
+        since = to_timestamp(datetime.strptime(since_str, "%Y-%m-%d")) if since_str else None
+    except ValueError:
+        return jsonify({"error": "Invalid since parameter, expected yyyy-mm-dd"}), 400
+
+    try:
+        obs = get_observations()
+        version = obs.version
+        tile = build_position_tile(obs, projection, z, x, y, since)
+        return cacheable(jsonify(tile), version, f"{version}-{since_str or ''}")
+    except Exception as e:
+        return jsonify({"error": "An error occurred building the tile", "details": str(e)}), 500
+
+
+@tiles_bp.route("/density/<string:projection>/<int:z>/<int:x>/<int:y>.png", methods=["GET"])
+def get_density_tile(projection, z, x, y):
+    """Raster heatmap tile of iceberg passages, log-scaled and colored like `/stats/aggregate_density_map.png`"""
+    if projection not in PROJECTIONS:
+        return jsonify({"error": f"Unknown projection, expected one of {list(PROJECTIONS)}"}), 404
+    if not valid_tile(z, x, y):
+        return jsonify({"error": "Tile coordinates out of range"}), 404
+    try:
+        obs = get_observations()
+        version = obs.version
+        with phase("render"):
+            png = render_density_tile(obs, projection, z, x, y)
+        return cacheable(Response(png, mimetype="image/png"), version, version)
+    except Exception as e:
+        return jsonify({"error": "An error occurred rendering the tile", "details": str(e)}), 500
@@ -1,21 +1,43 @@
-import io
 import math
 from collections import defaultdict
-from flask import Blueprint, jsonify, Response
-from sqlalchemy import func, extract, and_, case, asc, literal_column
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
+from flask import Blueprint, current_app, jsonify, request, Response
+from sqlalchemy import func, and_, case
 
 from ..models import db, Iceberg, IcebergInfo
+from ..repository import get_repository
+from ..utils.columnar import get_parquet_observations, ParquetUnavailable
+from ..utils.track_store import load_track
+from ..utils.metrics import phase
 from ..utils.utils import calculate_trend_line
+from ..utils.rendering import render, render_density_map_png, RenderQueueFull, RenderTimeout
 
 vis_api_bp = Blueprint("vis_api", __name__)
 
+# `?engine=parquet` answers the endpoints using `_stats_source` from the Parquet export instead of the database
+STATS_ENGINES = ("sql", "parquet")
+PARQUET_ENDPOINTS = {
+    "vis_api.get_size_distribution_over_time",
+    "vis_api.get_active_count_over_time",
+    "vis_api.get_iceberg_birth_death_locations",
+    "vis_api.get_birth_death_location_trends",
+}
+
+
+@vis_api_bp.before_request
+def check_engine():
+    engine = request.args.get("engine", "sql")
+    if engine not in STATS_ENGINES:
+        return jsonify({"error": f"engine must be one of {', '.join(STATS_ENGINES)}"}), 400
+    if engine == "parquet" and request.endpoint not in PARQUET_ENDPOINTS:
+        return jsonify({"error": "engine=parquet is not supported by this endpoint"}), 400
+
+
+def _stats_source():
+    """Repository of the current database, or the column scanning reader of the Parquet export"""
+    if request.args.get("engine") == "parquet":
+        return get_parquet_observations(current_app.config["PARQUET_DIR"])
+    return get_repository()
+
 
 @vis_api_bp.route("/size_distribution", methods=["GET"])
 def get_size_distribution():
@@ -99,48 +121,15 @@ def get_size_distribution_over_time():
             else:
                 bin_labels.append(f"{lower_bound:.2f}-{upper_bound:.2f} km²")
 
-        conditions = []
-        for i in range(len(bins) - 1):
-            lower, upper, label = bins[i], bins[i+1], bin_labels[i]
-            if upper == float("inf"):
-                conditions.append((IcebergInfo.area_at_record_time >= lower, label))
-            else:
-                conditions.append((and_(IcebergInfo.area_at_record_time >= lower, IcebergInfo.area_at_record_time < upper), label))
-        
-        area_bin_case_statement = case(*conditions, else_=literal_column("'Other'")).label("area_bin")
-        
-        # inner subquery
-        distinct_records_sq = (
-            db.session.query(
-                extract("year", IcebergInfo.record_time).label("record_year"),
-                area_bin_case_statement,
-                IcebergInfo.iceberg_id
-            )
-            .filter(IcebergInfo.area_at_record_time.isnot(None))
-            .filter(extract("year", IcebergInfo.record_time).between(start_year, end_year))
-            .distinct()
-            .subquery("distinct_records")
-        )
-        
-        # outer query
-        results = (
-            db.session.query(
-                distinct_records_sq.c.record_year,
-                distinct_records_sq.c.area_bin,
-                func.count().label("unique_iceberg_count") # Count the rows from the distinct subquery
-            )
-            .group_by(distinct_records_sq.c.record_year, distinct_records_sq.c.area_bin)
-            .order_by(distinct_records_sq.c.record_year, distinct_records_sq.c.area_bin)
-            .all()
-        )
-        
+        with phase("query"):
+            results = _stats_source().area_bins_by_year(bins, bin_labels, start_year, end_year)
+
         data_by_year_bin = {}
         all_years_set = set(range(start_year, end_year + 1))
-        
-        for r in results:
-            year, area_bin, count = int(r.record_year), r.area_bin, r.unique_iceberg_count
+
+        for year, area_bin, count in results:
             data_by_year_bin[(year, area_bin)] = count
-        
+
         sorted_years = sorted(list(all_years_set))
         series_data = []
         for bin_label in bin_labels:
@@ -179,8 +168,11 @@ def get_size_distribution_over_time():
             "bin_labels": bin_labels,
             "series_data": series_data,
         }
-        return jsonify(response)
+        with phase("serialize"):
+            return jsonify(response)
 
+    except ParquetUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": "An error occurred fetching size distribution over time", "details": str(e)}), 500
 
@@ -191,28 +183,19 @@ def get_active_count_over_time():
     Provides data for the count of unique active icebergs per month.
     """
     try:
-        # Query to get year, month, and count of distinct iceberg_id's
-        results = (
-            db.session.query(
-                extract("year", IcebergInfo.record_time).label("year"),
-                extract("month", IcebergInfo.record_time).label("month"),
-                func.count(func.distinct(IcebergInfo.iceberg_id)).label("iceberg_count"),
-            )
-            .group_by("year", "month")
-            .order_by("year", "month")
-            .all()
-        )
+        results = _stats_source().active_count_by_month()
 
         line_chart_data = [
             {
-                "time": f"{int(r.year)}-{int(r.month):02d}",  # Format as YYYY-MM
-                # "month_name": calendar.month_name[int(r.month)], # Optional: full month name
-                "value": r.iceberg_count,
+                "time": f"{year}-{month:02d}",  # Format as YYYY-MM
+                "value": iceberg_count,
             }
-            for r in results
+            for year, month, iceberg_count in results
         ]
         return jsonify(line_chart_data)
 
+    except ParquetUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": "An error occurred fetching active count over time", "details": str(e)}), 500
 
@@ -223,26 +206,8 @@ def get_iceberg_correlation_data():
     Provides data for iceberg area vs. latest rotational velocity.
     """
     try:
-        # Subquery to get the latest record_time for each iceberg_id from IcebergInfo
-        latest_info_sq = (
-            db.session.query(IcebergInfo.iceberg_id, func.max(IcebergInfo.record_time).label("max_record_time"))
-            .group_by(IcebergInfo.iceberg_id)
-            .subquery("latest_info_sq")
-        )
-
-        # Query to get iceberg area and the rotational velocity at the latest record_time
-        results = (
-            db.session.query(Iceberg.id, Iceberg.area, IcebergInfo.rotational_velocity)
-            .join(latest_info_sq, Iceberg.id == latest_info_sq.c.iceberg_id)
-            .join(
-                IcebergInfo,
-                and_(
-                    IcebergInfo.iceberg_id == latest_info_sq.c.iceberg_id,
-                    IcebergInfo.record_time == latest_info_sq.c.max_record_time,
-                ),
-            )
-            .all()
-        )
+        # iceberg area and the rotational velocity at the latest record_time
+        results = get_repository().area_vs_latest_rotation()
 
         correlation_data = [{"id": r.id, "area": r.area, "rotationalVelocity": r.rotational_velocity} for r in results]
         return jsonify(correlation_data)
@@ -257,91 +222,52 @@ def get_iceberg_birth_death_locations():
     Provides coordinates for estimated birth and death (melt/last known) locations of icebergs.
     """
     try:
-        # Subquery for birth locations (first record time)
-        first_record_sq = (
-            db.session.query(IcebergInfo.iceberg_id, func.min(IcebergInfo.record_time).label("min_time"))
-            .group_by(IcebergInfo.iceberg_id)
-            .subquery("first_record_sq")
-        )
-
-        birth_locations = (
-            db.session.query(
-                IcebergInfo.iceberg_id,
-                IcebergInfo.latitude,
-                IcebergInfo.longitude,
-                IcebergInfo.record_time,
-            )
-            .join(
-                first_record_sq,
-                and_(
-                    IcebergInfo.iceberg_id == first_record_sq.c.iceberg_id,
-                    IcebergInfo.record_time == first_record_sq.c.min_time,
-                ),
-            )
-            .all()
-        )
-
-        # Subquery for death locations (last record time)
-        last_record_sq = (
-            db.session.query(IcebergInfo.iceberg_id, func.max(IcebergInfo.record_time).label("max_time"))
-            .group_by(IcebergInfo.iceberg_id)
-            .subquery("last_record_sq")
-        )
-
-        death_locations = (
-            db.session.query(
-                IcebergInfo.iceberg_id,
-                IcebergInfo.longitude,
-                IcebergInfo.latitude,
-                IcebergInfo.record_time,  # Include record_time
-            )
-            .join(
-                last_record_sq,
-                and_(
-                    IcebergInfo.iceberg_id == last_record_sq.c.iceberg_id,
-                    IcebergInfo.record_time == last_record_sq.c.max_time,
-                ),
-            )
-            .all()
-        )
-
-        response_data = []
-        for loc in birth_locations:
-            response_data.append(
-                {
-                    "id": loc.iceberg_id,
-                    "type": "birth",
-                    "longitude": loc.longitude,
-                    "latitude": loc.latitude,
-                    "name": f"Iceberg {loc.iceberg_id} (Birth)",
-                    "record_time": loc.record_time.isoformat() if loc.record_time else None,
-                }
-            )
-        for loc in death_locations:
-            # Avoid duplicating if birth and death are the same record (iceberg with single entry)
-            is_new_event = True
-            for birth_event in response_data:
-                if (
-                    birth_event["id"] == loc.iceberg_id
-                    and birth_event["type"] == "birth"
-                    and birth_event["record_time"] == (loc.record_time.isoformat() if loc.record_time else None)
-                ):
-                    is_new_event = False
-                    break
-            if is_new_event:
+        # first record (birth) and last record (death) of every iceberg
+        with phase("query"):
+            birth_locations = _stats_source().edge_records()
+            death_locations = _stats_source().edge_records(last=True)
+
+        with phase("compute"):
+            response_data = []
+            for loc in birth_locations:
                 response_data.append(
                     {
                         "id": loc.iceberg_id,
-                        "type": "death",
+                        "type": "birth",
                         "longitude": loc.longitude,
                         "latitude": loc.latitude,
-                        "name": f"Iceberg {loc.iceberg_id} (Last Seen)",
+                        "name": f"Iceberg {loc.iceberg_id} (Birth)",
                         "record_time": loc.record_time.isoformat() if loc.record_time else None,
                     }
                 )
-
-        return jsonify(response_data)
-
+            for loc in death_locations:
+                # Avoid duplicating if birth and death are the same record (iceberg with single entry)
+                is_new_event = True
+                for birth_event in response_data:
+                    if (
+                        birth_event["id"] == loc.iceberg_id
+                        and birth_event["type"] == "birth"
+                        and birth_event["record_time"] == (loc.record_time.isoformat() if loc.record_time else None)
+                    ):
+                        is_new_event = False
+                        break
+                if is_new_event:
+                    response_data.append(
+                        {
+                            "id": loc.iceberg_id,
+                            "type": "death",
+                            "longitude": loc.longitude,
+                            "latitude": loc.latitude,
+                            "name": f"Iceberg {loc.iceberg_id} (Last Seen)",
+                            "record_time": loc.record_time.isoformat() if loc.record_time else None,
+                        }
+                    )
+
+        with phase("serialize"):
+            return jsonify(response_data)
+
+    except ParquetUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": "An error occurred fetching birth/death locations", "details": str(e)}), 500
 
@@ -353,42 +279,9 @@ def get_birth_death_location_trends():
     iceberg birth and death locations, plus their linear trend lines.
     """
     try:
-        first_record_sq = (
-            db.session.query(IcebergInfo.iceberg_id, func.min(IcebergInfo.record_time).label("min_time"))
-            .group_by(IcebergInfo.iceberg_id)
-            .subquery("first_record_sq")
-        )
-        birth_records = (
-            db.session.query(
-                IcebergInfo.iceberg_id, IcebergInfo.latitude, IcebergInfo.longitude, IcebergInfo.record_time
-            )
-            .join(
-                first_record_sq,
-                and_(
-                    IcebergInfo.iceberg_id == first_record_sq.c.iceberg_id,
-                    IcebergInfo.record_time == first_record_sq.c.min_time,
-                ),
-            )
-            .all()
-        )
-        last_record_sq = (
-            db.session.query(IcebergInfo.iceberg_id, func.max(IcebergInfo.record_time).label("max_time"))
-            .group_by(IcebergInfo.iceberg_id)
-            .subquery("last_record_sq")
-        )
-        death_records = (
-            db.session.query(
-                IcebergInfo.iceberg_id, IcebergInfo.latitude, IcebergInfo.longitude, IcebergInfo.record_time
-            )
-            .join(
-                last_record_sq,
-                and_(
-                    IcebergInfo.iceberg_id == last_record_sq.c.iceberg_id,
-                    IcebergInfo.record_time == last_record_sq.c.max_time,
-                ),
-            )
-            .all()
-        )
+        with phase("query"):
+            birth_records = _stats_source().edge_records()
+            death_records = _stats_source().edge_records(last=True)
 
         births_by_year, deaths_by_year = defaultdict(lambda: {"lat_sum": 0.0, "lon_sum": 0.0, "count": 0}), defaultdict(
             lambda: {"lat_sum": 0.0, "lon_sum": 0.0, "count": 0}
@@ -452,8 +345,11 @@ def get_birth_death_location_trends():
                 "longitudes_trend": death_lon_trend,
             },
         }
-        return jsonify(response)
+        with phase("serialize"):
+            return jsonify(response)
 
+    except ParquetUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": "An error occurred fetching location trends", "details": str(e)}), 500
 
@@ -473,19 +369,14 @@ def get_iceberg_timeseries_data(iceberg_id):
         if not iceberg_detail:
             return jsonify({"error": "Iceberg not found"}), 404
 
-        query = db.session.query(
-            IcebergInfo.record_time, IcebergInfo.rotational_velocity, IcebergInfo.area_at_record_time.label("area")
-        )
-
-        time_series_records = (
-            query.filter(IcebergInfo.iceberg_id == iceberg_id).order_by(asc(IcebergInfo.record_time)).all()
-        )
+        with phase("query"):
+            time_series_records = load_track(iceberg_id, current_app.config["TRACK_STORE"])
 
         time_series_data = [
             {
                 "record_time": r.record_time.isoformat() if r.record_time else None,
                 "rotational_velocity": r.rotational_velocity,
-                "area": (r.area),
+                "area": r.area_at_record_time,
             }
             for r in time_series_records
         ]
@@ -498,7 +389,8 @@ def get_iceberg_timeseries_data(iceberg_id):
             },
             "time_series": time_series_data,
         }
-        return jsonify(response)
+        with phase("serialize"):
+            return jsonify(response)
     except Exception as e:
         return (
             jsonify({"error": f"An error occurred fetching time series for iceberg {iceberg_id}", "details": str(e)}),
@@ -514,32 +406,35 @@ def get_aggregate_iceberg_density():
     try:
         resolution = 0.25
         grid_counts = defaultdict(set)
-        iceberg_records = db.session.query(IcebergInfo.latitude, IcebergInfo.longitude, IcebergInfo.iceberg_id).all()
+        with phase("query"):
+            iceberg_records = db.session.query(IcebergInfo.latitude, IcebergInfo.longitude, IcebergInfo.iceberg_id).all()
         # iceberg_records = db.session.query(IcebergInfo.latitude, IcebergInfo.longitude, IcebergInfo.iceberg_id).yield_per(1000)
-        for record in iceberg_records:
-            lat = float(record.latitude)
-            lon = float(record.longitude)
-            # Simple check to focus on the southern hemisphere polar regions
-            if lat > -40:  # Ignore points north of 40°S
-                continue
-            # Calculate which grid cell this point falls into
-            lat_idx = math.floor(lat / resolution)
-            lon_idx = math.floor(lon / resolution)
+        with phase("compute"):
+            for record in iceberg_records:
+                lat = float(record.latitude)
+                lon = float(record.longitude)
+                # Simple check to focus on the southern hemisphere polar regions
+                if lat > -40:  # Ignore points north of 40°S
+                    continue
+                # Calculate which grid cell this point falls into
+                lat_idx = math.floor(lat / resolution)
+                lon_idx = math.floor(lon / resolution)
 
-            # Add the iceberg_id to the set for this grid cell
-            grid_counts[(lat_idx, lon_idx)].add(record.iceberg_id)
+                # Add the iceberg_id to the set for this grid cell
+                grid_counts[(lat_idx, lon_idx)].add(record.iceberg_id)
 
-        # Prepare data for ECharts heatmap: array of [longitude, latitude, count]
-        heatmap_data = []
-        for (lat_idx, lon_idx), iceberg_ids in grid_counts.items():
-            count = len(iceberg_ids)
-            if count > 0:  # Only include grid cells with at least one passage
-                # Use the center of the grid cell for plotting
-                center_lat = (lat_idx + 0.5) * resolution
-                center_lon = (lon_idx + 0.5) * resolution
-                heatmap_data.append([center_lon, center_lat, count])
+            # Prepare data for ECharts heatmap: array of [longitude, latitude, count]
+            heatmap_data = []
+            for (lat_idx, lon_idx), iceberg_ids in grid_counts.items():
+                count = len(iceberg_ids)
+                if count > 0:  # Only include grid cells with at least one passage
+                    # Use the center of the grid cell for plotting
+                    center_lat = (lat_idx + 0.5) * resolution
+                    center_lon = (lon_idx + 0.5) * resolution
+                    heatmap_data.append([center_lon, center_lat, count])
 
-        return jsonify(heatmap_data)
+        with phase("serialize"):
+            return jsonify(heatmap_data)
 
     except Exception as e:
         return jsonify({"error": "An error occurred fetching aggregate density data", "details": str(e)}), 500
@@ -554,50 +449,38 @@ def get_aggregate_density_map():
     try:
         resolution = 0.25
         grid_counts = defaultdict(set)
-        iceberg_records = db.session.query(IcebergInfo.latitude, IcebergInfo.longitude, IcebergInfo.iceberg_id).all()
-        for record in iceberg_records:
-            try:
-                lat, lon = float(record.latitude), float(record.longitude)
-                if lat > -40:
+        with phase("query"):
+            iceberg_records = db.session.query(IcebergInfo.latitude, IcebergInfo.longitude, IcebergInfo.iceberg_id).all()
+        with phase("compute"):
+            for record in iceberg_records:
+                try:
+                    lat, lon = float(record.latitude), float(record.longitude)
+                    if lat > -40:
+                        continue
+                    lat_idx, lon_idx = math.floor(lat / resolution), math.floor(lon / resolution)
+                    grid_counts[(lat_idx, lon_idx)].add(record.iceberg_id)
+                except (ValueError, TypeError):
                     continue
-                lat_idx, lon_idx = math.floor(lat / resolution), math.floor(lon / resolution)
-                grid_counts[(lat_idx, lon_idx)].add(record.iceberg_id)
-            except (ValueError, TypeError):
-                continue
 
-        lons, lats, counts = [], [], []
-        for (lat_idx, lon_idx), iceberg_ids in grid_counts.items():
-            count = len(iceberg_ids)
-            if count > 0:
-                lons.append((lon_idx + 0.5) * resolution)
-                lats.append((lat_idx + 0.5) * resolution)
-                counts.append(count)
+            lons, lats, counts = [], [], []
+            for (lat_idx, lon_idx), iceberg_ids in grid_counts.items():
+                count = len(iceberg_ids)
+                if count > 0:
+                    lons.append((lon_idx + 0.5) * resolution)
+                    lats.append((lat_idx + 0.5) * resolution)
+                    counts.append(count)
 
         if not lons:
             return "No data to generate map", 404
 
-        fig = plt.figure(figsize=(10, 10))
-        ax = fig.add_subplot(1, 1, 1, projection=ccrs.SouthPolarStereo())
-        ax.set_extent([-180, 180, -90, -50], ccrs.PlateCarree())
-
-        ax.add_feature(cfeature.OCEAN, zorder=0, facecolor="#f0f8ff")
-        ax.add_feature(cfeature.LAND, zorder=1, edgecolor="black", facecolor="#c0c0c0")
-        ax.gridlines(draw_labels=True, dms=True, x_inline=False, y_inline=False)
-
-        log_norm = mcolors.LogNorm(vmin=1, vmax=max(counts))
-        sc = ax.scatter(
-            lons, lats, s=5, c=counts, cmap="YlOrRd", norm=log_norm, alpha=0.7, transform=ccrs.PlateCarree(), zorder=2
-        )
-
-        plt.colorbar(sc, ax=ax, shrink=0.7, label="Number of Iceberg Passages")
-
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight", dpi=150)
-        buf.seek(0)
-        plt.close(fig)
-
-        return Response(buf.getvalue(), mimetype="image/png")
+        with phase("render"):
+            png = render(render_density_map_png, lons, lats, counts)
+        return Response(png, mimetype="image/png")
 
+    except RenderQueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except RenderTimeout as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         print(f"Error generating static map: {e}")
         return jsonify({"error": "Failed to generate map image", "details": str(e)}), 500
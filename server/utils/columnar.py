@@ -0,0 +1,260 @@
+import os
+import shutil
+import threading
+from queue import Queue
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import select
+
+from ..models import IcebergInfo
+
+# optional, only needed for the Parquet export and the `engine=parquet` statistics, imported on first use
+# since pyarrow.dataset pulls in pandas and would slow down the start of every worker
+pa = pc = pa_csv = ds = None
+
+# rows per Parquet row group, small enough for min/max statistics on iceberg_id to skip most groups
+ROW_GROUP_SIZE = 16384
+# rows fetched from the database per record batch
+EXPORT_BATCH_SIZE = 50000
+
+_lock = threading.Lock()
+_datasets = {}
+
+
+class ParquetUnavailable(Exception):
+    """pyarrow is not installed or no dataset was exported yet"""
+
+
+class EdgeRecord(NamedTuple):
+    iceberg_id: str
+    latitude: float
+    longitude: float
+    record_time: datetime
+    rotational_velocity: float
+
+
+def _schema():
+    return pa.schema(
+        [
+            ("iceberg_id", pa.string()),
+            ("record_time", pa.timestamp("s")),
+            ("latitude", pa.float64()),
+            ("longitude", pa.float64()),
+            ("area_at_record_time", pa.float64()),
+            ("rotational_velocity", pa.float64()),
+            ("is_prediction", pa.bool_()),
+            ("year", pa.int16()),
+        ]
+    )
+
+
+def _partitioning():
+    # by year: the statistics filter on years, partitioning by iceberg would write hundreds of tiny files
+    return ds.partitioning(pa.schema([("year", pa.int16())]), flavor="hive")
+
+
+def _require_pyarrow():
+    global pa, pc, pa_csv, ds
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.dataset
+    except ImportError:
+        raise ParquetUnavailable("pyarrow is not installed, pip install pyarrow")
+    pc, pa_csv, ds = pyarrow.compute, pyarrow.csv, pyarrow.dataset
+    pa = pyarrow  # last, other threads only check `pa`
+
+
+def _batch(iceberg_ids, times, latitudes, longitudes, areas, velocities, predictions):
+    times = np.asarray(times, dtype="datetime64[s]")
+    years = times.astype("datetime64[Y]").astype(np.int64) + 1970
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(iceberg_ids, pa.string()),
+            pa.array(times, pa.timestamp("s")),
+            pa.array(latitudes, pa.float64()),
+            pa.array(longitudes, pa.float64()),
+            pa.array(areas, pa.float64(), from_pandas=True),  # None and NaN become nulls
+            pa.array(velocities, pa.float64(), from_pandas=True),
+            pa.array(predictions, pa.bool_()),
+            pa.array(years, pa.int16()),
+        ],
+        schema=_schema(),
+    )
+
+
+def database_batches(db):
+    """Record batches of all observations in the database, sorted by (iceberg, time)"""
+    query = (
+        select(
+            IcebergInfo.iceberg_id,
+            IcebergInfo.record_time,
+            IcebergInfo.latitude,
+            IcebergInfo.longitude,
+            IcebergInfo.area_at_record_time,
+            IcebergInfo.rotational_velocity,
+            IcebergInfo.is_prediction,
+        )
+        .order_by(IcebergInfo.iceberg_id, IcebergInfo.record_time)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for rows in db.session.execute(query).partitions():
+        yield _batch(*zip(*rows))
+
+
+def csv_archive_batches(data_dir):
+    """Record batches of the static CSV archive, one per iceberg file, parsed column-wise"""
+    convert = pa_csv.ConvertOptions(
+        include_columns=["date", "lat", "lon", "size", "vel_angle"],
+        column_types={"date": pa.int32(), "lat": pa.float64(), "lon": pa.float64(), "size": pa.float64(), "vel_angle": pa.float64()},
+    )
+    for csv_file in sorted(f for f in os.listdir(data_dir) if f.endswith(".csv")):
+        table = pa_csv.read_csv(os.path.join(data_dir, csv_file), convert_options=convert)
+        dates = table["date"].to_numpy()
+        # YYYYDDD dates, same as `initialize_db`
+        days = (dates // 1000 - 1970).astype("datetime64[Y]").astype("datetime64[D]") + (dates % 1000 - 1)
+        sizes = table["size"].to_numpy()
+        yield _batch(
+            [os.path.splitext(csv_file)[0]] * len(dates),
+            days,
+            table["lat"].to_numpy(),
+            table["lon"].to_numpy(),
+            np.where(sizes > 0, sizes, np.nan),
+            table["vel_angle"].to_numpy(),
+            np.zeros(len(dates), dtype=bool),
+        )
+
+
+def write_observation_dataset(batches, target_dir):
+    """
+    Write observation batches to a year partitioned Parquet dataset with column statistics,
+    then swap it in place of `target_dir`. Returns the number of rows written.
+    """
+    _require_pyarrow()
+    tmp_dir = f"{target_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    file_format = ds.ParquetFileFormat()
+    # database sessions are bound to the calling thread, so batches are produced here
+    # and handed to pyarrow, which pulls them from its own threads
+    pending, failure = Queue(maxsize=2), []
+
+    def write():
+        try:
+            ds.write_dataset(
+                iter(pending.get, None),
+                tmp_dir,
+                schema=_schema(),
+                format=file_format,
+                file_options=file_format.make_write_options(compression="zstd", write_statistics=True),
+                partitioning=_partitioning(),
+                max_rows_per_group=ROW_GROUP_SIZE,
+                min_rows_per_group=ROW_GROUP_SIZE,
+                use_threads=False,  # keeps the (iceberg, time) order of the batches inside every file
+            )
+        except Exception as e:
+            failure.append(e)
+            while pending.get() is not None:  # never leave the producer blocked
+                pass
+
+    written = 0
+    writer = threading.Thread(target=write, name="parquet-export", daemon=True)
+    writer.start()
+    try:
+        for batch in batches:
+            written += batch.num_rows
+            pending.put(batch)
+    finally:
+        pending.put(None)
+        writer.join()
+    if failure:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise failure[0]
+    with _lock:
+        old_dir = f"{target_dir}.{os.getpid()}.old"
+        if os.path.exists(target_dir):
+            os.replace(target_dir, old_dir)
+        os.replace(tmp_dir, target_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return written
+
+
+def export_database(db, target_dir):
+    """Export all observations of the database, returns the number of rows"""
+    _require_pyarrow()
+    return write_observation_dataset(database_batches(db), target_dir)
+
+
+def convert_csv_archive(data_dir, target_dir):
+    """Convert the static CSV archive without going through the database, returns the number of rows"""
+    _require_pyarrow()
+    return write_observation_dataset(csv_archive_batches(data_dir), target_dir)
+
+
+class ParquetObservations:
+    """
+    Statistics queries of `IcebergRepository` answered by scanning the Parquet export,
+    only the needed columns are read and year filters prune whole partitions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dataset = ds.dataset(path, format="parquet", partitioning=_partitioning())
+
+    def scan(self, columns, filter=None):
+        return self.dataset.to_table(columns=columns, filter=filter)
+
+    def edge_records(self, last=False):
+        """First (birth) or last (last seen) observation of every iceberg"""
+        table = self.scan(["iceberg_id", "record_time", "latitude", "longitude", "rotational_velocity"])
+        codes = table["iceberg_id"].combine_chunks().dictionary_encode()
+        indices = codes.indices.to_numpy()
+        order = np.lexsort((table["record_time"].cast(pa.int64()).to_numpy(), indices))
+        # rows of one iceberg are contiguous in `order`, take the first or last of every run
+        starts = np.flatnonzero(np.diff(indices[order], prepend=-1))
+        edges = order[np.append(starts[1:] - 1, len(order) - 1)] if last else order[starts]
+        # in iceberg_id order like the repository, so sums over the records match to the last bit
+        rows = table.take(pa.array(edges)).sort_by("iceberg_id").to_pydict()
+        return [
+            EdgeRecord(*values)
+            for values in zip(
+                rows["iceberg_id"], rows["latitude"], rows["longitude"], rows["record_time"], rows["rotational_velocity"]
+            )
+        ]
+
+    def active_count_by_month(self):
+        """(year, month, distinct icebergs observed) per month, in time order"""
+        table = self.scan(["iceberg_id", "record_time", "year"])
+        table = table.append_column("month", pc.month(table["record_time"]))
+        counts = table.group_by(["year", "month"]).aggregate([("iceberg_id", "count_distinct")])
+        counts = counts.sort_by([("year", "ascending"), ("month", "ascending")])
+        return [(r["year"], r["month"], r["iceberg_id_count_distinct"]) for r in counts.to_pylist()]
+
+    def area_bins_by_year(self, bins, labels, start_year, end_year):
+        """(year, label, distinct icebergs) of observations with an area inside bins[i] <= area < bins[i + 1]"""
+        years = (ds.field("year") >= start_year) & (ds.field("year") <= end_year)
+        table = self.scan(["iceberg_id", "area_at_record_time", "year"], filter=years & ds.field("area_at_record_time").is_valid())
+        index = np.searchsorted(np.asarray(bins), table["area_at_record_time"].to_numpy(), side="right") - 1
+        index[(index < 0) | (index >= len(labels))] = len(labels)
+        table = table.append_column("bin", pa.array(index, pa.int32()))
+        counts = table.group_by(["year", "bin"]).aggregate([("iceberg_id", "count_distinct")])
+        names = list(labels) + ["Other"]
+        return sorted((r["year"], names[r["bin"]], r["iceberg_id_count_distinct"]) for r in counts.to_pylist())
+
+
+def get_parquet_observations(path):
+    """Dataset reader of the export at `path`, reopened when the export was replaced"""
+    _require_pyarrow()
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        raise ParquetUnavailable(f"No Parquet export at {path}, run `flask export-parquet` first")
+    with _lock:
+        cached = _datasets.get(path)
+        if cached is None or cached[0] != inode:
+            cached = _datasets[path] = (inode, ParquetObservations(path))
+    return cached[1]
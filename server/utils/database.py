@@ -0,0 +1,85 @@
+from sqlalchemy import event, inspect, literal, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateIndex
+
+from ..config import (
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    SQLITE_WAL,
+    SQLITE_BUSY_TIMEOUT,
+)
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database uri, in-memory SQLite keeps its single connection pool"""
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        options = {"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT / 1000}}
+        if url.database in (None, "", ":memory:"):
+            return options
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        return options
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def enable_sqlite_pragmas(engine):
+    """
+    WAL journal, busy timeout and synchronous=NORMAL on every new SQLite connection.
+    With WAL, readers keep reading the last committed state while the ingest writes.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        if SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+def upgrade_schema(engine, metadata):
+    """
+    Add the columns and indexes of `metadata` that tables created by an earlier version lack, `create_all` only
+    creates missing tables. Nothing is dropped or altered, running it again is a no-op. Returns the DDL executed.
+    """
+    dialect = engine.dialect
+    preparer = dialect.identifier_preparer
+    statements = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        existing_tables = set(inspector.get_table_names())
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+                ddl += column.type.compile(dialect=dialect)
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    value = literal(default, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+                    ddl += f" DEFAULT {value}"
+                    # existing rows get the default, without one a NOT NULL column could not be added
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                statements.append(ddl)
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            statements += [
+                str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes if index.name not in indexes
+            ]
+        for statement in statements:
+            connection.execute(text(statement))
+    return statements
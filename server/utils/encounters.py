@@ -0,0 +1,160 @@
+import numpy as np
+
+from .observations import get_observations, get_derived
+from .utils import forecast_positions
+
+EARTH_RADIUS_KM = 6371.0088
+# (candidate, route segment) pairs whose distance is computed in one vectorized block, about 24 bytes per pair
+# for each of the several (K, M, 3) temporaries, so a block stays within a few hundred MB whatever the route length
+BLOCK_PAIRS = 2_000_000
+# icebergs whose last observation is older than this (before the route starts) get no forecast
+FORECAST_MAX_AGE_DAYS = 100
+
+
+def unit_vectors(lats, lons):
+    """(N, 3) unit vectors of lat/lon in degrees, distances between them stay correct near the pole"""
+    lat_rad, lon_rad = np.radians(lats), np.radians(lons)
+    cos_lat = np.cos(lat_rad)
+    return np.stack([cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad)], axis=-1)
+
+
+def _angle(u, v):
+    """Angle between unit vectors along the last axis, numerically stable for small angles"""
+    return np.arctan2(np.linalg.norm(np.cross(u, v), axis=-1), np.sum(u * v, axis=-1))
+
+
+def point_segment_angles(points, seg_start, seg_end):
+    """
+    Great circle angle between every point (K, 3) and every arc segment (M, 3) -> (K, M).
+    Uses the perpendicular distance when the foot point falls onto the arc, the nearer endpoint otherwise.
+    """
+    p = points[:, None, :]
+    a, b = seg_start[None, :, :], seg_end[None, :, :]
+    normal = np.cross(seg_start, seg_end)
+    norm = np.linalg.norm(normal, axis=-1)
+    degenerate = norm < 1e-12
+    normal = normal / np.where(degenerate, 1.0, norm)[:, None]
+    n = normal[None, :, :]
+
+    endpoint = np.minimum(_angle(p, a), _angle(p, b))
+    perpendicular = np.abs(np.arcsin(np.clip(np.sum(p * n, axis=-1), -1.0, 1.0)))
+    # foot point lies between a and b when p is on the inner side of both end planes
+    within = (np.sum(np.cross(a, p) * n, axis=-1) >= 0) & (np.sum(np.cross(p, b) * n, axis=-1) >= 0)
+    within &= ~degenerate[None, :]
+    return np.where(within, perpendicular, endpoint)
+
+
+def _time_index(obs):
+    order = np.argsort(obs.times, kind="stable")
+    return {"order": order, "times": obs.times[order], "xyz": unit_vectors(obs.latitudes[order], obs.longitudes[order])}
+
+
+def observation_time_index(obs):
+    """Observations sorted by time with precomputed unit vectors, built once per dataset version"""
+    return get_derived("encounters:time-index", _time_index, obs)
+
+
+def _forecast_candidates(obs, window_start, window_end):
+    """Forecast positions inside the window for icebergs last seen shortly before or during it"""
+    ids, times, lats, lons = [], [], [], []
+    last_times = obs.times[obs.offsets[1:] - 1] if len(obs.times) else np.array([], dtype=np.int64)
+    recent = np.flatnonzero(
+        (np.diff(obs.offsets) > 0)
+        & (last_times >= window_start - FORECAST_MAX_AGE_DAYS * 86400)
+        & (last_times < window_end)
+    )
+    for i in recent:
+        start, end = obs.offsets[i], obs.offsets[i + 1]
+        future_times, pred_lats, pred_lons = forecast_positions(
+            obs.times[start:end], obs.latitudes[start:end], obs.longitudes[start:end], step_seconds=86400, steps=100
+        )
+        keep = (future_times >= window_start) & (future_times <= window_end)
+        ids.append(np.full(keep.sum(), i, dtype=np.int32))
+        times.append(future_times[keep].astype(np.int64))
+        lats.append(pred_lats[keep])
+        lons.append(pred_lons[keep])
+    if not ids:
+        return np.array([], dtype=np.int32), np.array([], dtype=np.int64), np.empty((0, 3))
+    return np.concatenate(ids), np.concatenate(times), unit_vectors(np.concatenate(lats), np.concatenate(lons))
+
+
+def _closest(candidate_icebergs, candidate_times, candidate_xyz, seg_a, seg_b, seg_t0, seg_t1, max_angle, tolerance):
+    """Best (angle, segment) per candidate inside the radius and the time window of a segment"""
+    hits = []
+    chunk_size = max(1, BLOCK_PAIRS // max(1, len(seg_a)))
+    for start in range(0, len(candidate_times), chunk_size):
+        stop = start + chunk_size
+        angles = point_segment_angles(candidate_xyz[start:stop], seg_a, seg_b)
+        t = candidate_times[start:stop, None]
+        angles = np.where((t >= seg_t0[None, :] - tolerance) & (t <= seg_t1[None, :] + tolerance), angles, np.inf)
+        best_segment = np.argmin(angles, axis=1)
+        best_angle = angles[np.arange(len(angles)), best_segment]
+        inside = np.flatnonzero(best_angle <= max_angle)
+        hits.append((inside + start, best_angle[inside], best_segment[inside]))
+    if not hits:
+        return np.array([], dtype=np.int64), np.array([]), np.array([], dtype=np.int64)
+    return tuple(np.concatenate(parts) for parts in zip(*hits))
+
+
+def find_encounters(route_lats, route_lons, route_times, radius_km, time_tolerance_s, include_predictions=True):
+    """
+    Icebergs coming within `radius_km` of a timed route polyline.
+    An observation (or forecast position) at time t is matched against route segment i
+    when t lies in [t_i - tolerance, t_i+1 + tolerance]. Returns the closest approach per iceberg, nearest first.
+    """
+    obs = get_observations()
+    route_times = np.asarray(route_times, dtype=np.int64)
+    route_xyz = unit_vectors(np.asarray(route_lats, dtype=float), np.asarray(route_lons, dtype=float))
+    if len(route_xyz) == 1:
+        route_xyz = np.vstack([route_xyz, route_xyz])
+        route_times = np.concatenate([route_times, route_times])
+    seg_a, seg_b = route_xyz[:-1], route_xyz[1:]
+    seg_t0, seg_t1 = route_times[:-1], route_times[1:]
+    max_angle = radius_km / EARTH_RADIUS_KM
+    window_start, window_end = route_times.min() - time_tolerance_s, route_times.max() + time_tolerance_s
+
+    index = observation_time_index(obs)
+    lo, hi = np.searchsorted(index["times"], [window_start, window_end + 1])
+    rows = index["order"][lo:hi]
+    xyz = index["xyz"][lo:hi]
+    # coarse filter: stay within radius of the route's latitude band
+    lat_deg = np.degrees(np.arcsin(np.clip(xyz[:, 2], -1, 1))) if len(xyz) else np.array([])
+    margin = np.degrees(max_angle)
+    band = (lat_deg >= np.min(route_lats) - margin) & (lat_deg <= np.max(route_lats) + margin)
+    rows, xyz = rows[band], xyz[band]
+
+    candidate_icebergs = obs.iceberg_idx[rows]
+    candidate_times = obs.times[rows]
+    is_prediction = np.zeros(len(rows), dtype=bool)
+    if include_predictions:
+        f_icebergs, f_times, f_xyz = _forecast_candidates(obs, window_start, window_end)
+        candidate_icebergs = np.concatenate([candidate_icebergs, f_icebergs])
+        candidate_times = np.concatenate([candidate_times, f_times])
+        xyz = np.vstack([xyz, f_xyz])
+        is_prediction = np.concatenate([is_prediction, np.ones(len(f_times), dtype=bool)])
+
+    hit_rows, hit_angles, hit_segments = _closest(
+        candidate_icebergs, candidate_times, xyz, seg_a, seg_b, seg_t0, seg_t1, max_angle, time_tolerance_s
+    )
+    # closest approach per iceberg: sort by angle, keep the first row of each iceberg
+    order = np.argsort(hit_angles, kind="stable")
+    hit_rows, hit_angles, hit_segments = hit_rows[order], hit_angles[order], hit_segments[order]
+    _, first = np.unique(candidate_icebergs[hit_rows], return_index=True)
+    first = np.sort(first)
+
+    encounters = []
+    for i in first:
+        row = hit_rows[i]
+        x, y, z = xyz[row]
+        encounters.append(
+            {
+                "iceberg_id": str(obs.iceberg_ids[candidate_icebergs[row]]),
+                "distance_km": float(hit_angles[i] * EARTH_RADIUS_KM),
+                "record_time": int(candidate_times[row]),
+                "latitude": float(np.degrees(np.arcsin(np.clip(z, -1, 1)))),
+                "longitude": float(np.degrees(np.arctan2(y, x))),
+                "route_segment": int(hit_segments[i]),
+                "is_prediction": bool(is_prediction[row]),
+            }
+        )
+    return encounters
@@ -0,0 +1,149 @@
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select, insert, update, delete
+
+from ..config import (
+    EVENT_DETECTOR_USER,
+    GROUNDING_MAX_SPEED,
+    GROUNDING_MIN_DAYS,
+    AREA_LOSS_FRACTION,
+    AREA_LOSS_MIN_AREA,
+)
+from ..models import IcebergEvent
+from .observations import load_observations
+from .encounters import EARTH_RADIUS_KM, unit_vectors
+from .lineage import lineage_path
+
+CALVING = "calving"
+GROUNDING = "grounding"
+AREA_LOSS = "area_loss"
+DETECTED_EVENT_TYPES = (CALVING, GROUNDING, AREA_LOSS)
+
+
+def _event(obs, row, event_type, description):
+    return {
+        "iceberg_id": str(obs.iceberg_ids[obs.iceberg_idx[row]]),
+        "event_type": event_type,
+        "description": description,
+        "user_name": EVENT_DETECTOR_USER,
+        "record_time": datetime.fromtimestamp(int(obs.times[row]), tz=timezone.utc).replace(tzinfo=None),
+        "latitude": float(obs.latitudes[row]),
+        "longitude": float(obs.longitudes[row]),
+        "detected": True,
+    }
+
+
+def drift_speeds(obs):
+    """
+    Drift between consecutive observations, pair `i` joining rows `i` and `i + 1`.
+    Returns (same track mask, days between the rows, speed in km/day), pairs spanning two tracks are masked out.
+    """
+    same = obs.iceberg_idx[1:] == obs.iceberg_idx[:-1]
+    days = (obs.times[1:] - obs.times[:-1]) / 86400.0
+    xyz = unit_vectors(obs.latitudes, obs.longitudes)
+    chord = np.linalg.norm(xyz[1:] - xyz[:-1], axis=-1)
+    km = 2 * np.arcsin(np.clip(chord / 2, 0.0, 1.0)) * EARTH_RADIUS_KM
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(days > 0, km / days, np.where(km == 0, 0.0, np.inf))
+    return same, days, speed
+
+
+def detect_calvings(obs):
+    """One event at the first observation of every iceberg whose id names a parent, e.g. `a23a` of `a23`"""
+    events = []
+    for i, iceberg_id in enumerate(obs.iceberg_ids):
+        path = lineage_path(str(iceberg_id))
+        if path and obs.offsets[i + 1] > obs.offsets[i]:
+            events.append(_event(obs, obs.offsets[i], CALVING, f"{iceberg_id} calved from {path[-1]}"))
+    return events
+
+
+def detect_groundings(obs, max_speed=GROUNDING_MAX_SPEED, min_days=GROUNDING_MIN_DAYS):
+    """
+    Runs of consecutive observations drifting at most `max_speed` km/day for at least `min_days`,
+    reported at the first observation of the run.
+    """
+    same, _, speed = drift_speeds(obs)
+    slow = same & (speed <= max_speed)
+    # run of slow pairs [start, end) covers rows start..end
+    change = np.diff(np.concatenate(([0], slow.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(change == 1), np.flatnonzero(change == -1)
+    duration = (obs.times[ends] - obs.times[starts]) / 86400.0
+    keep = duration >= min_days
+
+    events = []
+    for start, end, days in zip(starts[keep], ends[keep], duration[keep]):
+        distance = np.sum(speed[start:end] * (obs.times[start + 1 : end + 1] - obs.times[start:end]) / 86400.0)
+        description = f"Grounded for {days:.0f} days, drifting {distance / days:.2f} km/day"
+        events.append(_event(obs, start, GROUNDING, description))
+    return events
+
+
+def detect_area_losses(obs, fraction=AREA_LOSS_FRACTION, min_area=AREA_LOSS_MIN_AREA):
+    """Drops of at least `fraction` of the area between consecutive area measurements of icebergs above `min_area`"""
+    rows = np.flatnonzero(np.isfinite(obs.areas))
+    previous, current = rows[:-1], rows[1:]
+    before, after = obs.areas[previous], obs.areas[current]
+    same = obs.iceberg_idx[previous] == obs.iceberg_idx[current]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        loss = np.where(before > 0, (before - after) / before, 0.0)
+    keep = same & (before >= min_area) & (loss >= fraction)
+
+    return [
+        _event(obs, row, AREA_LOSS, f"Lost {lost:.0%} of its area, {a:.0f} -> {b:.0f} km²")
+        for row, lost, a, b in zip(current[keep], loss[keep], before[keep], after[keep])
+    ]
+
+
+def detect_events(db, iceberg_ids=None):
+    """
+    (Re)detect events of the given icebergs, or of the whole catalogue when `iceberg_ids` is None.
+    Runs at ingest. Detected events are matched on (iceberg_id, event_type, record_time): events detected again
+    keep their event_id and get the new description and position, events no longer detected are removed,
+    reported ones are kept. Returns the number of detected events.
+    """
+    stored = select(
+        IcebergEvent.event_id,
+        IcebergEvent.iceberg_id,
+        IcebergEvent.event_type,
+        IcebergEvent.record_time,
+        IcebergEvent.description,
+        IcebergEvent.latitude,
+        IcebergEvent.longitude,
+    ).where(IcebergEvent.detected.is_(True))
+    if iceberg_ids is not None:
+        iceberg_ids = list(iceberg_ids)
+        stored = stored.where(IcebergEvent.iceberg_id.in_(iceberg_ids))
+    existing = {(row.iceberg_id, row.event_type, row.record_time): row for row in db.session.execute(stored)}
+    obs = load_observations(iceberg_ids)
+    events = detect_calvings(obs) + detect_groundings(obs) + detect_area_losses(obs)
+
+    new, changed = [], []
+    for event in events:
+        row = existing.pop((event["iceberg_id"], event["event_type"], event["record_time"]), None)
+        if row is None:
+            new.append(event)
+        elif (row.description, row.latitude, row.longitude) != (
+            event["description"],
+            event["latitude"],
+            event["longitude"],
+        ):
+            changed.append(
+                {
+                    "event_id": row.event_id,
+                    "description": event["description"],
+                    "latitude": event["latitude"],
+                    "longitude": event["longitude"],
+                }
+            )
+    if existing:
+        db.session.execute(
+            delete(IcebergEvent).where(IcebergEvent.event_id.in_([row.event_id for row in existing.values()]))
+        )
+    if changed:
+        db.session.execute(update(IcebergEvent), changed)
+    if new:
+        db.session.execute(insert(IcebergEvent), new)
+    db.session.commit()
+    return len(events)
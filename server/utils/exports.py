@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import uuid
+import time
+import shutil
+import zipfile
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from ..config import RENDER_WORKERS
+from .timeline import interpolate_positions
+from .rendering import submit, render_base_map, render_drift_frames
+
+# frames painted per task sent to the render pool
+FRAMES_PER_TASK = 10
+# finished exports are deleted after this many seconds, unfinished ones older than this were interrupted
+EXPORT_TTL = 24 * 3600
+
+# state of a job is kept in this file of its directory, so any worker process can answer status polls
+JOB_FILE = "job.json"
+JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+_jobs_lock = threading.Lock()
+# one export is coordinated at a time, its frames are spread over the render pool
+_coordinator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="iceberg-export")
+
+
+def _read_job(directory):
+    try:
+        with open(os.path.join(directory, JOB_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_job(directory, job):
+    """Replace the job file atomically, readers in other processes never see a partial file"""
+    tmp_path = os.path.join(directory, f"{JOB_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, os.path.join(directory, JOB_FILE))
+
+
+def _update(directory, **fields):
+    # only the process coordinating a job writes its file
+    with _jobs_lock:
+        job = _read_job(directory)
+        job.update(fields)
+        _write_job(directory, job)
+
+
+def get_job(export_dir, job_id):
+    """State of a job as written by the process running it, None for unknown or malformed ids"""
+    if not JOB_ID.fullmatch(job_id):
+        return None
+    return _read_job(os.path.join(export_dir, job_id))
+
+
+def _cleanup_expired(export_dir):
+    """
+    Delete exports finished more than EXPORT_TTL ago. Jobs still queued or running after EXPORT_TTL
+    lost their coordinator (the process was restarted), they are marked failed and deleted one TTL later.
+    """
+    now = time.time()
+    for job_id in os.listdir(export_dir) if os.path.isdir(export_dir) else []:
+        directory = os.path.join(export_dir, job_id)
+        job = _read_job(directory)
+        if not job:
+            continue
+        if job["finished_at"]:
+            if now - job["finished_at"] > EXPORT_TTL:
+                shutil.rmtree(directory, ignore_errors=True)
+        elif now - job["created_at"] > EXPORT_TTL:
+            _update(directory, status="failed", error="Export was interrupted", finished_at=now)
+
+
+def _open_frames(paths):
+    """Frames one at a time for the GIF writer, which copies each, so only one file is open at once"""
+    from PIL import Image
+
+    for path in paths:
+        with Image.open(path) as image:
+            yield image
+
+
+def _project(mapping, lats, lons):
+    """lon/lat -> pixel coordinates on the base map image"""
+    import cartopy.crs as ccrs
+
+    projected = ccrs.SouthPolarStereo().transform_points(ccrs.PlateCarree(), np.asarray(lons), np.asarray(lats))
+    x0, y0, x1, y1 = mapping["bbox"]
+    (xmin, xmax), (ymin, ymax) = mapping["xlim"], mapping["ylim"]
+    px = x0 + (projected[:, 0] - xmin) / (xmax - xmin) * (x1 - x0)
+    py = mapping["height"] - (y0 + (projected[:, 1] - ymin) / (ymax - ymin) * (y1 - y0))
+    return px, py
+
+
+def _run_export(directory, obs, times, options):
+    frames_dir = os.path.join(directory, "frames")
+    os.makedirs(frames_dir, exist_ok=True)
+    try:
+        _update(directory, status="running", started_at=time.time())
+        # the base map is the expensive part, it is drawn a single time per job
+        rgba, mapping = submit(render_base_map, 8, 8, options["dpi"], block=True).result()
+        from PIL import Image
+
+        base_path = os.path.join(directory, "base.png")
+        Image.fromarray(rgba).convert("RGB").save(base_path)
+
+        frames = []
+        for index, t in enumerate(times):
+            _, lats, lons = interpolate_positions(obs, int(t), options["max_gap_days"])
+            px, py = _project(mapping, lats, lons) if len(lats) else (np.array([]), np.array([]))
+            label = datetime.fromtimestamp(int(t), tz=timezone.utc).strftime("%Y-%m-%d")
+            frames.append((index, label, px.tolist(), py.tolist()))
+
+        tasks = [frames[i : i + FRAMES_PER_TASK] for i in range(0, len(frames), FRAMES_PER_TASK)]
+        pending, done_frames = set(), 0
+        # keep at most one task per worker in flight so interactive renders are not starved,
+        # the tasks take slots of the render queue like interactive renders and wait for a free one
+        while tasks or pending:
+            while tasks and len(pending) < RENDER_WORKERS:
+                pending.add(submit(render_drift_frames, base_path, tasks.pop(0), frames_dir, block=True))
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done_frames += future.result()
+            _update(directory, progress=done_frames / len(frames))
+
+        frame_files = sorted(os.listdir(frames_dir))
+        if options["format"] == "gif":
+            result_path = os.path.join(directory, "drift.gif")
+            paths = [os.path.join(frames_dir, f) for f in frame_files]
+            with Image.open(paths[0]) as first:
+                first.save(
+                    result_path,
+                    save_all=True,
+                    append_images=_open_frames(paths[1:]),
+                    duration=int(1000 / options["fps"]),
+                    loop=0,
+                )
+        else:
+            result_path = os.path.join(directory, "drift_frames.zip")
+            with zipfile.ZipFile(result_path, "w", compression=zipfile.ZIP_STORED) as archive:
+                for f in frame_files:
+                    archive.write(os.path.join(frames_dir, f), arcname=f)
+        shutil.rmtree(frames_dir, ignore_errors=True)
+        _update(directory, status="done", progress=1.0, result_path=result_path, finished_at=time.time())
+    except Exception as e:
+        _update(directory, status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+
+
+def submit_animation_export(export_dir, obs, times, output_format="gif", fps=8, dpi=100, max_gap_days=30):
+    """
+    Queue an animated drift export over `times` (unix seconds) into a job directory below `export_dir`,
+    returns its job id.
+    Job state is kept next to its output, so status polls may reach any worker process.
+    """
+    _cleanup_expired(export_dir)
+    job_id = uuid.uuid4().hex
+    directory = os.path.join(export_dir, job_id)
+    os.makedirs(directory, exist_ok=True)
+    _write_job(
+        directory,
+        {
+            "id": job_id,
+            "status": "queued",
+            "format": output_format,
+            "frames": len(times),
+            "progress": 0.0,
+            "error": None,
+            "result_path": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        },
+    )
+    options = {"format": output_format, "fps": fps, "dpi": dpi, "max_gap_days": max_gap_days}
+    _coordinator.submit(_run_export, directory, obs, times, options)
+    return job_id
@@ -1,27 +1,94 @@
-import requests
+import os
 import json
-from bs4 import BeautifulSoup
+import hashlib
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime
 
+from ..config import SCP_BYU_URL, SCRAPE_TIMEOUT, SCRAPE_RETRIES, SCRAPE_VERIFY_SSL
 from .utils import dms2dec, get_update_datetime
 
-def read_current_iceberg_location():
+
+def _load_fetch_state(state_path):
+    if state_path and os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as fp:
+            return json.load(fp)
+    return {}
+
+
+def save_fetch_state(state_path, state):
+    """Remember the page described by `state`, called once its snapshot is ingested"""
+    if not state_path or not state:
+        return
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        json.dump(state, fp)
+    os.replace(tmp_path, state_path)
+
+
+def create_session(retries=SCRAPE_RETRIES, backoff_factor=0.5):
+    """Session retrying connection errors and transient server errors with exponential backoff"""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(max_retries=retry))
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    return session
+
+
+def fetch_current_iceberg_page(url=SCP_BYU_URL, state_path=None, session=None, timeout=SCRAPE_TIMEOUT):
     """
-    Reads the webpage and remove unwanted tags
+    Conditionally download the SCP current iceberg page, returns (content, fetch state).
+    ETag/Last-Modified and a digest of the last ingested page are read from `state_path`, content is None when the
+    server answers 304 or the content did not change. The new state is not written here, the caller passes it to
+    `save_fetch_state` once the page is ingested, so a failed ingest is retried on the next run.
     """
-    scp_byu_html = requests.get(
-        "https://www.scp.byu.edu/current_icebergs.html", verify=False
-    )
+    state = _load_fetch_state(state_path)
+    headers = {}
+    if state.get("url") == url:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
 
-    soup = BeautifulSoup(scp_byu_html.content, "lxml")
+    session = session or create_session()
+    response = session.get(url, headers=headers, timeout=timeout, verify=SCRAPE_VERIFY_SSL)
+    if response.status_code == 304:
+        return None, None
+    response.raise_for_status()
 
-    revised_date_str = soup.p.text[-17:]
+    digest = hashlib.sha256(response.content).hexdigest()
+    if state.get("url") == url and state.get("sha256") == digest:
+        return None, None
+    new_state = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "sha256": digest,
+    }
+    return response.content, new_state
+
+
+def parse_current_iceberg_location(html):
+    """
+    Extract the iceberg table rows and the revision date from the page.
+    Only <p> and <table> elements are built into the tree.
+    """
+    soup = BeautifulSoup(html, "lxml", parse_only=SoupStrainer(["p", "table"]))
+
+    revised_date_str = soup.p.text.strip()[-17:]
     revised_date = datetime.strptime(revised_date_str, "%H:%M:%S %m/%d/%y")
 
     data = []
     rows = []
     tables = soup.table.find_all("table")
-    if len(tables) > 0:
+    if len(tables) > 1:
         rows = tables[1].table.find_all("tr")
 
     for row in rows:
@@ -32,6 +99,19 @@ def read_current_iceberg_location():
     return data, revised_date
 
 
+def read_current_iceberg_location(url=SCP_BYU_URL, state_path=None, session=None):
+    """
+    Reads the webpage and remove unwanted tags.
+    Returns (location data, revised date, fetch state), (None, None, None) if the page did not change since the last
+    ingested read.
+    """
+    html, fetch_state = fetch_current_iceberg_page(url=url, state_path=state_path, session=session)
+    if html is None:
+        return None, None, None
+    location_data, revised_date = parse_current_iceberg_location(html)
+    return location_data, revised_date, fetch_state
+
+
 def get_iceberg_details(location_data, revised_date):
     """
     The formatted location data is returned with last updated data
@@ -59,18 +139,3 @@ def get_iceberg_details(location_data, revised_date):
         )
     return result
 
-
-def save_data_as_file(location_details, revised_date, data_path):
-    formatted_date = revised_date.strftime("%m/%d/%y")
-    with open(data_path, "r+") as fp:
-        current_location_details = fp.read()
-        if current_location_details:
-            current_location_details = json.loads(current_location_details)
-            current_location_details[formatted_date] = location_details
-        else:
-            current_location_details = {formatted_date: location_details}
-        json_location_details = json.dumps(current_location_details)
-        fp.seek(0)
-        fp.truncate(0)
-        fp.write(json_location_details)
-        fp.close()
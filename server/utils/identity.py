@@ -0,0 +1,63 @@
+import time
+import threading
+from typing import NamedTuple
+from collections import OrderedDict
+
+from flask_jwt_extended import JWTManager
+
+from ..config import IDENTITY_CACHE_TTL, IDENTITY_CACHE_SIZE
+from ..models import User
+from .types import UserType
+
+jwt = JWTManager()
+
+_lock = threading.Lock()
+_identities = OrderedDict()  # username -> (Identity, cached at), least recently used first
+
+
+class Identity(NamedTuple):
+    """Detached view of a user, safe to share between requests unlike ORM instances"""
+
+    id: int
+    username: str
+    email: str
+    role: UserType
+
+    @property
+    def is_superuser(self):
+        return self.role == UserType.MANAGER
+
+
+def lookup_identity(username):
+    """User of a JWT identity, cached for IDENTITY_CACHE_TTL seconds. Unknown users are not cached."""
+    now = time.monotonic()
+    with _lock:
+        cached = _identities.get(username)
+        if cached and now - cached[1] < IDENTITY_CACHE_TTL:
+            _identities.move_to_end(username)
+            return cached[0]
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        forget_identity(username)
+        return None
+    identity = Identity(user.id, user.username, user.email, user.role)
+    with _lock:
+        _identities.pop(username, None)
+        if len(_identities) >= IDENTITY_CACHE_SIZE:
+            _identities.popitem(last=False)
+        _identities[username] = (identity, now)
+    return identity
+
+
+def forget_identity(username=None):
+    """Drop one cached user (all when None), call after a user is changed or removed"""
+    with _lock:
+        if username is None:
+            _identities.clear()
+        else:
+            _identities.pop(username, None)
+
+
+@jwt.user_lookup_loader
+def _user_lookup(_jwt_header, jwt_data):
+    return lookup_identity(jwt_data["sub"])
@@ -0,0 +1,84 @@
+import re
+from sqlalchemy import insert, delete
+
+from ..models import Iceberg, IcebergLineage
+
+# designation prefix and number form the family root, every following letter or digit group is one calving generation
+_ID_PATTERN = re.compile(r"^([a-z]+\d+)((?:[a-z]|\d+)*)$")
+_GENERATION_PATTERN = re.compile(r"[a-z]|\d+")
+
+
+def normalize_id(iceberg_id):
+    """Ids are compared case-insensitively, ancestors derived from an id are always lowercase"""
+    return iceberg_id.lower()
+
+
+def lineage_path(iceberg_id):
+    """
+    Ancestors of an iceberg from the family root down to its parent, derived from the id alone.
+    >>> lineage_path("c28a2")
+    ['c28', 'c28a']
+    """
+    match = _ID_PATTERN.match(normalize_id(iceberg_id))
+    if not match:
+        return []
+    base, suffix = match.groups()
+    generations = _GENERATION_PATTERN.findall(suffix)
+    ancestors = [base]
+    for generation in generations[:-1]:
+        ancestors.append(ancestors[-1] + generation)
+    return ancestors if generations else []
+
+
+def family_root(iceberg_id):
+    path = lineage_path(iceberg_id)
+    return path[0] if path else normalize_id(iceberg_id)
+
+
+def lineage_rows(iceberg_id):
+    """
+    Closure rows (ancestor, descendant, depth) of one iceberg, including its self row.
+    Ancestor ids are normalized, the descendant keeps the catalogue id it references.
+    """
+    path = lineage_path(iceberg_id)
+    rows = [{"ancestor_id": normalize_id(iceberg_id), "descendant_id": iceberg_id, "depth": 0}]
+    for depth, ancestor in enumerate(reversed(path), start=1):
+        rows.append({"ancestor_id": ancestor, "descendant_id": iceberg_id, "depth": depth})
+    return rows
+
+
+def build_lineage(db, iceberg_ids=None):
+    """
+    (Re)build closure rows for the given icebergs, or for the whole catalogue when `iceberg_ids` is None.
+    Runs at ingest, returns the number of rows written.
+    """
+    if iceberg_ids is None:
+        iceberg_ids = [row.id for row in db.session.query(Iceberg.id)]
+        db.session.execute(delete(IcebergLineage))
+    else:
+        iceberg_ids = list(iceberg_ids)
+        db.session.execute(delete(IcebergLineage).where(IcebergLineage.descendant_id.in_(iceberg_ids)))
+    rows = [row for iceberg_id in iceberg_ids for row in lineage_rows(iceberg_id)]
+    if rows:
+        db.session.execute(insert(IcebergLineage), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def build_family_tree(root, members):
+    """
+    Nest family members under their parents. `members` maps iceberg id -> summary dict,
+    ancestors implied by the ids but never catalogued appear with `"observed": False`.
+    """
+    nodes = {root: {"id": root, "observed": False, "children": []}}
+    for iceberg_id in sorted(members):
+        path = lineage_path(iceberg_id)
+        for ancestor in path:
+            nodes.setdefault(ancestor, {"id": ancestor, "observed": False, "children": []})
+        node = nodes.setdefault(iceberg_id, {"id": iceberg_id, "children": []})
+        node.update(members[iceberg_id], observed=True)
+    for node_id, node in nodes.items():
+        path = lineage_path(node_id)
+        if path:
+            nodes[path[-1]]["children"].append(node)
+    return nodes[root]
@@ -1,13 +1,13 @@
 import os
 import csv
-import json
 from datetime import datetime
 
-from ..config import ROOT_PWD
+from ..config import ROOT_PWD, SCP_BYU_URL
 from .types import MaskType, UserType
 from ..models import Iceberg, IcebergInfo, User
-from .hooks import read_current_iceberg_location, get_iceberg_details, save_data_as_file
 from .utils import dms2dec
+from .lineage import build_lineage
+from .events import detect_events
 
 
 def initialize_db(data_dir, db):
@@ -60,39 +60,84 @@ def initialize_db(data_dir, db):
         db.session.commit()
 
     load_basic_data()
+    build_lineage(db)
     create_superuser()
+    detect_events(db)
 
 
-def get_new_data(scraped_json_path, db):
-    # scrape newest data from scp database
-    current_location_data, revised_date = read_current_iceberg_location()
-    detailed_location_details = get_iceberg_details(current_location_data, revised_date)
-    save_data_as_file(detailed_location_details, revised_date, data_path=scraped_json_path)
-    with open(scraped_json_path, "r", encoding="utf-8") as file:
-        iceberg_locations = json.load(file)
+def insert_snapshot(location_details, db):
+    """
+    Insert one scraped snapshot, skipping rows already stored under the same (iceberg_id, record_time).
+    Existing icebergs and observations are looked up with one set-based query each.
+    Returns the number of inserted observations.
+    """
+    entries = {}
+    for iceberg_data in location_details:
+        longitude, latitude = dms2dec(iceberg_data["dms_longitude"]), dms2dec(iceberg_data["dms_latitude"])
+        # if conversion failed, then dms not in proper format, consider this data to be invalid
+        if longitude is None or latitude is None:
+            continue
+        recent_observation_date = datetime.strptime(iceberg_data["recent_observation"], "%m/%d/%y")
+        entries[(iceberg_data["iceberg_id"], recent_observation_date)] = (longitude, latitude)
+    if not entries:
+        return 0
+
+    iceberg_ids = {iceberg_id for iceberg_id, _ in entries}
+    record_times = {record_time for _, record_time in entries}
+    known_icebergs = {row.id for row in db.session.query(Iceberg.id).filter(Iceberg.id.in_(iceberg_ids))}
+    existing = set(
+        db.session.query(IcebergInfo.iceberg_id, IcebergInfo.record_time).filter(
+            IcebergInfo.iceberg_id.in_(iceberg_ids), IcebergInfo.record_time.in_(record_times)
+        )
+    )
 
-    for _, iceberg_list in iceberg_locations.items():
-        for iceberg_data in iceberg_list:
-            iceberg_id = iceberg_data["iceberg_id"]
-            dms_longitude = iceberg_data["dms_longitude"]
-            dms_latitude = iceberg_data["dms_latitude"]
-            longitude, latitude = dms2dec(dms_longitude), dms2dec(dms_latitude)
-            # if conversion failed, then dms not in proper format, consider this data to be invalid
-            if longitude is None or latitude is None:
-                continue
-            recent_observation_date = datetime.strptime(iceberg_data["recent_observation"], "%m/%d/%y")
-            iceberg = Iceberg.query.filter_by(id=iceberg_id).first()
-            if not iceberg:
-                iceberg = Iceberg(id=iceberg_id, mask=MaskType.NO_DATA, area=0.0)
-                db.session.add(iceberg)
-            iceberg_info = IcebergInfo(
+    inserted = 0
+    new_icebergs = []
+    updated_icebergs = set()
+    for (iceberg_id, record_time), (longitude, latitude) in entries.items():
+        if (iceberg_id, record_time) in existing:
+            continue
+        if iceberg_id not in known_icebergs:
+            db.session.add(Iceberg(id=iceberg_id, mask=MaskType.NO_DATA, area=0.0))
+            known_icebergs.add(iceberg_id)
+            new_icebergs.append(iceberg_id)
+        db.session.add(
+            IcebergInfo(
                 iceberg_id=iceberg_id,
-                longitude=dms2dec(dms_longitude),
-                latitude=dms2dec(dms_latitude),
-                record_time=recent_observation_date,
+                longitude=longitude,
+                latitude=latitude,
+                record_time=record_time,
                 is_prediction=False,  # Assuming it's not a prediction for now
             )
+        )
+        updated_icebergs.add(iceberg_id)
+        inserted += 1
+    db.session.commit()
+    if new_icebergs:
+        build_lineage(db, new_icebergs)
+    if updated_icebergs:
+        detect_events(db, updated_icebergs)
+    db.session.close()
+    return inserted
 
-            db.session.add(iceberg_info)
-        db.session.commit()
-        db.session.close()
+
+def get_new_data(snapshot_store, db, url=SCP_BYU_URL, session=None):
+    """
+    Scrape newest data from scp database, append it to the snapshot store and insert only the new snapshot.
+    Returns the number of inserted observations, 0 if the page did not change.
+    """
+    # the scraper (requests, bs4, lxml) is only loaded by the process that runs the scheduler
+    from .hooks import read_current_iceberg_location, get_iceberg_details, save_fetch_state
+
+    state_path = os.path.join(snapshot_store.root, "scp_fetch_state.json")
+    current_location_data, revised_date, fetch_state = read_current_iceberg_location(
+        url=url, state_path=state_path, session=session
+    )
+    if current_location_data is None:
+        return 0
+    detailed_location_details = get_iceberg_details(current_location_data, revised_date)
+    snapshot_store.append(revised_date, detailed_location_details)
+    inserted = insert_snapshot(detailed_location_details, db)
+    # only now, if parsing or the insert failed the page is fetched and ingested again next time
+    save_fetch_state(state_path, fetch_state)
+    return inserted
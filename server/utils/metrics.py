@@ -0,0 +1,225 @@
+import sys
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from collections import Counter, OrderedDict, defaultdict
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import PROFILING, PROFILE_INTERVAL, PROFILES_KEPT
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_requests = Counter()  # (method, route, status) -> count
+_latency = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))  # (method, route) -> bucket counts, +Inf last
+_latency_sum = Counter()  # (method, route) -> seconds
+_sql_queries = Counter()  # route -> queries
+_sql_seconds = Counter()  # route -> seconds
+_phase_seconds = Counter()  # (route, phase) -> seconds
+_profiles = OrderedDict()  # profile id -> collapsed stacks
+_hooks_installed = False
+
+
+class RequestMetrics:
+    __slots__ = ("start", "queries", "query_seconds", "phases", "profiler")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.phases = Counter()
+        self.profiler = None
+
+
+def _current():
+    return g.get("request_metrics") if has_request_context() else None
+
+
+@contextmanager
+def phase(name):
+    """Time a part of the current request, e.g. `with phase("serialize"): ...`, no-op outside of requests"""
+    metrics = _current()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.phases[name] += time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the execution context, which both the success and the error event receive
+    if context is not None:
+        context.query_start = time.perf_counter()
+
+
+def _count_query(context):
+    start = getattr(context, "query_start", None)
+    metrics = _current()
+    if start is not None and metrics is not None:
+        metrics.queries += 1
+        metrics.query_seconds += time.perf_counter() - start
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _count_query(context)
+
+
+def _handle_error(exception_context):
+    """A failing statement never reaches after_cursor_execute, its time is counted here"""
+    _count_query(exception_context.execution_context)
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread every `interval` seconds, the result is in collapsed stack format"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _route():
+    # the url rule, not the path, keeps one series per endpoint
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _start_request():
+    metrics = g.request_metrics = RequestMetrics()
+    if PROFILING and request.headers.get("X-Profile") == "1":
+        metrics.profiler = SamplingProfiler(threading.get_ident()).start()
+
+
+def _finish_request(response):
+    metrics = _current()
+    if metrics is None:
+        return response
+    elapsed = time.perf_counter() - metrics.start
+    route, method = _route(), request.method
+    with _lock:
+        _requests[(method, route, response.status_code)] += 1
+        buckets = _latency[(method, route)]
+        buckets[next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))] += 1
+        _latency_sum[(method, route)] += elapsed
+        _sql_queries[route] += metrics.queries
+        _sql_seconds[route] += metrics.query_seconds
+        for name, seconds in metrics.phases.items():
+            _phase_seconds[(route, name)] += seconds
+
+    timings = [f'sql;dur={metrics.query_seconds * 1000:.1f};desc="{metrics.queries} queries"']
+    timings += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in metrics.phases.items()]
+    timings.append(f"total;dur={elapsed * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
+    if metrics.profiler is not None:
+        profile_id = uuid.uuid4().hex
+        with _lock:
+            _profiles[profile_id] = metrics.profiler.stop()
+            while len(_profiles) > PROFILES_KEPT:
+                _profiles.popitem(last=False)
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def init_metrics(app):
+    """
+    Time every request of `app`, count the SQL queries it runs and add a Server-Timing header.
+    Requests sent with `X-Profile: 1` are sampled by a stack profiler when PROFILING is on.
+    Metrics live in the memory of one process, with several WSGI workers every worker reports its own share.
+    """
+    global _hooks_installed
+    with _lock:
+        if not _hooks_installed:
+            # on the Engine class, so the primary and the published database are both covered
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(Engine, "handle_error", _handle_error)
+            _hooks_installed = True
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def get_profile(profile_id):
+    with _lock:
+        return _profiles.get(profile_id)
+
+
+def _labels(**labels):
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def render_prometheus():
+    """All collected metrics in the Prometheus text exposition format"""
+    with _lock:
+        requests = dict(_requests)
+        latency = {key: list(buckets) for key, buckets in _latency.items()}
+        latency_sum = dict(_latency_sum)
+        sql_queries, sql_seconds, phase_seconds = dict(_sql_queries), dict(_sql_seconds), dict(_phase_seconds)
+
+    lines = [
+        "# HELP iceberg_http_requests_total Requests handled, by route and status.",
+        "# TYPE iceberg_http_requests_total counter",
+    ]
+    for (method, route, status), count in sorted(requests.items()):
+        lines.append(f"iceberg_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += [
+        "# HELP iceberg_http_request_duration_seconds Request latency, by route.",
+        "# TYPE iceberg_http_request_duration_seconds histogram",
+    ]
+    for (method, route), buckets in sorted(latency.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+            cumulative += count
+            lines.append(
+                f"iceberg_http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {cumulative}"
+            )
+        lines.append(f"iceberg_http_request_duration_seconds_sum{_labels(method=method, route=route)} {latency_sum[(method, route)]}")
+        lines.append(f"iceberg_http_request_duration_seconds_count{_labels(method=method, route=route)} {cumulative}")
+
+    lines += [
+        "# HELP iceberg_sql_queries_total SQL statements executed while handling requests, by route.",
+        "# TYPE iceberg_sql_queries_total counter",
+    ]
+    lines += [f"iceberg_sql_queries_total{_labels(route=route)} {count}" for route, count in sorted(sql_queries.items())]
+    lines += [
+        "# HELP iceberg_sql_duration_seconds_total Time spent in SQL statements while handling requests, by route.",
+        "# TYPE iceberg_sql_duration_seconds_total counter",
+    ]
+    lines += [f"iceberg_sql_duration_seconds_total{_labels(route=route)} {s}" for route, s in sorted(sql_seconds.items())]
+    lines += [
+        "# HELP iceberg_phase_duration_seconds_total Time spent in named phases of requests, by route and phase.",
+        "# TYPE iceberg_phase_duration_seconds_total counter",
+    ]
+    lines += [
+        f"iceberg_phase_duration_seconds_total{_labels(route=route, phase=name)} {s}"
+        for (route, name), s in sorted(phase_seconds.items())
+    ]
+    return "\n".join(lines) + "\n"
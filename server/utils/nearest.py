@@ -0,0 +1,65 @@
+import numpy as np
+
+from .observations import get_observations, get_derived
+from .encounters import unit_vectors, EARTH_RADIUS_KM
+
+DAY = 86400
+
+
+def positions_at(obs, t):
+    """
+    Index of each iceberg's latest observation at or before unix time `t`, -1 if it had none yet.
+    One vectorized searchsorted over (iceberg, time) composite keys instead of a loop per iceberg.
+    """
+    n_icebergs = len(obs.iceberg_ids)
+    if not len(obs.times):
+        return np.full(n_icebergs, -1, dtype=np.int64)
+    base = int(obs.times.min())
+    span = int(obs.times.max()) - base + 2
+    keys = obs.iceberg_idx.astype(np.int64) * span + (obs.times - base)
+    queries = np.arange(n_icebergs, dtype=np.int64) * span + np.clip(t - base, -1, span - 1)
+    idx = np.searchsorted(keys, queries, side="right") - 1
+    return np.where(idx >= obs.offsets[:-1], idx, -1)
+
+
+def nearest_index(obs, day, max_age_days):
+    """
+    KD-tree over unit vectors of every iceberg's latest position as of the end of `day` (days since epoch),
+    skipping icebergs not observed within `max_age_days`. Built from the snapshot `obs`, once per dataset version
+    and day.
+    """
+
+    def build(obs):
+        from scipy.spatial import cKDTree
+
+        t = (day + 1) * DAY - 1
+        rows = positions_at(obs, t)
+        alive = rows >= 0
+        alive[alive] &= obs.times[rows[alive]] >= t - max_age_days * DAY
+        rows = rows[alive]
+        xyz = unit_vectors(obs.latitudes[rows], obs.longitudes[rows])
+        return (cKDTree(xyz) if len(rows) else None), rows
+
+    return get_derived(f"nearest:{day}:{max_age_days}", build, obs)
+
+
+def k_nearest(lat, lon, t, k, max_age_days):
+    """k nearest icebergs to (lat, lon) as of unix time `t`, sorted by great circle distance"""
+    obs = get_observations()
+    tree, rows = nearest_index(obs, int(t // DAY), max_age_days)
+    if tree is None:
+        return []
+    k = min(k, len(rows))
+    chord, hits = tree.query(unit_vectors(np.array([lat]), np.array([lon]))[0], k=k)
+    chord, hits = np.atleast_1d(chord), np.atleast_1d(hits)
+    distances = 2 * np.arcsin(np.clip(chord / 2, 0, 1)) * EARTH_RADIUS_KM
+    return [
+        {
+            "iceberg_id": str(obs.iceberg_ids[obs.iceberg_idx[rows[h]]]),
+            "distance_km": float(d),
+            "latitude": float(obs.latitudes[rows[h]]),
+            "longitude": float(obs.longitudes[rows[h]]),
+            "record_time": int(obs.times[rows[h]]),
+        }
+        for d, h in zip(distances, hits)
+    ]
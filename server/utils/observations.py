@@ -0,0 +1,138 @@
+import time
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import func
+
+from ..models import db, IcebergInfo
+
+# seconds a computed dataset version is trusted before asking the database again
+VERSION_TTL = 5.0
+
+_lock = threading.RLock()  # derived values may be built from other derived values
+_version_cache = {"version": None, "checked_at": 0.0}
+_observation_cache = {"version": None, "observations": None, "derived": {}}
+
+
+class Observations(NamedTuple):
+    """
+    Column arrays of all recorded (non-predicted) observations, sorted by (iceberg, time).
+    Rows of iceberg `i` live in `[offsets[i], offsets[i + 1])`.
+    """
+
+    version: str
+    iceberg_ids: np.ndarray  # unique iceberg ids, index used by `iceberg_idx`
+    iceberg_idx: np.ndarray  # int32, per row
+    times: np.ndarray  # int64, unix seconds, per row
+    latitudes: np.ndarray  # float64, per row
+    longitudes: np.ndarray  # float64, per row
+    areas: np.ndarray  # float64, NaN when not recorded
+    offsets: np.ndarray  # int64, len(iceberg_ids) + 1
+
+
+def dataset_version(force=False):
+    """
+    Cheap fingerprint of the observation table, changes whenever rows are ingested or removed.
+    The value is memoized for `VERSION_TTL` seconds so hot endpoints do not hit the database each call.
+    """
+    now = time.monotonic()
+    if not force and _version_cache["version"] is not None and now - _version_cache["checked_at"] < VERSION_TTL:
+        return _version_cache["version"]
+    max_id, count = db.session.query(func.max(IcebergInfo.record_id), func.count(IcebergInfo.record_id)).one()
+    version = f"{max_id or 0}-{count}"
+    _version_cache.update(version=version, checked_at=now)
+    return version
+
+
+def to_timestamp(dt: datetime) -> int:
+    """Naive datetimes in the database are UTC"""
+    return int((dt - datetime(1970, 1, 1)).total_seconds())
+
+
+def parse_utc(value):
+    """ISO-8601 string to naive UTC datetime"""
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _load_observations(version, iceberg_ids=None):
+    query = db.session.query(
+        IcebergInfo.iceberg_id,
+        IcebergInfo.record_time,
+        IcebergInfo.latitude,
+        IcebergInfo.longitude,
+        IcebergInfo.area_at_record_time,
+    ).filter(IcebergInfo.is_prediction.is_(False))
+    if iceberg_ids is not None:
+        query = query.filter(IcebergInfo.iceberg_id.in_(list(iceberg_ids)))
+    rows = query.all()
+    ids = np.array([r[0] for r in rows], dtype=object)
+    times = np.fromiter((to_timestamp(r[1]) for r in rows), dtype=np.int64, count=len(rows))
+    lats = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+    lons = np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows))
+    areas = np.fromiter((np.nan if r[4] is None else r[4] for r in rows), dtype=np.float64, count=len(rows))
+
+    iceberg_ids, iceberg_idx = np.unique(ids.astype(str), return_inverse=True)
+    iceberg_idx = iceberg_idx.astype(np.int32)
+    order = np.lexsort((times, iceberg_idx))
+    iceberg_idx = iceberg_idx[order]
+    offsets = np.searchsorted(iceberg_idx, np.arange(len(iceberg_ids) + 1)).astype(np.int64)
+    return Observations(
+        version=version,
+        iceberg_ids=iceberg_ids,
+        iceberg_idx=iceberg_idx,
+        times=times[order],
+        latitudes=lats[order],
+        longitudes=lons[order],
+        areas=areas[order],
+        offsets=offsets,
+    )
+
+
+def load_observations(iceberg_ids=None) -> Observations:
+    """Uncached observation arrays of some icebergs (all when None), for ingest time computations"""
+    return _load_observations(None, iceberg_ids)
+
+
+def get_observations() -> Observations:
+    """Observation arrays for the current dataset version, loaded once per version"""
+    version = dataset_version()
+    if _observation_cache["version"] == version:
+        return _observation_cache["observations"]
+    with _lock:
+        if _observation_cache["version"] != version:
+            observations = _load_observations(version)
+            _observation_cache.update(version=version, observations=observations, derived={})
+    return _observation_cache["observations"]
+
+
+def get_derived(name, build, observations=None):
+    """
+    Memoize `build(observations)` for the current dataset version,
+    e.g. projected coordinates or spatial indexes derived from the observation arrays.
+    Pass `observations` to derive from a snapshot fetched earlier, the value is then only memoized
+    while that snapshot is still the current one.
+    """
+    if observations is None:
+        observations = get_observations()
+    with _lock:
+        current = _observation_cache["observations"] is observations
+        derived = _observation_cache["derived"]
+    if not current:
+        return build(observations)
+    if name not in derived:
+        with _lock:
+            if name not in derived:
+                derived[name] = build(observations)
+    return derived[name]
+
+
+def invalidate():
+    """Forget cached versions, used after ingestion"""
+    with _lock:
+        _version_cache.update(version=None, checked_at=0.0)
+        _observation_cache.update(version=None, observations=None, derived={})
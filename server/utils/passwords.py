@@ -0,0 +1,48 @@
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from ..config import PASSWORD_WORKERS, PASSWORD_QUEUE_DEPTH, PASSWORD_TIMEOUT
+
+_pool = None
+_pool_lock = threading.Lock()
+# hashes running or waiting in the pool, further requests are rejected instead of queued
+_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE_DEPTH)
+
+
+class PasswordQueueFull(Exception):
+    """Raised when PASSWORD_QUEUE_DEPTH hashes are already waiting"""
+
+
+class PasswordTimeout(Exception):
+    """Raised when a hash does not finish within its timeout"""
+
+
+def get_pool():
+    """
+    Threads running bcrypt, which releases the GIL while hashing.
+    A login burst is bounded to PASSWORD_WORKERS cores and the remaining request threads keep serving.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def run_hashing(func, *args, timeout=PASSWORD_TIMEOUT):
+    """Run `func(*args)` in the hashing pool and return its result"""
+    if not _slots.acquire(blocking=False):
+        raise PasswordQueueFull("Too many logins in progress, try again later")
+    try:
+        future = get_pool().submit(func, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise PasswordTimeout("Password check timed out, try again later")
@@ -0,0 +1,91 @@
+import os
+import time
+import sqlite3
+import threading
+
+from ..models import db
+from ..models.routing import PUBLISHED_BIND
+
+# indexes only worth having on the read-only copy, they would slow down ingestion on the primary
+READ_INDEXES = {
+    "ix_published_iceberg_info_time": "iceberg_info (record_time, is_prediction)",
+    "ix_published_iceberg_info_position": "iceberg_info (latitude, longitude)",
+    "ix_published_iceberg_info_area": "iceberg_info (iceberg_id, area_at_record_time)",
+}
+# seconds between two checks of the published file by one worker
+PUBLISHED_CHECK_INTERVAL = 1.0
+
+_publish_lock = threading.Lock()
+_published_state = {"inode": None, "checked_at": 0.0}
+
+
+def published_uri(path):
+    """Read-only SQLite uri, immutable because a published file is never modified, only replaced"""
+    return f"sqlite:///file:{os.path.abspath(path)}?mode=ro&immutable=1&uri=true"
+
+
+def publish_database(source_path, target_path):
+    """
+    Copy the primary database into a compacted, fully indexed and analyzed read-only snapshot
+    and atomically move it over `target_path`. Readers still holding the previous file keep using it
+    until they notice the new inode. Returns the time taken in seconds.
+    """
+    start = time.perf_counter()
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    with _publish_lock:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        source = sqlite3.connect(source_path, timeout=30)
+        try:
+            # consistent copy even while the primary is written to
+            source.execute("VACUUM INTO ?", (tmp_path,))
+        finally:
+            source.close()
+
+        target = sqlite3.connect(tmp_path)
+        try:
+            target.execute("PRAGMA journal_mode=DELETE")
+            for name, columns in READ_INDEXES.items():
+                target.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+            target.execute("ANALYZE")
+            target.commit()
+        finally:
+            target.close()
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, target_path)
+    return time.perf_counter() - start
+
+
+def primary_changed_since_publish(source_path, target_path):
+    """True when the primary database (or its WAL) was written after the last publish"""
+    if not os.path.exists(target_path):
+        return True
+    published = os.stat(target_path).st_mtime
+    return any(
+        os.path.exists(path) and os.stat(path).st_mtime > published for path in (source_path, f"{source_path}-wal")
+    )
+
+
+def refresh_published_engine(path, on_change=None):
+    """
+    Called before requests: when the published file was replaced (new inode), drop the pooled connections
+    to the previous snapshot so the next query opens the new one, and call `on_change()`.
+    """
+    now = time.monotonic()
+    if now - _published_state["checked_at"] < PUBLISHED_CHECK_INTERVAL:
+        return False
+    _published_state["checked_at"] = now
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+    if inode == _published_state["inode"]:
+        return False
+    first_check = _published_state["inode"] is None
+    _published_state["inode"] = inode
+    if first_check:
+        return False
+    db.engines[PUBLISHED_BIND].dispose()
+    if on_change:
+        on_change()
+    return True
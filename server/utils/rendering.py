@@ -0,0 +1,232 @@
+import io
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from ..config import RENDER_WORKERS, RENDER_QUEUE_DEPTH, RENDER_TIMEOUT, RENDER_TASKS_PER_CHILD
+
+_pool = None
+_pool_lock = threading.Lock()
+# renders running or waiting in the pool, further requests are rejected instead of queued.
+# A render past its timeout keeps running and keeps its slot until it finishes, so runaway renders count too
+_slots = threading.BoundedSemaphore(RENDER_WORKERS + RENDER_QUEUE_DEPTH)
+
+
+class RenderQueueFull(Exception):
+    """Raised when RENDER_QUEUE_DEPTH renders are already waiting"""
+
+
+class RenderPoolBroken(RenderQueueFull):
+    """Raised when a render worker died, the pool is replaced and the render can be retried"""
+
+
+class RenderTimeout(Exception):
+    """Raised when a render does not finish within its timeout"""
+
+
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def get_pool():
+    """
+    Process pool rendering matplotlib figures outside of the request threads.
+    Workers are spawned (not forked from a process holding database connections)
+    and replaced after RENDER_TASKS_PER_CHILD renders to keep their memory flat.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                max_tasks_per_child=RENDER_TASKS_PER_CHILD,
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def _discard_pool(pool):
+    """Drop a broken pool so that the next get_pool() spawns a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit(func, *args, block=False):
+    """
+    Submit `func(*args)` to the render pool within the RENDER_WORKERS + RENDER_QUEUE_DEPTH bound
+    and return its future. Waits for a free slot when `block`, raises RenderQueueFull otherwise.
+    """
+    if not _slots.acquire(blocking=block):
+        raise RenderQueueFull("Too many renders in progress, try again later")
+    pool = get_pool()
+    try:
+        future = pool.submit(func, *args)
+    except BrokenProcessPool:
+        _slots.release()
+        _discard_pool(pool)
+        raise RenderPoolBroken("A render worker died, try again later")
+    except Exception:
+        _slots.release()
+        raise
+
+    def done(future):
+        _slots.release()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            _discard_pool(pool)
+
+    future.add_done_callback(done)
+    return future
+
+
+def render(func, *args, timeout=RENDER_TIMEOUT):
+    """
+    Run `func(*args)` in the render pool and return its result.
+    future.cancel() cannot stop a render that already started, on timeout it runs on in its worker.
+    """
+    future = submit(func, *args)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise RenderTimeout(f"Rendering did not finish within {timeout}s")
+    except BrokenProcessPool:
+        raise RenderPoolBroken("A render worker died, try again later")
+
+
+def _figure_png(fig, **savefig_kwargs):
+    """Serialize and release a figure, whatever happens during savefig"""
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format="png", **savefig_kwargs)
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+
+def render_trajectory_png(iceberg_id, longitudes, latitudes, first_date, last_date):
+    """Scatter plot of one iceberg trajectory, labels the first and last record"""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.scatter(longitudes, latitudes, marker="*", color="b", label="Locations", s=30)
+    ax.set_title(f"Iceberg Trajectory-{iceberg_id}")
+    ax.set_xlabel("Longitude", fontsize=12)
+    ax.set_ylabel("Latitude", fontsize=12)
+    ax.grid(True)
+    ax.legend()
+    ax.text(longitudes[-1], latitudes[-1], last_date, fontsize=8, color="black")
+    ax.text(longitudes[0], latitudes[0], first_date, fontsize=8, color="black")
+    return _figure_png(fig)
+
+
+def render_density_map_png(lons, lats, counts):
+    """Iceberg passage density on a South Polar Stereographic map"""
+    from matplotlib.figure import Figure
+    import matplotlib.colors as mcolors
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+
+    fig = Figure(figsize=(10, 10))
+    ax = fig.add_subplot(1, 1, 1, projection=ccrs.SouthPolarStereo())
+    ax.set_extent([-180, 180, -90, -50], ccrs.PlateCarree())
+
+    ax.add_feature(cfeature.OCEAN, zorder=0, facecolor="#f0f8ff")
+    ax.add_feature(cfeature.LAND, zorder=1, edgecolor="black", facecolor="#c0c0c0")
+    ax.gridlines(draw_labels=True, dms=True, x_inline=False, y_inline=False)
+
+    log_norm = mcolors.LogNorm(vmin=1, vmax=max(counts))
+    sc = ax.scatter(
+        lons, lats, s=5, c=counts, cmap="YlOrRd", norm=log_norm, alpha=0.7, transform=ccrs.PlateCarree(), zorder=2
+    )
+    fig.colorbar(sc, ax=ax, shrink=0.7, label="Number of Iceberg Passages")
+    return _figure_png(fig, bbox_inches="tight", dpi=150)
+
+
+def render_trajectories_png(tracks):
+    """
+    All tracks in one figure, `tracks` being a list of (iceberg_id, longitudes, latitudes).
+    Axes, legend and encoding are set up once no matter how many icebergs are compared.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    for iceberg_id, longitudes, latitudes in tracks:
+        (line,) = ax.plot(longitudes, latitudes, linewidth=0.8, alpha=0.6)
+        ax.scatter(longitudes, latitudes, marker="*", color=line.get_color(), label=iceberg_id, s=12)
+        ax.annotate(iceberg_id, (longitudes[-1], latitudes[-1]), fontsize=8, color=line.get_color())
+    ax.set_title(f"Iceberg Trajectories-{', '.join(t[0] for t in tracks[:8])}{' ...' if len(tracks) > 8 else ''}")
+    ax.set_xlabel("Longitude", fontsize=12)
+    ax.set_ylabel("Latitude", fontsize=12)
+    ax.grid(True)
+    ax.legend(fontsize=8, ncol=max(1, len(tracks) // 15))
+    return _figure_png(fig)
+
+
+def render_base_map(width_in, height_in, dpi):
+    """
+    Empty South Polar Stereographic map drawn once per animation export.
+    Returns (RGBA array, mapping) where mapping holds the axes pixel box and projected limits,
+    used to place lon/lat positions onto the image without matplotlib.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import numpy as np
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+
+    fig = Figure(figsize=(width_in, height_in), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    try:
+        ax = fig.add_axes([0.02, 0.02, 0.96, 0.96], projection=ccrs.SouthPolarStereo())
+        ax.set_extent([-180, 180, -90, -50], ccrs.PlateCarree())
+        ax.add_feature(cfeature.OCEAN, zorder=0, facecolor="#f0f8ff")
+        ax.add_feature(cfeature.LAND, zorder=1, edgecolor="black", facecolor="#c0c0c0")
+        ax.gridlines()
+        canvas.draw()
+        rgba = np.array(canvas.buffer_rgba())
+        bbox = ax.get_window_extent()
+        mapping = {
+            "height": rgba.shape[0],
+            "bbox": (bbox.x0, bbox.y0, bbox.x1, bbox.y1),
+            "xlim": ax.get_xlim(),
+            "ylim": ax.get_ylim(),
+        }
+    finally:
+        fig.clear()
+    return rgba, mapping
+
+
+_base_images = {}
+
+
+def render_drift_frames(base_path, frames, out_dir):
+    """
+    Paint iceberg positions onto the pre-rendered base map, one PNG per frame.
+    `frames` is a list of (frame index, label, pixel xs, pixel ys). The decoded base image is kept per worker.
+    """
+    import os
+    from PIL import Image, ImageDraw
+
+    if base_path not in _base_images:
+        _base_images.clear()
+        _base_images[base_path] = Image.open(base_path).convert("RGB")
+    base = _base_images[base_path]
+    for index, label, xs, ys in frames:
+        frame = base.copy()
+        draw = ImageDraw.Draw(frame)
+        for x, y in zip(xs, ys):
+            draw.ellipse((x - 3, y - 3, x + 3, y + 3), fill=(227, 26, 28), outline=(128, 0, 38))
+        draw.text((12, 10), label, fill=(0, 0, 0))
+        frame.save(os.path.join(out_dir, f"frame_{index:05d}.png"))
+    return len(frames)
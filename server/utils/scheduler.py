@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+import traceback
+
+
+class Job:
+    def __init__(self, name, func, interval, next_run):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = next_run
+        # held while the job runs, a second trigger is skipped instead of queued
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_started = None
+        self.last_duration = None
+        self.last_result = None
+        self.last_error = None
+
+
+class Scheduler:
+    """
+    Minimal in-process interval scheduler running jobs on one background thread.
+    `clock` is injectable (defaults to `time.monotonic`) and `run_pending` can be called directly,
+    so schedules can be driven step by step with a fake clock.
+    """
+
+    def __init__(self, clock=time.monotonic, tick=1.0):
+        self.clock = clock
+        self.tick = tick
+        self.jobs = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, func, interval, delay=0.0):
+        """Run `func()` every `interval` seconds, the first time `delay` seconds from now"""
+        self.jobs[name] = Job(name, func, interval, self.clock() + delay)
+        return self.jobs[name]
+
+    def run_job(self, name):
+        """Run one job now, returns False if it is already running"""
+        job = self.jobs[name]
+        if not job.lock.acquire(blocking=False):
+            job.skipped += 1
+            return False
+        try:
+            job.last_started = self.clock()
+            job.runs += 1
+            try:
+                job.last_result = job.func()
+                job.last_error = None
+            except Exception as e:
+                job.failures += 1
+                job.last_error = f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+            job.last_duration = self.clock() - job.last_started
+            job.next_run = job.last_started + job.interval
+        finally:
+            job.lock.release()
+        return True
+
+    def run_pending(self):
+        """Run every job that is due, returns the names of the jobs that ran"""
+        now = self.clock()
+        due = [job.name for job in self.jobs.values() if job.next_run <= now]
+        return [name for name in due if self.run_job(name)]
+
+    def _loop(self):
+        while not self._stop.wait(self.tick):
+            self.run_pending()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="iceberg-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def status(self):
+        now = self.clock()
+        return {
+            job.name: {
+                "running": job.lock.locked(),
+                "interval": job.interval,
+                "runs": job.runs,
+                "failures": job.failures,
+                "skipped": job.skipped,
+                "last_run_ago": None if job.last_started is None else now - job.last_started,
+                "last_duration": job.last_duration,
+                "last_result": job.last_result,
+                "last_error": job.last_error,
+                "next_run_in": max(job.next_run - now, 0.0),
+            }
+            for job in self.jobs.values()
+        }
+
+
+def acquire_process_lock(path):
+    """
+    Non-blocking exclusive lock on `path`, so that one process of a multi-process server runs the jobs.
+    Returns the open file holding the lock (keep a reference to it), None if another process holds it.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fp = open(path, "a")
+    try:
+        import fcntl
+    except ImportError:  # no flock on Windows, which runs a single process anyway
+        return fp
+    try:
+        fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fp.close()
+        return None
+    return fp
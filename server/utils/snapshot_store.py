@@ -0,0 +1,101 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+INDEX_FILE = "index.ndjson"
+SNAPSHOT_NAME_FORMAT = "%Y%m%dT%H%M%S"
+# date keys used by the legacy icebergs.json
+LEGACY_DATE_FORMAT = "%m/%d/%y"
+
+
+class SnapshotStore:
+    """
+    Append-only store of scraped snapshots.
+    Every snapshot is one NDJSON file (one iceberg entry per line), `index.ndjson` lists snapshots in
+    insertion order, so saving a snapshot costs O(snapshot) no matter how many were stored before.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self._lock = threading.Lock()
+        self._latest = {"stamp": None, "snapshot": None}
+        os.makedirs(root, exist_ok=True)
+
+    def _snapshot_path(self, file_name):
+        return os.path.join(self.root, file_name)
+
+    def append(self, revised_date: datetime, location_details):
+        """Store one snapshot, returns False if a snapshot with the same revision date already exists"""
+        file_name = f"{revised_date.strftime(SNAPSHOT_NAME_FORMAT)}.ndjson"
+        path = self._snapshot_path(file_name)
+        if os.path.exists(path):
+            return False
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            for entry in location_details:
+                fp.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, path)
+        # the index line is written last, a snapshot is only visible once complete
+        with open(self.index_path, "a", encoding="utf-8") as fp:
+            fp.write(json.dumps({"date": revised_date.isoformat(), "file": file_name, "count": len(location_details)}) + "\n")
+        return True
+
+    def index(self):
+        """Snapshot index entries, oldest first"""
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, "r", encoding="utf-8") as fp:
+            return [json.loads(line) for line in fp if line.strip()]
+
+    def dates(self):
+        return [datetime.fromisoformat(entry["date"]) for entry in self.index()]
+
+    def read(self, file_name):
+        with open(self._snapshot_path(file_name), "r", encoding="utf-8") as fp:
+            return [json.loads(line) for line in fp if line.strip()]
+
+    def latest(self):
+        """
+        (index entry, entries) of the newest snapshot, or (None, []) for an empty store.
+        Kept in memory until the index file changes.
+        """
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None, []
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._latest["stamp"] != stamp:
+                index = self.index()
+                snapshot = (index[-1], self.read(index[-1]["file"])) if index else (None, [])
+                self._latest.update(stamp=stamp, snapshot=snapshot)
+            return self._latest["snapshot"]
+
+    def import_legacy_json(self, json_path):
+        """One-off conversion of the accumulated icebergs.json into snapshot files, returns imported snapshot count"""
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, "r", encoding="utf-8") as fp:
+            content = fp.read()
+        if not content:
+            return 0
+        snapshots = json.loads(content)
+        imported = 0
+        for date_str in sorted(snapshots, key=lambda d: datetime.strptime(d, LEGACY_DATE_FORMAT)):
+            imported += self.append(datetime.strptime(date_str, LEGACY_DATE_FORMAT), snapshots[date_str])
+        return imported
+
+
+_stores = {}
+
+
+def get_snapshot_store(root, legacy_json_path=None):
+    """Shared store per directory, seeded from the legacy icebergs.json the first time it is opened"""
+    if root not in _stores:
+        store = SnapshotStore(root)
+        if legacy_json_path and not os.path.exists(store.index_path):
+            store.import_legacy_json(legacy_json_path)
+        _stores[root] = store
+    return _stores[root]
@@ -0,0 +1,259 @@
+import math
+import zlib
+import struct
+import threading
+
+import numpy as np
+
+from .observations import get_derived
+
+# quantization grid inside a tile, same as the MVT default
+TILE_EXTENT = 4096
+# positions within this many extent units outside the tile are kept, so edge symbols are not cut off
+TILE_BUFFER = 64
+# density cells per tile side
+DENSITY_GRID = 64
+# above this many distinct positions only the density layer is sent
+TILE_MAX_POSITIONS = 20000
+MAX_ZOOM = 16
+# polar stereographic tiling covers the southern ocean up to this latitude
+POLAR_MAX_LAT = -40.0
+# web mercator is undefined at the poles
+MERCATOR_MAX_LAT = 85.0511287798
+# raster tiles are RASTER_TILE_SIZE pixels wide and binned in square cells of RASTER_CELL_SIZE pixels
+RASTER_TILE_SIZE = 256
+RASTER_CELL_SIZE = 4
+# opacity of colored cells, same as the scatter on the static density map
+RASTER_ALPHA = 0.7
+# matplotlib's "YlOrRd" (ColorBrewer) anchors, interpolated into a lookup table so no figure is needed
+YLORRD = ["#ffffcc", "#ffeda0", "#fed976", "#feb24c", "#fd8d3c", "#fc4e2a", "#e31a1c", "#bd0026", "#800026"]
+# built tiles kept per worker process, the least recently used are dropped beyond this many bytes
+TILE_CACHE_BYTES = 64 * 1024 * 1024
+# rough size of one position or density cell of a position tile held as python lists
+POSITION_TILE_ITEM_BYTES = 100
+
+_cache_lock = threading.Lock()
+_tile_cache = {}  # key -> (tile, size in bytes), least recently used first
+_tile_cache_state = {"bytes": 0}
+
+
+def project_web_mercator(lats, lons):
+    """EPSG:3857 in normalized tile space: x, y in [0, 1], y growing southwards"""
+    lats = np.clip(lats, -MERCATOR_MAX_LAT, MERCATOR_MAX_LAT)
+    x = (np.asarray(lons) + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(lats))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def project_polar_stereographic(lats, lons):
+    """
+    South polar stereographic (spherical, same orientation as EPSG:3031) in normalized tile space.
+    The south pole sits in the middle, the square spans to `POLAR_MAX_LAT`.
+    """
+    rho = np.tan(math.pi / 4 + np.radians(lats) / 2)
+    rho_max = math.tan(math.pi / 4 + math.radians(POLAR_MAX_LAT) / 2)
+    lon_rad = np.radians(lons)
+    x = 0.5 + rho * np.sin(lon_rad) / (2 * rho_max)
+    y = 0.5 - rho * np.cos(lon_rad) / (2 * rho_max)
+    return x, y
+
+
+PROJECTIONS = {
+    "mercator": project_web_mercator,
+    "polar": project_polar_stereographic,
+}
+
+
+def projected_observations(obs, projection):
+    """Normalized (x, y) of every observation, computed once per dataset version"""
+    project = PROJECTIONS[projection]
+    return get_derived(f"tiles:{projection}", lambda o: project(o.latitudes, o.longitudes), obs)
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def tile_rows(obs, projection, z, x, y, buffer=0, since=None):
+    """
+    Indexes of observations falling into tile (z, x, y) and their position in tile pixel space,
+    where one tile spans `TILE_EXTENT` units.
+    """
+    px, py = projected_observations(obs, projection)
+    scale = 2**z * TILE_EXTENT
+    tx = px * scale - x * TILE_EXTENT
+    ty = py * scale - y * TILE_EXTENT
+    mask = (tx >= -buffer) & (tx < TILE_EXTENT + buffer) & (ty >= -buffer) & (ty < TILE_EXTENT + buffer)
+    if since is not None:
+        mask &= obs.times >= since
+    rows = np.flatnonzero(mask)
+    return rows, tx[rows], ty[rows]
+
+
+def _cached(key, build, size):
+    """`build()` memoized under `key` within the TILE_CACHE_BYTES budget, `size(tile)` estimating its bytes"""
+    with _cache_lock:
+        entry = _tile_cache.pop(key, None)
+        if entry is not None:
+            _tile_cache[key] = entry  # most recently used last
+            return entry[0]
+    tile = build()
+    nbytes = size(tile)
+    with _cache_lock:
+        if key not in _tile_cache and nbytes <= TILE_CACHE_BYTES:
+            _tile_cache[key] = (tile, nbytes)
+            _tile_cache_state["bytes"] += nbytes
+            while _tile_cache_state["bytes"] > TILE_CACHE_BYTES:
+                _, dropped = _tile_cache.pop(next(iter(_tile_cache)))
+                _tile_cache_state["bytes"] -= dropped
+    return tile
+
+
+def _position_tile_bytes(tile):
+    items = len(tile["density"]["cells"]) + (len(tile["positions"]["x"]) if tile["positions"] else 0)
+    return (items + 1) * POSITION_TILE_ITEM_BYTES
+
+
+def build_position_tile(obs, projection, z, x, y, since=None):
+    """
+    Pre-clipped, quantized tile of the observation snapshot `obs` with two layers:
+    `positions` (distinct quantized iceberg positions) and `density` (distinct icebergs per cell).
+    Cached under the snapshot's version, so a tile is never served for a version it was not built from.
+    """
+    return _cached(
+        ("positions", obs.version, projection, z, x, y, since),
+        lambda: _build_position_tile(obs, projection, z, x, y, since),
+        _position_tile_bytes,
+    )
+
+
+def _build_position_tile(obs, projection, z, x, y, since):
+    rows, tx, ty = tile_rows(obs, projection, z, x, y, buffer=TILE_BUFFER, since=since)
+    icebergs = obs.iceberg_idx[rows].astype(np.int64)
+    n_icebergs = max(len(obs.iceberg_ids), 1)
+
+    # density layer only counts positions inside the tile itself
+    inside = (tx >= 0) & (tx < TILE_EXTENT) & (ty >= 0) & (ty < TILE_EXTENT)
+    cell_size = TILE_EXTENT // DENSITY_GRID
+    cells = (ty[inside] // cell_size).astype(np.int64) * DENSITY_GRID + (tx[inside] // cell_size).astype(np.int64)
+    cell_icebergs = np.unique(cells * n_icebergs + icebergs[inside])
+    cell_ids, cell_counts = np.unique(cell_icebergs // n_icebergs, return_counts=True)
+    density = {
+        "grid": DENSITY_GRID,
+        "cells": [[int(c % DENSITY_GRID), int(c // DENSITY_GRID), int(n)] for c, n in zip(cell_ids, cell_counts)],
+    }
+
+    qx = np.floor(tx).astype(np.int64)
+    qy = np.floor(ty).astype(np.int64)
+    span = TILE_EXTENT + 2 * TILE_BUFFER
+    keys = np.unique(((qy + TILE_BUFFER) * span + (qx + TILE_BUFFER)) * n_icebergs + icebergs)
+    tile = {
+        "z": z,
+        "x": x,
+        "y": y,
+        "projection": projection,
+        "version": obs.version,
+        "extent": TILE_EXTENT,
+        "density": density,
+        "positions": None,
+        "truncated": False,
+    }
+    if len(keys) > TILE_MAX_POSITIONS:
+        tile["truncated"] = True
+        return tile
+
+    pixels, position_icebergs = np.divmod(keys, n_icebergs)
+    local_ids, local_idx = np.unique(position_icebergs, return_inverse=True)
+    tile["positions"] = {
+        "icebergs": obs.iceberg_ids[local_ids].tolist(),
+        "x": (pixels % span - TILE_BUFFER).tolist(),
+        "y": (pixels // span - TILE_BUFFER).tolist(),
+        "iceberg": local_idx.tolist(),
+    }
+    return tile
+
+
+def colormap_lut(anchors, size=256):
+    """(size, 3) uint8 table linearly interpolated between hex color anchors"""
+    rgb = np.array([[int(c[i : i + 2], 16) for i in (1, 3, 5)] for c in anchors], dtype=np.float64)
+    positions = np.linspace(0, 1, len(anchors))
+    samples = np.linspace(0, 1, size)
+    return np.stack([np.interp(samples, positions, rgb[:, i]) for i in range(3)], axis=1).round().astype(np.uint8)
+
+
+DENSITY_LUT = colormap_lut(YLORRD)
+
+
+def log_normalize(counts, vmax, vmin=1):
+    """Same mapping as `matplotlib.colors.LogNorm(vmin, vmax)`, clipped to [0, 1]"""
+    counts = np.clip(counts, vmin, None).astype(np.float64)
+    if vmax <= vmin:
+        return np.ones_like(counts)
+    return np.clip(np.log(counts / vmin) / math.log(vmax / vmin), 0, 1)
+
+
+def encode_png(rgba):
+    """Minimal RGBA PNG encoder (no interlacing, filter type 0) for a (height, width, 4) uint8 array"""
+    height, width, _ = rgba.shape
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"".join(
+        [b"\x89PNG\r\n\x1a\n", chunk(b"IHDR", header), chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)), chunk(b"IEND", b"")]
+    )
+
+
+def _passage_cells(obs, px, py, cells_per_side):
+    """Global cell index of every observation and the number of distinct icebergs per occupied cell"""
+    n_icebergs = max(len(obs.iceberg_ids), 1)
+    gx = np.clip((px * cells_per_side).astype(np.int64), 0, cells_per_side - 1)
+    gy = np.clip((py * cells_per_side).astype(np.int64), 0, cells_per_side - 1)
+    keys = np.unique((gy * cells_per_side + gx) * n_icebergs + obs.iceberg_idx)
+    return np.unique(keys // n_icebergs, return_counts=True)
+
+
+def density_vmax(obs, projection, z):
+    """Largest passage count of any cell at zoom `z`, so all tiles of a zoom level share one color scale"""
+
+    def build(obs):
+        px, py = projected_observations(obs, projection)
+        cells_per_side = 2**z * (RASTER_TILE_SIZE // RASTER_CELL_SIZE)
+        _, counts = _passage_cells(obs, px, py, cells_per_side)
+        return int(counts.max()) if len(counts) else 1
+
+    return get_derived(f"raster-vmax:{projection}:{z}", build, obs)
+
+
+def render_density_tile(obs, projection, z, x, y):
+    """
+    PNG heatmap of distinct iceberg passages per cell inside tile (z, x, y) of the observation snapshot `obs`,
+    log-normalized like the static map. Cached under the snapshot's version.
+    """
+    return _cached(
+        ("density", obs.version, projection, z, x, y), lambda: _render_density_tile(obs, projection, z, x, y), len
+    )
+
+
+def _render_density_tile(obs, projection, z, x, y):
+    cells_per_tile = RASTER_TILE_SIZE // RASTER_CELL_SIZE
+    rows, tx, ty = tile_rows(obs, projection, z, x, y)
+    n_icebergs = max(len(obs.iceberg_ids), 1)
+
+    cx = np.clip((tx * cells_per_tile / TILE_EXTENT).astype(np.int64), 0, cells_per_tile - 1)
+    cy = np.clip((ty * cells_per_tile / TILE_EXTENT).astype(np.int64), 0, cells_per_tile - 1)
+    keys = np.unique((cy * cells_per_tile + cx) * n_icebergs + obs.iceberg_idx[rows])
+    grid = np.bincount(keys // n_icebergs, minlength=cells_per_tile**2).reshape(cells_per_tile, cells_per_tile)
+
+    rgba = np.zeros((cells_per_tile, cells_per_tile, 4), dtype=np.uint8)
+    occupied = grid > 0
+    if occupied.any():
+        norm = log_normalize(grid[occupied], density_vmax(obs, projection, z))
+        rgba[occupied, :3] = DENSITY_LUT[(norm * (len(DENSITY_LUT) - 1)).round().astype(np.int64)]
+        rgba[occupied, 3] = round(RASTER_ALPHA * 255)
+    pixels = np.repeat(np.repeat(rgba, RASTER_CELL_SIZE, axis=0), RASTER_CELL_SIZE, axis=1)
+    return encode_png(pixels)
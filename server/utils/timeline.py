@@ -0,0 +1,39 @@
+import numpy as np
+
+from .nearest import positions_at
+
+# icebergs are not interpolated across observation gaps longer than this by default
+DEFAULT_MAX_GAP_DAYS = 30
+
+
+def interpolate_positions(obs, t, max_gap_days=DEFAULT_MAX_GAP_DAYS):
+    """
+    Position of every iceberg tracked at unix time `t`, linearly interpolated between its bracketing observations.
+    Longitude differences are wrapped so tracks crossing the antimeridian interpolate the short way round.
+    Returns (iceberg indexes, latitudes, longitudes).
+    """
+    lower = positions_at(obs, t)
+    ends = obs.offsets[1:]
+    exact = (lower >= 0) & (obs.times[lower] == t)
+    upper = lower + 1
+    bracketed = (lower >= 0) & (upper < ends)
+    safe_upper = np.where(bracketed, upper, 0)
+    safe_lower = np.where(lower >= 0, lower, 0)
+    gap = obs.times[safe_upper] - obs.times[safe_lower]
+    if max_gap_days is not None:
+        bracketed &= gap <= max_gap_days * 86400
+    valid = exact | bracketed
+
+    icebergs = np.flatnonzero(valid)
+    lo, hi = safe_lower[icebergs], safe_upper[icebergs]
+    use_upper = bracketed[icebergs] & ~exact[icebergs]
+    fraction = np.where(use_upper, (t - obs.times[lo]) / np.where(gap[icebergs] > 0, gap[icebergs], 1), 0.0)
+    lats = obs.latitudes[lo] + fraction * np.where(use_upper, obs.latitudes[hi] - obs.latitudes[lo], 0.0)
+    dlon = np.where(use_upper, (obs.longitudes[hi] - obs.longitudes[lo] + 180) % 360 - 180, 0.0)
+    lons = (obs.longitudes[lo] + fraction * dlon + 180) % 360 - 180
+    return icebergs, lats, lons
+
+
+def frame_times(start, end, step):
+    """Unix times of animation frames from `start` to `end` inclusive"""
+    return np.arange(start, end + 1, step, dtype=np.int64)
@@ -0,0 +1,162 @@
+import os
+import json
+import threading
+from typing import NamedTuple
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+
+from ..models import IcebergInfo
+from ..repository import get_repository
+from .observations import dataset_version
+
+MAGIC = b"ICETRK1\n"
+# fixed width records, float64 keeps coordinates and areas exactly as stored in the database
+RECORD = np.dtype(
+    [
+        ("time", "<i8"),  # unix seconds
+        ("latitude", "<f8"),
+        ("longitude", "<f8"),
+        ("area", "<f8"),  # NaN when not recorded
+        ("rotational_velocity", "<f8"),  # NaN when not recorded
+        ("is_prediction", "u1"),
+    ]
+)
+HEADER_ALIGN = 64
+
+_lock = threading.Lock()
+_stores = {}
+
+
+class TrackRow(NamedTuple):
+    """Same fields as the rows of `IcebergRepository.track`"""
+
+    record_time: datetime
+    latitude: float
+    longitude: float
+    is_prediction: bool
+    rotational_velocity: float
+    area_at_record_time: float
+
+
+def _data_offset(header_size):
+    """Records start at the first aligned offset after the header"""
+    return -(-(len(MAGIC) + 8 + header_size) // HEADER_ALIGN) * HEADER_ALIGN
+
+
+class TrackStore:
+    """
+    Read-only view of a track file: a JSON header with the dataset version and the offset index,
+    followed by all observations as fixed width records sorted by (iceberg, time), memory mapped.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fp:
+            if fp.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a track store")
+            header_size = int.from_bytes(fp.read(8), "little")
+            header = json.loads(fp.read(header_size))
+        self.version = header["version"]
+        self.index = {iceberg_id: (start, end) for iceberg_id, start, end in header["index"]}
+        count, offset = header["records"], _data_offset(header_size)
+        if count:
+            self.records = np.memmap(path, dtype=RECORD, mode="r", offset=offset, shape=(count,))
+        else:  # np.memmap rejects empty maps
+            self.records = np.empty(0, RECORD)
+
+    def get(self, iceberg_id):
+        """Records of one iceberg oldest first, a view into the mapped file, or None for an unknown iceberg"""
+        bounds = self.index.get(iceberg_id)
+        return None if bounds is None else self.records[bounds[0] : bounds[1]]
+
+
+def _nullable(values):
+    return [None if v != v else v for v in values.tolist()]  # NaN -> None
+
+
+def track_rows(records):
+    """Records of `TrackStore.get` as `TrackRow`s"""
+    times = records["time"].astype("datetime64[s]").tolist()
+    return [
+        TrackRow(*row)
+        for row in zip(
+            times,
+            records["latitude"].tolist(),
+            records["longitude"].tolist(),
+            records["is_prediction"].astype(bool).tolist(),
+            _nullable(records["rotational_velocity"]),
+            _nullable(records["area"]),
+        )
+    ]
+
+
+def build_track_store(db, path):
+    """
+    Write every observation of the database to a new track file and atomically replace `path`.
+    Runs at ingest, inside `primary_reads()`. Returns the number of records.
+    """
+    version = dataset_version(force=True)
+    query = select(
+        IcebergInfo.iceberg_id,
+        IcebergInfo.record_time,
+        IcebergInfo.latitude,
+        IcebergInfo.longitude,
+        IcebergInfo.area_at_record_time,
+        IcebergInfo.rotational_velocity,
+        IcebergInfo.is_prediction,
+    ).order_by(IcebergInfo.iceberg_id, IcebergInfo.record_time, IcebergInfo.record_id)
+    rows = db.session.execute(query).all()
+
+    records = np.empty(len(rows), dtype=RECORD)
+    if rows:
+        ids, times, lats, lons, areas, velocities, predictions = zip(*rows)
+        records["time"] = np.array(times, dtype="datetime64[s]").astype(np.int64)
+        records["latitude"] = lats
+        records["longitude"] = lons
+        records["area"] = np.array(areas, dtype=np.float64)  # None -> NaN
+        records["rotational_velocity"] = np.array(velocities, dtype=np.float64)
+        records["is_prediction"] = predictions
+        ids = np.array(ids, dtype=object)
+        starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+        ends = np.append(starts[1:], len(ids))
+        index = [[ids[s], int(s), int(e)] for s, e in zip(starts, ends)]
+    else:
+        index = []
+
+    encoded = json.dumps({"version": version, "records": len(records), "index": index}).encode()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(MAGIC)
+        fp.write(len(encoded).to_bytes(8, "little"))
+        fp.write(encoded)
+        fp.write(b"\0" * (_data_offset(len(encoded)) - fp.tell()))
+        fp.write(records.tobytes())
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+def get_track_store(path):
+    """Store at `path`, reopened after it was rebuilt, None when there is no store yet"""
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _stores.get(path)
+        if cached is None or cached[0] != inode:
+            cached = _stores[path] = (inode, TrackStore(path))
+    return cached[1]
+
+
+def load_track(iceberg_id, path):
+    """
+    Observations of one iceberg oldest first, served from the track store when it was built
+    from the current dataset and from the database otherwise.
+    """
+    store = get_track_store(path) if path else None
+    if store is not None and store.version == dataset_version():
+        records = store.get(iceberg_id)
+        return [] if records is None else track_rows(records)
+    return get_repository().track(iceberg_id)
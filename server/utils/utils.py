@@ -123,3 +123,23 @@ def calculate_trend_line(years, values):
     trend_values = trend_poly(all_years_np)
 
     return trend_values.tolist()
+
+
+def forecast_positions(times_seconds, lats, lons, step_seconds=10 * 86400, steps=10, fit_points=10, degree=2):
+    """
+    Predict future positions from the last `fit_points` observations with `extrapolate_trajectory_polynomial`,
+    the same model `/iceberg_api/iceberg/<id>` uses.
+
+    :param times_seconds: NumPy array of observation times (absolute seconds), ascending.
+    :return: (future times, latitudes, longitudes) as NumPy arrays, empty if fewer than 2 observations.
+    """
+    if len(times_seconds) < 2:
+        return np.array([]), np.array([]), np.array([])
+    times_fit = np.asarray(times_seconds[-fit_points:], dtype=float)
+    origin = times_fit[0]
+    future_times = times_fit[-1] + step_seconds * np.arange(1, steps + 1)
+    pred_lats = extrapolate_trajectory_polynomial(times_fit - origin, lats[-fit_points:], future_times - origin, degree)
+    pred_lons = extrapolate_trajectory_polynomial(times_fit - origin, lons[-fit_points:], future_times - origin, degree)
+    pred_lats = np.clip(pred_lats, -90.0, 90.0)
+    pred_lons = ((pred_lons + 180) % 360) - 180
+    return future_times, pred_lats, pred_lons
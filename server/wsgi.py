@@ -0,0 +1,14 @@
+"""
+Production entry point for multi-process WSGI servers, e.g.
+
+    gunicorn --workers 4 --threads 4 --bind 0.0.0.0:8080 server.wsgi:app
+
+Settings are read from ICEBERG_* environment variables (see `server/config.py`).
+The database is not initialized here, create it once with `flask --app server.wsgi init-db`.
+Background jobs run in the first worker taking the scheduler lock, do not use `--preload`
+or the scheduler thread would be started in the master process and lost on fork.
+"""
+from server.app import create_app, start_background_jobs
+
+app = create_app()
+start_background_jobs(app)
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from server.app import create_app
+from server.models import db, bcrypt, User
+from server.utils import identity
+from server.utils.identity import lookup_identity, forget_identity
+from server.utils.passwords import run_hashing, PasswordTimeout
+from server.utils.types import UserType
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'auth.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+            "BCRYPT_LOG_ROUNDS": 4,
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+    return app.test_client()
+
+
+@pytest.fixture
+def slow_hashing(monkeypatch):
+    """bcrypt taking longer than the hashing timeout"""
+    monkeypatch.setattr(run_hashing, "__kwdefaults__", {"timeout": 0.05})
+
+    def slow(*args):
+        time.sleep(0.5)
+        return b"x" * 60
+
+    monkeypatch.setattr(bcrypt, "generate_password_hash", slow)
+    monkeypatch.setattr(bcrypt, "check_password_hash", slow)
+
+
+def test_run_hashing_timeout():
+    with pytest.raises(PasswordTimeout):
+        run_hashing(time.sleep, 0.5, timeout=0.05)
+
+
+def test_signup_and_login(client):
+    account = {"username": "ana", "email": "ana@example.org", "password": "secret"}
+    assert client.post("/auth/signup", json=account).status_code == 201
+    response = client.post("/auth/login", json={"username": "ana", "password": "secret"})
+    assert response.status_code == 200 and response.get_json()["access_token"]
+    assert client.post("/auth/login", json={"username": "ana", "password": "wrong"}).status_code == 401
+
+
+def test_slow_hash_on_signup_answers_503(client, slow_hashing):
+    response = client.post("/auth/signup", json={"username": "ana", "email": "ana@example.org", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_slow_hash_on_login_answers_503(client, monkeypatch):
+    account = {"username": "ana", "email": "ana@example.org", "password": "secret"}
+    assert client.post("/auth/signup", json=account).status_code == 201
+    monkeypatch.setattr(run_hashing, "__kwdefaults__", {"timeout": 0.05})
+    monkeypatch.setattr(bcrypt, "check_password_hash", lambda *args: time.sleep(0.5) or True)
+
+    response = client.post("/auth/login", json={"username": "ana", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_identity_cache_keeps_recently_used_users(client, monkeypatch):
+    monkeypatch.setattr(identity, "IDENTITY_CACHE_SIZE", 2)
+    forget_identity()
+    with client.application.app_context():
+        for name in ("ada", "bob", "cy"):
+            db.session.add(User(username=name, email=name, role=UserType.COMMON_USER, pwd_hash="x" * 60))
+        db.session.commit()
+        lookup_identity("ada")
+        lookup_identity("bob")
+        lookup_identity("ada")  # hit, bob is now the least recently used
+        lookup_identity("cy")
+        assert list(identity._identities) == ["ada", "cy"]
+        assert lookup_identity("nobody") is None and list(identity._identities) == ["ada", "cy"]
+    forget_identity()
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from server.app import create_app
+from server.models import db, Iceberg, IcebergInfo
+from server.utils.columnar import export_database
+
+pytest.importorskip("pyarrow")
+
+ENDPOINTS = [
+    "/stats/size_distribution_over_time",
+    "/stats/active_count_over_time",
+    "/stats/birth_death_locations",
+    "/stats/birth_death_location_trends",
+]
+
+
+def normalized(value):
+    """JSON with floats rounded past summation noise and lists of records sorted, their order differs between engines"""
+    if isinstance(value, float):
+        return round(value, 9)
+    if isinstance(value, dict):
+        return {k: normalized(v) for k, v in value.items()}
+    if isinstance(value, list) and all(isinstance(v, dict) for v in value):
+        return sorted((normalized(v) for v in value), key=lambda v: json.dumps(v, sort_keys=True))
+    if isinstance(value, list):
+        return [normalized(v) for v in value]
+    return value
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'columnar.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+            "PARQUET_DIR": str(tmp_path / "parquet"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        # tracks across several years and every size bin, some without area or rotation
+        tracks = {
+            "a23a": (3800.0, [(2012, 3), (2012, 11), (2015, 6), (2021, 12)]),
+            "b15": (150.0, [(2013, 1), (2013, 1), (2014, 7)]),
+            "b15a": (0.05, [(2014, 8)]),
+            "c28": (7500.0, [(2011, 5), (2016, 2), (2023, 9)]),
+            "d20": (12000.0, [(2019, 4), (2020, 10)]),
+        }
+        for i, (iceberg_id, (area, months)) in enumerate(tracks.items()):
+            db.session.add(Iceberg(id=iceberg_id, area=area))
+            for j, (year, month) in enumerate(months):
+                db.session.add(
+                    IcebergInfo(
+                        iceberg_id=iceberg_id,
+                        latitude=-60.0 - i - j * 0.37,
+                        longitude=-170.0 + 60 * i + j * 1.3,
+                        area_at_record_time=None if j == 1 else area * (1 - 0.1 * j),
+                        rotational_velocity=None if i % 2 else 0.1 * j,
+                        record_time=datetime(year, month, 1 + j),
+                        is_prediction=False,
+                    )
+                )
+        db.session.commit()
+        assert export_database(db, app.config["PARQUET_DIR"]) == 13
+    yield app
+
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_parquet_engine_matches_sql(app, path):
+    client = app.test_client()
+    sql = client.get(path)
+    parquet = client.get(path, query_string={"engine": "parquet"})
+    assert sql.status_code == parquet.status_code == 200
+    assert sql.get_json()
+    assert normalized(parquet.get_json()) == normalized(sql.get_json())
+
+
+def test_parquet_engine_is_limited_to_its_endpoints(app):
+    client = app.test_client()
+    assert client.get("/stats/correlation_data", query_string={"engine": "parquet"}).status_code == 400
+    assert client.get(ENDPOINTS[0], query_string={"engine": "duckdb"}).status_code == 400
@@ -0,0 +1,135 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from server.app import create_app
+from server.models import db, Iceberg, User, VesselSuggestion
+from server.routes import comments
+from server.utils.types import UserType
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'comments.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add(User(username="root", email="root", role=UserType.MANAGER, pwd_hash="x" * 60))
+        db.session.add(Iceberg(id="a23a", area=3800.0))
+        for day in (1, 2, 3):
+            db.session.add(
+                VesselSuggestion(
+                    iceberg_id="a23a", suggestion=f"note {day}", user_name="root", suggestion_time=datetime(2024, 1, day)
+                )
+            )
+        db.session.commit()
+    return app.test_client()
+
+
+def test_summary(client):
+    response = client.post("/iceberg_comments/summary", json={"ids": ["a23a", "b15"], "top": 2})
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary["a23a"]["count"] == 3
+    assert [c["suggestion"] for c in summary["a23a"]["latest"]] == ["note 3", "note 2"]
+    assert summary["b15"] == {"count": 0, "latest": []}
+
+    response = client.get("/iceberg_comments/summary?ids=a23a&top=1")
+    assert response.status_code == 200 and len(response.get_json()["a23a"]["latest"]) == 1
+
+
+@pytest.mark.parametrize("body", [{"ids": "a23a"}, {"ids": ["a23a", 7]}, {"ids": {"a23a": 1}}, ["a23a"], {}])
+def test_summary_rejects_malformed_ids(client, body):
+    response = client.post("/iceberg_comments/summary", json=body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def row(day, **fields):
+    return {
+        "iceberg_id": "a23a",
+        "suggestion": f"report {day}",
+        "user_name": "root",
+        "suggestion_time": f"2024-02-{day:02d}",
+        **fields,
+    }
+
+
+def exported(client, **params):
+    response = client.get("/iceberg_comments/export", query_string=params)
+    assert response.status_code == 200 and response.mimetype == "application/x-ndjson"
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_bulk_import_rejects_unknown_references(client):
+    rows = [row(1), row(2, iceberg_id="b15"), row(3, user_name="nobody")]
+    response = client.post("/iceberg_comments/bulk", json=rows)
+    assert response.status_code == 400
+    assert response.get_json()["rows"] == [
+        {"row": 1, "error": "unknown iceberg_id b15"},
+        {"row": 2, "error": "unknown user_name nobody"},
+    ]
+
+
+def test_bulk_import_is_all_or_nothing(client):
+    response = client.post("/iceberg_comments/bulk", json=[row(1), row(2), row(3, suggestion_time="yesterday")])
+    assert response.status_code == 400
+    assert [e["row"] for e in response.get_json()["rows"]] == [2]
+    assert len(exported(client)) == 3
+
+    assert client.post("/iceberg_comments/bulk", json=[row(1), row(2)]).get_json()["inserted"] == 2
+    assert len(exported(client)) == 5
+
+
+def test_bulk_import_of_ndjson(client):
+    body = "\n".join(json.dumps(row(day)) for day in (1, 2)) + "\n\n"
+    response = client.post("/iceberg_comments/bulk", data=body, content_type="application/x-ndjson")
+    assert response.status_code == 201 and response.get_json()["inserted"] == 2
+
+    upload = {"file": (io.BytesIO(json.dumps(row(3)).encode()), "reports.ndjson")}
+    response = client.post("/iceberg_comments/bulk", data=upload, content_type="multipart/form-data")
+    assert response.status_code == 201 and response.get_json()["inserted"] == 1
+    assert [c["suggestion"] for c in exported(client)][3:] == ["report 1", "report 2", "report 3"]
+
+
+def test_export_round_trip(client, monkeypatch):
+    # several batches per export
+    monkeypatch.setattr(comments, "EXPORT_BATCH_SIZE", 2)
+    client.post("/iceberg_comments/bulk", json=[row(day) for day in range(1, 6)])
+    first = exported(client)
+    assert [c["comment_id"] for c in first] == list(range(1, 9))
+    assert first[0] == {
+        "comment_id": 1,
+        "iceberg_id": "a23a",
+        "suggestion": "note 1",
+        "user_name": "root",
+        "suggestion_time": "2024-01-01T00:00:00",
+    }
+
+    # the export is valid import input, importing it again duplicates every comment
+    response = client.post("/iceberg_comments/bulk", data="".join(json.dumps(c) + "\n" for c in first))
+    assert response.status_code == 201 and response.get_json()["inserted"] == 8
+    second = exported(client)
+    strip = [{k: v for k, v in c.items() if k != "comment_id"} for c in second]
+    assert strip[8:] == strip[:8]
+    assert [c["comment_id"] for c in exported(client, iceberg_id="b15")] == []
+
+
+def test_comments_are_newest_first_by_default(client):
+    response = client.get("/iceberg_comments/a23a", query_string={"limit": 2})
+    assert [c["suggestion"] for c in response.get_json()] == ["note 3", "note 2"]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/iceberg_comments/a23a", query_string={"limit": 2, "cursor": cursor})
+    assert [c["suggestion"] for c in response.get_json()] == ["note 1"]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/iceberg_comments/a23a", query_string={"order": "asc"})
+    assert [c["suggestion"] for c in response.get_json()] == ["note 1", "note 2", "note 3"]
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+from server.app import create_app
+from server.models import db, Iceberg, IcebergEvent, IcebergInfo, User
+from server.utils.events import detect_events, CALVING, GROUNDING
+from server.utils.publish import publish_database
+from server.utils.types import UserType
+
+
+def test_reported_event_is_read_from_the_primary(tmp_path):
+    primary = tmp_path / "events.sqlite"
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{primary}",
+            "PUBLISHED_DATABASE": str(tmp_path / "published.sqlite"),
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add(User(username="root", email="root", role=UserType.MANAGER, pwd_hash="x" * 60))
+        db.session.add(Iceberg(id="a23a", area=3800.0))
+        db.session.commit()
+    publish_database(str(primary), app.config["PUBLISHED_DATABASE"])
+    client = app.test_client()
+
+    event = {
+        "iceberg_id": "a23a",
+        "event_type": "calving",
+        "description": "split in two",
+        "user_name": "root",
+        "record_time": "2024-01-02T00:00:00",
+    }
+    assert client.post("/events/", json={**event, "user_name": "nobody"}).status_code == 404
+    response = client.post("/events/", json=event)
+    assert response.status_code == 201
+    event_id = response.get_json()["event_id"]
+
+    # nothing was published since the post, the event must still be visible
+    assert [e["event_id"] for e in client.get("/events/").get_json()["events"]] == [event_id]
+    assert [e["event_id"] for e in client.get("/events/a23a").get_json()] == [event_id]
+    with app.app_context():
+        # Iceberg is published, the joined event table is only on the primary
+        joined = db.session.query(Iceberg.id, IcebergEvent.event_id).join(
+            IcebergEvent, IcebergEvent.iceberg_id == Iceberg.id
+        )
+        assert joined.all() == [("a23a", event_id)]
+    assert client.delete(f"/events/{event_id}").status_code == 200
+    assert client.get("/events/a23a").get_json() == []
+
+
+def test_redetection_keeps_event_ids(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'detect.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add(User(username="root", email="root", role=UserType.MANAGER, pwd_hash="x" * 60))
+        db.session.add(Iceberg(id="a23a", area=3800.0))
+        # grounded from the first day on, the parent id makes the first observation a calving
+        for day in range(0, 60, 5):
+            db.session.add(
+                IcebergInfo(
+                    iceberg_id="a23a",
+                    latitude=-75.0,
+                    longitude=-40.0,
+                    record_time=datetime(2024, 1, 1) + timedelta(days=day),
+                    is_prediction=False,
+                )
+            )
+        db.session.commit()
+
+        detect_events(db)
+        first = {(e.event_type, e.record_time): (e.event_id, e.description) for e in IcebergEvent.query}
+        assert {event_type for event_type, _ in first} == {CALVING, GROUNDING}
+        # takes the next free id, so reinserted detected events could not reuse theirs
+        db.session.add(
+            IcebergEvent(
+                iceberg_id="a23a",
+                event_type="sighting",
+                description="seen from a vessel",
+                user_name="root",
+                record_time=datetime(2024, 2, 1),
+                detected=False,
+            )
+        )
+        db.session.commit()
+
+        db.session.add(
+            IcebergInfo(
+                iceberg_id="a23a",
+                latitude=-75.0,
+                longitude=-40.0,
+                record_time=datetime(2024, 3, 31),
+                is_prediction=False,
+            )
+        )
+        db.session.commit()
+        detect_events(db, ["a23a"])
+        detected = IcebergEvent.query.filter(IcebergEvent.detected.is_(True))
+        second = {(e.event_type, e.record_time): (e.event_id, e.description) for e in detected}
+        assert second.keys() == first.keys()
+        assert all(second[key][0] == first[key][0] for key in first)
+        grounding = next(key for key in first if key[0] == GROUNDING)
+        assert second[grounding][1] != first[grounding][1]
+
+        IcebergInfo.query.filter(IcebergInfo.record_time >= datetime(2024, 1, 20)).delete()
+        db.session.commit()
+        detect_events(db, ["a23a"])
+        calving = next(key for key in first if key[0] == CALVING)
+        assert [(e.event_type, e.event_id) for e in detected] == [(CALVING, first[calving][0])]
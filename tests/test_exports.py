@@ -0,0 +1,103 @@
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from server.app import create_app
+from server.models import db, Iceberg, IcebergInfo
+from server.utils import exports, observations
+
+
+def blank_base_map(width_in, height_in, dpi):
+    """Stands in for render_base_map, whose coastlines are downloaded on first use"""
+    size = int(width_in * dpi)
+    rgba = np.full((size, size, 4), 255, dtype=np.uint8)
+    mapping = {"height": size, "bbox": (0, 0, size, size), "xlim": (-5e6, 5e6), "ylim": (-5e6, 5e6)}
+    return rgba, mapping
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'exports.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+            "EXPORT_DIR": str(tmp_path / "exports"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add(Iceberg(id="a23a", area=100.0))
+        for day, lon in ((1, -40.0), (4, -38.0)):
+            db.session.add(
+                IcebergInfo(
+                    iceberg_id="a23a",
+                    latitude=-70.0,
+                    longitude=lon,
+                    record_time=datetime(2024, 1, day),
+                    is_prediction=False,
+                )
+            )
+        db.session.commit()
+    observations.invalidate()
+    yield app
+    observations.invalidate()
+
+
+def wait_for(client, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/exports/{job_id}").get_json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.2)
+    raise AssertionError(f"export {job_id} did not finish: {job}")
+
+
+def test_small_export_is_done(app, monkeypatch):
+    pytest.importorskip("cartopy")
+    monkeypatch.setattr(exports, "render_base_map", blank_base_map)
+    client = app.test_client()
+    response = client.post("/exports/animation", json={"start": "2024-01-01", "end": "2024-01-04"})
+    assert response.status_code == 202
+    assert response.get_json()["frames"] == 4
+
+    job_id = response.get_json()["job_id"]
+    job = wait_for(client, job_id)
+    assert job["status"] == "done", job["error"]
+    assert job["progress"] == 1.0 and job["download_url"] == f"/exports/{job_id}/download"
+
+    download = client.get(job["download_url"])
+    assert download.status_code == 200 and download.mimetype == "image/gif"
+    path = os.path.join(app.config["EXPORT_DIR"], job_id, "drift.gif")
+    with Image.open(path) as gif:
+        assert gif.n_frames == 4
+    download.close()
+
+
+def test_unknown_export_is_not_found(app):
+    client = app.test_client()
+    assert client.get(f"/exports/{'0' * 32}").status_code == 404
+    assert client.get(f"/exports/{'0' * 32}/download").status_code == 404
+    assert client.get("/exports/../job.json").status_code == 404
+
+
+def test_interrupted_export_is_failed_then_deleted(tmp_path):
+    export_dir = str(tmp_path / "exports")
+    directory = os.path.join(export_dir, "1" * 32)
+    os.makedirs(directory)
+    created_at = time.time() - exports.EXPORT_TTL - 1
+    exports._write_job(directory, {"id": "1" * 32, "status": "running", "created_at": created_at, "finished_at": None})
+
+    exports._cleanup_expired(export_dir)
+    job = exports.get_job(export_dir, "1" * 32)
+    assert job["status"] == "failed" and job["error"] == "Export was interrupted"
+
+    exports._update(directory, finished_at=created_at)
+    exports._cleanup_expired(export_dir)
+    assert not os.path.exists(directory)
@@ -0,0 +1,124 @@
+from datetime import datetime
+
+import pytest
+
+from server.app import create_app
+from server.models import db, Iceberg, IcebergInfo, IcebergLineage
+from server.utils.lineage import lineage_path, lineage_rows, build_lineage, family_root
+
+
+@pytest.mark.parametrize(
+    "iceberg_id, path",
+    [
+        ("a23", []),
+        ("a23a", ["a23"]),
+        ("a23a2", ["a23", "a23a"]),
+        ("a1000b2", ["a1000", "a1000b"]),
+        ("a68a12", ["a68", "a68a"]),
+        ("A23A2", ["a23", "a23a"]),
+        ("B15aB", ["b15", "b15a"]),
+        ("unnamed-1", []),
+    ],
+)
+def test_lineage_path(iceberg_id, path):
+    assert lineage_path(iceberg_id) == path
+
+
+def test_family_root():
+    assert family_root("A1000B2") == "a1000"
+    assert family_root("A23") == "a23"
+
+
+def test_lineage_rows():
+    assert lineage_rows("A23A2") == [
+        {"ancestor_id": "a23a2", "descendant_id": "A23A2", "depth": 0},
+        {"ancestor_id": "a23a", "descendant_id": "A23A2", "depth": 1},
+        {"ancestor_id": "a23", "descendant_id": "A23A2", "depth": 2},
+    ]
+    assert lineage_rows("c28") == [{"ancestor_id": "c28", "descendant_id": "c28", "depth": 0}]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'lineage.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        # b15aa was never catalogued, c28 is another family
+        for iceberg_id, area in (("b15", 3000.0), ("B15A", 1000.0), ("b15ab", 200.0), ("c28", 50.0)):
+            db.session.add(Iceberg(id=iceberg_id, area=area))
+        for day in (1, 2):
+            db.session.add(
+                IcebergInfo(
+                    iceberg_id="b15ab",
+                    latitude=-70.0,
+                    longitude=-40.0,
+                    area_at_record_time=200.0 + day,
+                    record_time=datetime(2024, 1, day),
+                    is_prediction=False,
+                )
+            )
+        db.session.commit()
+        build_lineage(db)
+    yield app
+
+
+def test_build_lineage(app):
+    with app.app_context():
+        rows = {(r.ancestor_id, r.descendant_id, r.depth) for r in IcebergLineage.query}
+        assert rows == {
+            ("b15", "b15", 0),
+            ("b15a", "B15A", 0),
+            ("b15", "B15A", 1),
+            ("b15ab", "b15ab", 0),
+            ("b15a", "b15ab", 1),
+            ("b15", "b15ab", 2),
+            ("c28", "c28", 0),
+        }
+        # a partial rebuild replaces the rows of the given icebergs only
+        assert build_lineage(db, ["B15A"]) == 2
+        assert IcebergLineage.query.count() == 7
+
+
+def test_family_endpoint(app):
+    client = app.test_client()
+    response = client.get("/iceberg_api/iceberg/B15AB/family")
+    assert response.status_code == 200
+    family = response.get_json()
+    assert (family["root"], family["requested"], family["members"]) == ("b15", "b15ab", 3)
+
+    root = family["tree"]
+    assert (root["id"], root["observed"], root["generation"], root["area"]) == ("b15", True, 0, 3000.0)
+    (parent,) = root["children"]
+    assert (parent["id"], parent["generation"], parent["observations"]) == ("b15a", 1, 0)
+    (child,) = parent["children"]
+    assert (child["id"], child["generation"], child["observations"]) == ("b15ab", 2, 2)
+    assert (child["first_seen"], child["last_seen"], child["max_area"]) == (
+        "2024-01-01T00:00:00",
+        "2024-01-02T00:00:00",
+        202.0,
+    )
+    assert child["children"] == []
+
+    # any member gives the same family
+    assert client.get("/iceberg_api/iceberg/b15/family").get_json()["tree"] == root
+    assert client.get("/iceberg_api/iceberg/c28/family").get_json()["members"] == 1
+    assert client.get("/iceberg_api/iceberg/b15aa/family").status_code == 404
+
+
+def test_family_with_an_uncatalogued_ancestor(app):
+    with app.app_context():
+        db.session.add(Iceberg(id="d20ab", area=10.0))
+        db.session.commit()
+        build_lineage(db, ["d20ab"])
+    tree = app.test_client().get("/iceberg_api/iceberg/d20ab/family").get_json()["tree"]
+    assert (tree["id"], tree["observed"]) == ("d20", False)
+    (parent,) = tree["children"]
+    assert (parent["id"], parent["observed"]) == ("d20a", False)
+    assert [(c["id"], c["observed"]) for c in parent["children"]] == [("d20ab", True)]
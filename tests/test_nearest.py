@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+from server.app import create_app
+from server.models import db, Iceberg, IcebergInfo
+from server.utils import observations
+from server.utils.nearest import nearest_index, DAY
+
+
+def observe(iceberg_id, lat, lon, day):
+    db.session.add(
+        IcebergInfo(
+            iceberg_id=iceberg_id,
+            latitude=lat,
+            longitude=lon,
+            record_time=datetime(2024, 1, day),
+            is_prediction=False,
+        )
+    )
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'nearest.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        for iceberg_id in ("a23a", "b15", "c28"):
+            db.session.add(Iceberg(id=iceberg_id, area=100.0))
+        observe("a23a", -70.0, -40.0, 1)
+        observe("b15", -70.0, -30.0, 1)
+        db.session.commit()
+    observations.invalidate()
+    yield app
+    observations.invalidate()
+
+
+def nearest(client, **params):
+    query = {"lat": -70.0, "lon": -41.0, "date": "2024-01-10", "k": 5, **params}
+    response = client.get("/iceberg_api/iceberg/nearest", query_string=query)
+    assert response.status_code == 200
+    return response.get_json()["icebergs"]
+
+
+def test_nearest_follows_an_ingest(app):
+    client = app.test_client()
+    first = nearest(client)
+    assert [i["iceberg_id"] for i in first] == ["a23a", "b15"]
+    assert first[0]["latitude"] == -70.0 and first[0]["longitude"] == -40.0
+
+    with app.app_context():
+        observe("c28", -70.0, -41.0, 5)
+        observe("a23a", -60.0, 0.0, 6)
+        db.session.commit()
+    observations.invalidate()
+
+    second = nearest(client)
+    assert [i["iceberg_id"] for i in second] == ["c28", "b15", "a23a"]
+    assert second[0]["distance_km"] == pytest.approx(0.0, abs=1e-6)
+    assert (second[2]["latitude"], second[2]["longitude"]) == (-60.0, 0.0)
+
+
+def test_index_of_an_earlier_snapshot_matches_that_snapshot(app):
+    with app.app_context():
+        before = observations.get_observations()
+        observe("c28", -70.0, -41.0, 5)
+        db.session.commit()
+        observations.invalidate()
+        after = observations.get_observations()
+
+        day = observations.to_timestamp(datetime(2024, 1, 10)) // DAY
+        _, rows = nearest_index(before, day, 90)
+        assert sorted(before.iceberg_ids[before.iceberg_idx[rows]]) == ["a23a", "b15"]
+        _, rows = nearest_index(after, day, 90)
+        assert sorted(after.iceberg_ids[after.iceberg_idx[rows]]) == ["a23a", "b15", "c28"]
@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+import subprocess
+
+import pytest
+
+from server.utils.scheduler import Scheduler, acquire_process_lock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_jobs_run_when_due(clock):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+    scheduler.add_job("scrape", lambda: calls.append("scrape"), interval=60)
+    scheduler.add_job("prewarm", lambda: calls.append("prewarm"), interval=10, delay=5)
+
+    assert scheduler.run_pending() == ["scrape"]
+    assert scheduler.run_pending() == []
+    clock.advance(5)
+    assert scheduler.run_pending() == ["prewarm"]
+    clock.advance(10)
+    assert scheduler.run_pending() == ["prewarm"]
+    clock.advance(45)
+    assert scheduler.run_pending() == ["scrape", "prewarm"]
+    assert calls == ["scrape", "prewarm", "prewarm", "scrape", "prewarm"]
+
+
+def test_next_run_counts_from_the_start_of_the_last_run(clock):
+    scheduler = Scheduler(clock=clock)
+
+    def slow():
+        clock.advance(25)
+
+    job = scheduler.add_job("rollups", slow, interval=60)
+    scheduler.run_pending()
+    assert job.last_duration == 25
+    assert job.next_run == 1060
+    assert scheduler.status()["rollups"]["next_run_in"] == 35
+    clock.advance(35)
+    assert scheduler.run_pending() == ["rollups"]
+
+
+def test_failures_are_recorded_and_rescheduled(clock):
+    scheduler = Scheduler(clock=clock)
+
+    def failing():
+        raise ValueError("page layout changed")
+
+    job = scheduler.add_job("scrape", failing, interval=60)
+    assert scheduler.run_pending() == ["scrape"]
+    assert (job.runs, job.failures) == (1, 1)
+    assert job.last_error == "ValueError: page layout changed"
+    assert job.next_run == 1060
+
+
+def test_a_running_job_is_not_started_twice(clock):
+    scheduler = Scheduler(clock=clock)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    job = scheduler.add_job("ingest", blocking, interval=60)
+    first = threading.Thread(target=scheduler.run_job, args=("ingest",))
+    first.start()
+    assert started.wait(5)
+
+    assert scheduler.run_job("ingest") is False
+    clock.advance(120)
+    assert scheduler.run_pending() == []
+    assert scheduler.status()["ingest"]["running"] is True
+
+    release.set()
+    first.join(5)
+    assert (job.runs, job.skipped, job.last_result) == (1, 2, "done")
+    assert scheduler.run_pending() == ["ingest"]
+
+
+def test_process_lock_is_held_by_one_holder(tmp_path):
+    path = str(tmp_path / "instance" / "scheduler.lock")
+    holder = acquire_process_lock(path)
+    assert holder is not None
+
+    # flock locks belong to the open file, a second open in this process competes like another worker would
+    assert acquire_process_lock(path) is None
+    holder.close()
+    again = acquire_process_lock(path)
+    assert again is not None
+    again.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="no flock on Windows")
+def test_process_lock_excludes_other_processes(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    holder = acquire_process_lock(path)
+    code = "import sys; from server.utils.scheduler import acquire_process_lock; print(acquire_process_lock(sys.argv[1]))"
+    other = subprocess.run([sys.executable, "-c", code, path], capture_output=True, text=True, check=True, cwd=ROOT)
+    assert other.stdout.strip() == "None"
+    holder.close()
+    other = subprocess.run([sys.executable, "-c", code, path], capture_output=True, text=True, check=True, cwd=ROOT)
+    assert other.stdout.strip() != "None"
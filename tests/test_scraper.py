@@ -0,0 +1,266 @@
+import os
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from server.utils import load_data, snapshot_store
+from server.utils.hooks import (
+    create_session,
+    fetch_current_iceberg_page,
+    get_iceberg_details,
+    parse_current_iceberg_location,
+    read_current_iceberg_location,
+    save_fetch_state,
+)
+from server.utils.snapshot_store import SnapshotStore, get_snapshot_store
+
+URL = "https://scp.example/current_icebergs.html"
+PAGE = b"<html><p>Revised 12:00:00 01/20/24</p><table></table></html>"
+# saved copy of the SCP BYU current iceberg page
+FIXTURE = os.path.join(os.path.dirname(__file__), "..", "data", "fixtures", "current_icebergs.html")
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+
+class FakeSession:
+    """Stands in for requests.Session, answers with the given responses and records the request headers"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None, verify=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "scp_fetch_state.json")
+
+
+def fetch(session, state_path):
+    return fetch_current_iceberg_page(url=URL, state_path=state_path, session=session)
+
+
+def test_new_page_is_returned_with_its_state_and_nothing_is_saved(state_path):
+    session = FakeSession(FakeResponse(200, PAGE, {"ETag": '"v1"', "Last-Modified": "Sat, 20 Jan 2024 12:00:00 GMT"}))
+    content, state = fetch(session, state_path)
+
+    assert content == PAGE
+    assert state["etag"] == '"v1"' and state["last_modified"] == "Sat, 20 Jan 2024 12:00:00 GMT"
+    assert session.requests == [{}]
+    # saved by the caller once the page is ingested, a failed ingest fetches the page again
+    content, _ = fetch(FakeSession(FakeResponse(200, PAGE)), state_path)
+    assert content == PAGE
+
+
+def test_not_modified(state_path):
+    _, state = fetch(FakeSession(FakeResponse(200, PAGE, {"ETag": '"v1"', "Last-Modified": "yesterday"})), state_path)
+    save_fetch_state(state_path, state)
+
+    session = FakeSession(FakeResponse(304))
+    assert fetch(session, state_path) == (None, None)
+    assert session.requests == [{"If-None-Match": '"v1"', "If-Modified-Since": "yesterday"}]
+
+
+def test_unchanged_digest(state_path):
+    _, state = fetch(FakeSession(FakeResponse(200, PAGE)), state_path)
+    save_fetch_state(state_path, state)
+
+    # no validators, the server sends the same page again
+    assert fetch(FakeSession(FakeResponse(200, PAGE)), state_path) == (None, None)
+    content, new_state = fetch(FakeSession(FakeResponse(200, PAGE + b"<p>new</p>")), state_path)
+    assert content == PAGE + b"<p>new</p>" and new_state["sha256"] != state["sha256"]
+
+
+def test_state_of_another_url_is_ignored(state_path):
+    _, state = fetch(FakeSession(FakeResponse(200, PAGE, {"ETag": '"v1"'})), state_path)
+    save_fetch_state(state_path, state)
+
+    session = FakeSession(FakeResponse(200, PAGE))
+    content, _ = fetch_current_iceberg_page(url=URL + "?mirror", state_path=state_path, session=session)
+    assert content == PAGE and session.requests == [{}]
+
+
+def test_client_errors_raise(state_path):
+    with pytest.raises(requests.HTTPError):
+        fetch(FakeSession(FakeResponse(404)), state_path)
+
+
+def test_page_is_fetched_again_after_a_failed_ingest(tmp_path, monkeypatch):
+    store = get_snapshot_store(str(tmp_path / "snapshots"))
+
+    def failing_insert(location_details, db):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(load_data, "insert_snapshot", failing_insert)
+    with pytest.raises(RuntimeError):
+        load_data.get_new_data(store, db=None, url=URL, session=FakeSession(FakeResponse(200, PAGE, {"ETag": '"v1"'})))
+
+    monkeypatch.setattr(load_data, "insert_snapshot", lambda location_details, db: 0)
+    session = FakeSession(FakeResponse(200, PAGE, {"ETag": '"v1"'}))
+    load_data.get_new_data(store, db=None, url=URL, session=session)
+    assert session.requests == [{}]
+    # ingested now, the next run is conditional
+    session = FakeSession(FakeResponse(304))
+    assert load_data.get_new_data(store, db=None, url=URL, session=session) == 0
+    assert session.requests == [{"If-None-Match": '"v1"'}]
+
+
+@pytest.fixture
+def flaky_server():
+    """Local HTTP stand-in answering the first `failures[0]` requests with 503"""
+    failures = [0]
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            status, body = (503, b"busy") if len(hits) <= failures[0] else (200, PAGE)
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/current_icebergs.html", failures, hits
+    server.shutdown()
+    server.server_close()
+
+
+def test_server_errors_are_retried(flaky_server, state_path):
+    url, failures, hits = flaky_server
+    failures[0] = 2
+    session = create_session(retries=3, backoff_factor=0)
+
+    content, _ = fetch_current_iceberg_page(url=url, state_path=state_path, session=session)
+    assert content == PAGE
+    assert len(hits) == 3
+
+
+def test_retries_give_up(flaky_server, state_path):
+    url, failures, hits = flaky_server
+    failures[0] = 10
+    session = create_session(retries=2, backoff_factor=0)
+
+    with pytest.raises(requests.RequestException):
+        fetch_current_iceberg_page(url=url, state_path=state_path, session=session)
+    assert len(hits) == 3
+
+
+@pytest.fixture
+def scp_server():
+    """Local HTTP stand-in serving the saved SCP page with an ETag, answering a matching If-None-Match with 304"""
+    with open(FIXTURE, "rb") as fp:
+        page = fp.read()
+    etag = '"scp-fixture"'
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/current_icebergs.html", page, hits
+    server.shutdown()
+    server.server_close()
+
+
+def test_saved_page_is_parsed_and_fetched_conditionally(scp_server, state_path):
+    url, page, hits = scp_server
+    location_data, revised_date, state = read_current_iceberg_location(url=url, state_path=state_path)
+
+    assert revised_date == datetime(2025, 3, 25, 12, 0, 0)
+    assert (location_data, revised_date) == parse_current_iceberg_location(page)
+    assert location_data[0] == ["Iceberg", "Longitude", "Latitude", "Last Update"]
+    assert len(location_data) == 38
+    details = get_iceberg_details(location_data, revised_date)
+    assert details[0]["iceberg_id"] == "a23a"
+    assert details[0]["dms_longitude"] == "39 7'W" and details[0]["dms_latitude"] == "54 48'S"
+    assert details[0]["longitude"] < 0 and details[0]["latitude"] < 0
+    assert details[0]["recent_observation"] == "03/23/25"  # day 82 of 2025
+    assert state["etag"] == '"scp-fixture"'
+
+    # not ingested yet, the page is downloaded again without validators
+    assert read_current_iceberg_location(url=url, state_path=state_path)[0] == location_data
+    save_fetch_state(state_path, state)
+    assert read_current_iceberg_location(url=url, state_path=state_path) == (None, None, None)
+    assert hits == [None, None, '"scp-fixture"']
+
+
+def test_snapshots_are_appended_once(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    assert store.latest() == (None, [])
+    assert store.append(datetime(2024, 1, 20, 12), [{"iceberg": "a23a"}, {"iceberg": "b15"}])
+    assert not store.append(datetime(2024, 1, 20, 12), [{"iceberg": "c28"}])
+    assert store.append(datetime(2024, 1, 21), [])
+
+    assert store.dates() == [datetime(2024, 1, 20, 12), datetime(2024, 1, 21)]
+    assert store.index()[0] == {"date": "2024-01-20T12:00:00", "file": "20240120T120000.ndjson", "count": 2}
+    assert store.read("20240120T120000.ndjson") == [{"iceberg": "a23a"}, {"iceberg": "b15"}]
+    assert not [f for f in os.listdir(store.root) if f.endswith(".tmp")]
+
+
+def test_latest_snapshot_follows_the_index_file(tmp_path):
+    root = str(tmp_path / "snapshots")
+    store = SnapshotStore(root)
+    store.append(datetime(2024, 1, 20), [{"iceberg": "a23a"}])
+    entry, snapshot = store.latest()
+    assert entry["file"] == "20240120T000000.ndjson" and snapshot == [{"iceberg": "a23a"}]
+    assert store.latest()[1] is snapshot
+
+    # appended through another store, as the scraper process does
+    SnapshotStore(root).append(datetime(2024, 1, 21), [{"iceberg": "b15"}])
+    entry, snapshot = store.latest()
+    assert entry["date"] == "2024-01-21T00:00:00" and snapshot == [{"iceberg": "b15"}]
+
+
+def test_legacy_json_is_imported_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_store, "_stores", {})
+    root = str(tmp_path / "snapshots")
+    legacy = tmp_path / "icebergs.json"
+    legacy.write_text(json.dumps({"01/20/24": [{"iceberg": "a23a"}], "12/31/23": [{"iceberg": "b15"}]}))
+
+    store = get_snapshot_store(root, legacy_json_path=str(legacy))
+    # imported oldest first whatever the key order
+    assert store.dates() == [datetime(2023, 12, 31), datetime(2024, 1, 20)]
+    assert store.latest()[1] == [{"iceberg": "a23a"}]
+    assert get_snapshot_store(root, legacy_json_path=str(legacy)) is store
+
+    # a restarted process opens the existing store without importing again
+    legacy.write_text(json.dumps({"02/01/24": [{"iceberg": "d20"}]}))
+    monkeypatch.setattr(snapshot_store, "_stores", {})
+    assert len(get_snapshot_store(root, legacy_json_path=str(legacy)).index()) == 2
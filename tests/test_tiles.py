@@ -0,0 +1,107 @@
+import io
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+from server.app import create_app
+from server.models import db, Iceberg, IcebergInfo
+from server.utils import observations, tiles
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'tiles.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        for iceberg_id, lon in (("a23a", -40.0), ("b15", 170.0)):
+            db.session.add(Iceberg(id=iceberg_id, area=100.0))
+            for day in (1, 2, 3):
+                db.session.add(
+                    IcebergInfo(
+                        iceberg_id=iceberg_id,
+                        latitude=-70.0 + day,
+                        longitude=lon + day,
+                        record_time=datetime(2024, 1, day),
+                        is_prediction=False,
+                    )
+                )
+        db.session.commit()
+    observations.invalidate()
+    yield app
+    observations.invalidate()
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/tiles/positions/mercator/1/2/0.json",
+        "/tiles/positions/mercator/1/0/2.json",
+        "/tiles/positions/polar/17/0/0.json",
+        "/tiles/positions/lambert/0/0/0.json",
+        "/tiles/density/mercator/2/4/1.png",
+        "/tiles/density/lambert/0/0/0.png",
+    ],
+)
+def test_tiles_out_of_bounds_are_not_found(app, path):
+    assert app.test_client().get(path).status_code == 404
+
+
+def test_density_tile_is_a_png(app):
+    response = app.test_client().get("/tiles/density/polar/0/0/0.png")
+    assert response.status_code == 200 and response.mimetype == "image/png"
+    with Image.open(io.BytesIO(response.data)) as image:
+        image.load()
+        assert image.size == (tiles.RASTER_TILE_SIZE, tiles.RASTER_TILE_SIZE) == (256, 256)
+        # some cells are painted, the rest is transparent
+        alpha = image.convert("RGBA").getchannel("A").getextrema()
+        assert alpha[0] == 0 and alpha[1] > 0
+
+
+def test_versioned_tiles_are_immutable(app):
+    client = app.test_client()
+    version = client.get("/tiles/meta").get_json()["version"]
+    for path in ("/tiles/positions/polar/0/0/0.json", "/tiles/density/polar/0/0/0.png"):
+        response = client.get(path, query_string={"v": version})
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == f"public, max-age={365 * 24 * 3600}, immutable"
+        etag = response.headers["ETag"]
+        assert version in etag
+
+        assert client.get(path).headers["Cache-Control"] == "public, max-age=3600"
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+        # an older version is not immutable
+        assert "immutable" not in client.get(path, query_string={"v": "0-0"}).headers["Cache-Control"]
+
+
+def test_tile_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(tiles, "_tile_cache", {})
+    monkeypatch.setattr(tiles, "_tile_cache_state", {"bytes": 0})
+    monkeypatch.setattr(tiles, "TILE_CACHE_BYTES", 1000)
+    builds = []
+
+    def cached(key, nbytes=400):
+        return tiles._cached(key, lambda: builds.append(key) or key, lambda _: nbytes)
+
+    cached("a")
+    cached("b")
+    cached("a")  # hit, "b" is now the least recently used
+    cached("c")
+    assert builds == ["a", "b", "c"]
+    assert list(tiles._tile_cache) == ["a", "c"]
+    assert tiles._tile_cache_state["bytes"] == 800
+
+    cached("d", nbytes=900)
+    assert list(tiles._tile_cache) == ["d"] and tiles._tile_cache_state["bytes"] == 900
+    # larger than the whole budget, built but never cached
+    cached("e", nbytes=1001)
+    cached("e", nbytes=1001)
+    assert builds[-2:] == ["e", "e"] and list(tiles._tile_cache) == ["d"]
+    assert tiles._tile_cache_state["bytes"] <= tiles.TILE_CACHE_BYTES
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pytest
+
+from server.app import create_app
+from server.models import db, Iceberg, IcebergInfo
+from server.utils import observations
+from server.utils.observations import get_observations, to_timestamp
+from server.utils.timeline import interpolate_positions
+
+FIXES = {
+    # a23a drifts 1 degree a day north and east
+    "a23a": [(datetime(2024, 1, 1), -70.0, -40.0), (datetime(2024, 1, 5), -66.0, -36.0)],
+    # b15 crosses the antimeridian
+    "b15": [(datetime(2024, 1, 3), -60.0, 179.0), (datetime(2024, 1, 5), -62.0, -179.0)],
+    # c28 is not seen for 39 days
+    "c28": [(datetime(2024, 1, 1), -50.0, 10.0), (datetime(2024, 2, 9), -89.0, 49.0)],
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'timeline.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        for iceberg_id, fixes in FIXES.items():
+            db.session.add(Iceberg(id=iceberg_id, area=100.0))
+            for record_time, lat, lon in fixes:
+                db.session.add(
+                    IcebergInfo(
+                        iceberg_id=iceberg_id,
+                        latitude=lat,
+                        longitude=lon,
+                        record_time=record_time,
+                        is_prediction=False,
+                    )
+                )
+        db.session.commit()
+    observations.invalidate()
+    yield app
+    observations.invalidate()
+
+
+def positions(app, when, max_gap_days=30):
+    with app.app_context():
+        obs = get_observations()
+        icebergs, lats, lons = interpolate_positions(obs, to_timestamp(when), max_gap_days)
+        return {
+            iceberg_id: (round(float(lat), 6), round(float(lon), 6))
+            for iceberg_id, lat, lon in zip(obs.iceberg_ids[icebergs], lats, lons)
+        }
+
+
+def test_between_two_fixes(app):
+    # 1.5 of 4 days after the first fix of a23a
+    assert positions(app, datetime(2024, 1, 2, 12)) == {"a23a": (-68.5, -38.5)}
+    # halfway, b15 moved 2 degrees east across the antimeridian
+    assert positions(app, datetime(2024, 1, 4)) == {"a23a": (-67.0, -37.0), "b15": (-61.0, -180.0)}
+
+
+def test_before_the_first_fix(app):
+    assert positions(app, datetime(2023, 12, 31)) == {}
+    # a fix is a position whatever the gap to the next one
+    assert positions(app, datetime(2024, 1, 1)) == {"a23a": (-70.0, -40.0), "c28": (-50.0, 10.0)}
+
+
+def test_after_the_last_fix(app):
+    # the last fix itself is a position, the track is not extrapolated past it
+    assert positions(app, datetime(2024, 1, 5)) == {"a23a": (-66.0, -36.0), "b15": (-62.0, -179.0)}
+    assert positions(app, datetime(2024, 1, 6)) == {}
+
+
+def test_gap_longer_than_the_maximum(app):
+    assert "c28" not in positions(app, datetime(2024, 1, 10))
+    # 9 of 39 days after the first fix
+    assert positions(app, datetime(2024, 1, 10), max_gap_days=40)["c28"] == (-59.0, 19.0)
+    assert positions(app, datetime(2024, 1, 10), max_gap_days=None)["c28"] == (-59.0, 19.0)
+
+
+def test_snapshot_route(app):
+    client = app.test_client()
+    snapshot = client.get("/iceberg_api/snapshot", query_string={"time": "2024-01-04T00:00:00"}).get_json()
+    assert snapshot["icebergs"] == ["a23a", "b15"]
+    assert snapshot["latitude"] == [-67.0, -61.0]
+    assert snapshot["longitude"] == [-37.0, -180.0]
+
+    query = {"time": "2024-01-10T00:00:00", "max_gap_days": 40}
+    snapshot = client.get("/iceberg_api/snapshot", query_string=query).get_json()
+    assert snapshot["icebergs"] == ["c28"] and snapshot["latitude"] == [-59.0]
+    assert client.get("/iceberg_api/snapshot", query_string={"time": "soon"}).status_code == 400
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pytest
+
+from server.app import create_app
+from server.models import db, Iceberg, IcebergInfo
+from server.repository import get_repository
+from server.utils import observations
+from server.utils.observations import dataset_version
+from server.utils.track_store import build_track_store, get_track_store, load_track
+
+
+def observe(iceberg_id, day, **fields):
+    db.session.add(
+        IcebergInfo(
+            iceberg_id=iceberg_id,
+            latitude=-70.0 + day / 3,
+            longitude=-40.0 - day / 7,
+            record_time=datetime(2024, 1, day, 6),
+            is_prediction=fields.pop("is_prediction", False),
+            **fields,
+        )
+    )
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'tracks.sqlite'}",
+            "PUBLISHED_DATABASE": None,
+            "TRACK_STORE": None,
+            "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        for iceberg_id in ("a23a", "b15", "c28"):
+            db.session.add(Iceberg(id=iceberg_id, area=100.0))
+        # inserted out of time order, with and without the optional columns
+        observe("b15", 3, area_at_record_time=120.5, rotational_velocity=0.25)
+        observe("a23a", 2)
+        observe("b15", 1, area_at_record_time=130.0)
+        observe("b15", 4, is_prediction=True)
+        observe("a23a", 1, rotational_velocity=-1.5)
+        db.session.commit()
+    observations.invalidate()
+    yield app
+    observations.invalidate()
+
+
+def test_store_matches_the_repository(app, tmp_path):
+    path = str(tmp_path / "tracks.bin")
+    with app.app_context():
+        assert build_track_store(db, path) == 5
+        assert get_track_store(path).version == dataset_version()
+        for iceberg_id in ("a23a", "b15", "c28"):
+            stored = load_track(iceberg_id, path)
+            assert [tuple(row) for row in stored] == [tuple(row) for row in get_repository().track(iceberg_id)]
+        assert [row.area_at_record_time for row in load_track("b15", path)] == [130.0, 120.5, None]
+        assert [row.is_prediction for row in load_track("b15", path)] == [False, False, True]
+
+
+def test_stale_store_falls_back_to_the_database(app, tmp_path):
+    path = str(tmp_path / "tracks.bin")
+    with app.app_context():
+        build_track_store(db, path)
+        observe("c28", 5)
+        db.session.commit()
+        observations.invalidate()
+
+        assert get_track_store(path).version != dataset_version()
+        assert get_track_store(path).get("c28") is None
+        track = load_track("c28", path)
+        assert [row.record_time for row in track] == [datetime(2024, 1, 5, 6)]
+
+        # the next build picks the observation up
+        build_track_store(db, path)
+        assert load_track("c28", path) == track